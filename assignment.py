@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional, Sequence
+
+
+def min_cost_assignment(cost: Sequence[Sequence[float]]) -> List[int]:
+    """
+    Hungarian algorithm (shortest augmenting paths with potentials), O(n^2 m).
+    cost is an n x m matrix with n <= m; returns the column assigned to each row
+    so that every row gets a different column and the total cost is minimum.
+    """
+    n = len(cost)
+    if n == 0:
+        return []
+    m = len(cost[0])
+    if n > m:
+        raise ValueError("Servono almeno tante colonne quante righe.")
+
+    inf = float("inf")
+    # 1-based potentials; p[j] is the row matched to column j, column 0 is a sentinel
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assignment = [-1] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+def max_weight_matching(weights: Sequence[Dict[int, float]]) -> List[Optional[int]]:
+    """
+    Maximum weight bipartite matching where rows may stay unmatched.
+    weights[i] maps the allowed columns of row i to their (positive) weight; returns
+    the column chosen for each row, or None.
+    When the best columns of the rows are all different they are the answer;
+    otherwise every group of rows connected through shared columns is solved on its
+    own with the Hungarian algorithm.
+    """
+    result: List[Optional[int]] = [None] * len(weights)
+    best = {i: max(row, key=row.get) for i, row in enumerate(weights) if row}
+    if len(set(best.values())) == len(best):
+        for i, column in best.items():
+            result[i] = column
+        return result
+
+    # Connected components of the rows through their columns (union-find on rows)
+    parent = {i: i for i in best}
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: Dict[int, int] = {}
+    for i in best:
+        for column in weights[i]:
+            if column in owner:
+                parent[find(i)] = find(owner[column])
+            else:
+                owner[column] = i
+    components: Dict[int, List[int]] = {}
+    for i in best:
+        components.setdefault(find(i), []).append(i)
+
+    for rows in components.values():
+        if len(rows) == 1:
+            result[rows[0]] = best[rows[0]]
+            continue
+        columns = sorted({column for i in rows for column in weights[i]})
+        forbidden = 1 + sum(abs(w) for i in rows for w in weights[i].values())
+        # One dummy column of weight 0 per row: leaving a row empty is always possible
+        # and a forbidden pair is never taken
+        cost = [[-weights[i][column] if column in weights[i] else forbidden for column in columns] + [0.0] * len(rows)
+                for i in rows]
+        for i, j in zip(rows, min_cost_assignment(cost)):
+            if j < len(columns) and columns[j] in weights[i]:
+                result[i] = columns[j]
+    return result
@@ -0,0 +1,145 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+# --- Logging asincrono per la GUI ---
+#
+# The GUI only puts records on a queue; a QueueListener thread formats them and
+# writes them to a size-capped, rotated file. Large payloads are passed as lazy
+# objects (DictDiff) so that even building the text happens on the writer thread.
+
+MAX_BYTES = 1_000_000
+BACKUP_COUNT = 3
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that does not format on the calling thread.
+    The queue never leaves the process, so the record can be handed over as it is:
+    the message (and its arguments) is rendered by the writer thread.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _WriterListener(QueueListener):
+    """QueueListener whose stop() can be called more than once (explicitly and at exit)."""
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most 'burst' records from the same logger with the same message
+    template (record.msg, before the arguments are applied) every 'period' seconds.
+    The number of dropped records is reported on the next one that passes.
+    Windows that have expired are pruned once per period; a window with dropped
+    records is kept for 'keep_dropped' periods so that its count can still be reported.
+    """
+    def __init__(self, burst: int = 20, period: float = 1.0, keep_dropped: int = 60):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.keep_dropped = keep_dropped
+        # (logger, template) -> [window start, records in the window, dropped]
+        self._windows: Dict[Any, list] = {}
+        self._last_prune = time.monotonic()
+
+    def _prune(self, now: float):
+        self._last_prune = now
+        self._windows = {
+            key: window for key, window in self._windows.items()
+            if now - window[0] < (self.period * self.keep_dropped if window[2] else self.period)
+        }
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        if now - self._last_prune >= self.period:
+            self._prune(now)
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.period:
+            dropped = window[2] if window is not None else 0
+            self._windows[key] = [now, 1, 0]
+            if dropped and isinstance(record.msg, str):
+                record.msg = f"{record.msg} [{dropped} messaggi simili soppressi]"
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+class DictDiff:
+    """
+    Lazy log message: the differences between two flat snapshots (dict key -> value).
+    With no previous snapshot the full snapshot is written once.
+    Both snapshots must not be modified after being passed in.
+    """
+    def __init__(self, title: str, previous: Optional[Dict[str, Any]], current: Dict[str, Any]):
+        self.title = title
+        self.previous = previous
+        self.current = current
+
+    def __str__(self) -> str:
+        if self.previous is None:
+            return f"{self.title} (completo):\n{json.dumps(self.current, indent=2, ensure_ascii=False)}"
+
+        lines = []
+        for key, value in self.current.items():
+            if key not in self.previous:
+                lines.append(f"  + {key} = {value}")
+            elif self.previous[key] != value:
+                lines.append(f"  ~ {key}: {self.previous[key]} -> {value}")
+        for key in self.previous:
+            if key not in self.current:
+                lines.append(f"  - {key}")
+        if not lines:
+            return f"{self.title}: nessuna modifica"
+        return f"{self.title} ({len(lines)} modifiche):\n" + "\n".join(lines)
+
+
+def flatten_prices(prices: Dict[str, Dict[str, Dict[str, int]]], prefix: str = "prezzo") -> Dict[str, int]:
+    """Flat, immutable-by-convention copy of a PriceManager.prices book: 'prezzo.stat/category/gender' -> price."""
+    return {
+        f"{prefix}.{stat}/{category}/{gender}": price
+        for stat, categories in prices.items()
+        for category, genders in categories.items()
+        for gender, price in genders.items()
+    }
+
+
+def setup_logging(file_path: str, level: int = logging.INFO, max_bytes: int = MAX_BYTES, backup_count: int = BACKUP_COUNT) -> QueueListener:
+    """
+    Routes the root logger through a queue to a background writer.
+    The file is rotated at startup (the previous session becomes '.1') and whenever
+    it exceeds max_bytes. The listener is stopped (and the queue flushed) at exit.
+    """
+    log_dir = os.path.dirname(file_path)
+    if log_dir and not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    file_handler = RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+        file_handler.doRollover()
+
+    log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+    listener = _WriterListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,121 @@
+import queue
+import threading
+import time
+import tkinter as tk
+from typing import Any, Callable, Optional
+
+
+class BackgroundTask:
+    """
+    Runs a long computation on a worker thread without freezing the Tk window.
+
+    The work function is called as work(report, cancel_event) on the worker thread:
+    - report(stage, done, total) publishes progress (thread-safe, never touches Tk);
+    - cancel_event is a threading.Event the work must check regularly to stop early.
+
+    The work may also call publish(payload) to stream intermediate results (e.g. the
+    best plan so far): on_partial(payload) receives only the latest one, at most
+    once every PARTIAL_INTERVAL seconds.
+
+    The Tk thread polls the message queue with after() and invokes the callbacks:
+    on_progress(stage, done, total), on_partial(payload), on_done(result),
+    on_error(exception) and on_cancelled(). After a cancel only on_cancelled is
+    called, even if the work managed to return a result.
+    """
+    POLL_MS = 50
+    # Minimum time between two on_partial calls (a few redraws per second)
+    PARTIAL_INTERVAL = 0.25
+
+    def __init__(self, widget: tk.Misc, work: Callable[[Callable[[str, int, int], None], threading.Event], Any],
+                 on_progress: Optional[Callable[[str, int, int], None]] = None,
+                 on_done: Optional[Callable[[Any], None]] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None,
+                 on_cancelled: Optional[Callable[[], None]] = None,
+                 on_partial: Optional[Callable[[Any], None]] = None):
+        self.widget = widget
+        self.work = work
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancelled = on_cancelled
+        self.on_partial = on_partial
+        self.cancel_event = threading.Event()
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._after_id = None
+        self._finished = False
+        self._pending_partial = None
+        self._has_pending_partial = False
+        self._last_partial_time = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._finished
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._after_id = self.widget.after(self.POLL_MS, self._poll)
+
+    def cancel(self):
+        """Asks the work to stop; the callbacks fire on the next poll."""
+        self.cancel_event.set()
+
+    def publish(self, payload: Any):
+        """Thread-safe: streams an intermediate result to on_partial."""
+        self._queue.put(("partial", payload))
+
+    def _report(self, stage: str, done: int, total: int):
+        self._queue.put(("progress", (stage, done, total)))
+
+    def _run(self):
+        try:
+            result = self.work(self._report, self.cancel_event)
+            self._queue.put(("done", result))
+        except Exception as e:
+            self._queue.put(("error", e))
+
+    def _poll(self):
+        self._after_id = None
+        last_progress = None
+        outcome = None
+        while True:
+            try:
+                kind, payload = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                last_progress = payload
+            elif kind == "partial":
+                self._pending_partial = payload
+                self._has_pending_partial = True
+            else:
+                outcome = (kind, payload)
+
+        # Only the latest progress of each tick is drawn
+        if last_progress is not None and self.on_progress and outcome is None:
+            self.on_progress(*last_progress)
+
+        if self._has_pending_partial and self.on_partial and outcome is None:
+            now = time.monotonic()
+            if now - self._last_partial_time >= self.PARTIAL_INTERVAL:
+                self._last_partial_time = now
+                self._has_pending_partial = False
+                payload, self._pending_partial = self._pending_partial, None
+                self.on_partial(payload)
+
+        if outcome is None:
+            self._after_id = self.widget.after(self.POLL_MS, self._poll)
+            return
+
+        self._finished = True
+        self._pending_partial = None
+        kind, payload = outcome
+        if self.cancel_event.is_set():
+            if self.on_cancelled:
+                self.on_cancelled()
+        elif kind == "done":
+            if self.on_done:
+                self.on_done(payload)
+        elif self.on_error:
+            self.on_error(payload)
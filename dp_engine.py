@@ -0,0 +1,182 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from structures import PokemonRichiesto, Accoppiamento, Livello, PianoCompleto, PokemonPosseduto
+from core_engine import CANONICAL_IV_ROLES, NATURA_ROLE
+from plan_evaluator import PlanEvaluator
+from price_manager import PriceManager
+
+INFINITO = 999999999
+
+class _RicercaAnnullata(Exception):
+    """Raised inside SubsetBreedingDP.costo when the search is cancelled."""
+
+
+# State: (IV subset as a bitmask over ivs_desiderate, with nature, species line, required gender)
+Stato = Tuple[int, bool, bool, str]
+
+
+class SubsetBreedingDP:
+    """
+    Cheapest breeding tree for a target, computed over the subsets of the requested IVs
+    instead of costing the fixed shapes built by core_engine.
+
+    A Pokemon of the tree is a state (IV subset, nature, species line, gender) with the
+    same meaning as the arguments of PlanEvaluator.calculate_cost_recursive, and is
+    priced with the same rules:
+    - leaves are 1IV or nature-only Pokemon, bought (PlanEvaluator._leaf_purchase_cost)
+      or, when usa_posseduti is True, taken from the owned Pokemon for free;
+    - a k-IV Pokemon is bred from two (k-1)-IV parents that together cover its IVs;
+    - a k-IV+nature Pokemon is bred from the (k-1)-IV+nature and the k-IV one,
+      as in the hand-built plans. Both parent orders are tried.
+    With owned Pokemon the search is a relaxation (one owned Pokemon may fill several
+    slots): the tree it returns must be evaluated like any generated plan.
+    When cancel_event is set the search stops and piano_ottimo returns None.
+    """
+
+    def __init__(self, ivs_desiderate: List[str], natura_desiderata: Optional[str], pokemon_posseduti: List[PokemonPosseduto],
+                 price_manager: PriceManager, target_species: str, pokemon_data: Dict, gender_data: Dict, usa_posseduti: bool = True,
+                 cancel_event: Optional[threading.Event] = None):
+        if len(ivs_desiderate) > len(CANONICAL_IV_ROLES):
+            raise ValueError(f"Massimo {len(CANONICAL_IV_ROLES)} IV supportate.")
+        self.ivs = list(ivs_desiderate)
+        self.natura = natura_desiderata
+        self.ruoli = CANONICAL_IV_ROLES[:len(self.ivs)]
+        self.legenda = dict(zip(self.ruoli, self.ivs))
+        if natura_desiderata:
+            self.legenda[NATURA_ROLE] = natura_desiderata
+        self.usa_posseduti = usa_posseduti and bool(pokemon_posseduti)
+        self.cancel_event = cancel_event
+
+        # The evaluator provides the prices, fees and ownership checks of the plan costing
+        self.evaluator = PlanEvaluator(
+            PianoCompleto(0, list(self.ivs), natura_desiderata, self.legenda, []),
+            list(pokemon_posseduti), price_manager, target_species, pokemon_data, natura_desiderata, gender_data
+        )
+        target_gender_type = "maschio e femmina"
+        if target_species in gender_data:
+            target_gender_type = gender_data[target_species].get("gender_type", "maschio e femmina").lower()
+        elif "Genderless" in pokemon_data.get(target_species, []):
+            target_gender_type = "genderless"
+        self.is_genderless_species = "genderless" in target_gender_type
+
+        # state -> (cost, choice); choice is None for leaves, else (state of genitore1, state of genitore2)
+        self.memo: Dict[Stato, Tuple[int, Optional[Tuple[Stato, Stato]]]] = {}
+
+    def _nodo(self, mask: int, natura: bool) -> PokemonRichiesto:
+        return PokemonRichiesto(ruoli_iv=tuple(r for i, r in enumerate(self.ruoli) if mask >> i & 1),
+                                ruolo_natura=NATURA_ROLE if natura else None)
+
+    def _costo_foglia(self, mask: int, natura: bool, obbligatorio: bool, sesso: str) -> int:
+        costo = INFINITO
+        if self.usa_posseduti:
+            ruolo = 'gen1' if sesso in ('F', 'Genderless') else 'gen2'
+            if self.evaluator._calculate_score_for_role(self._nodo(mask, natura), ruolo, obbligatorio) > 0:
+                return 0
+        if (natura and mask == 0) or (not natura and bin(mask).count("1") == 1):
+            stats = [s for i, s in enumerate(self.ivs) if mask >> i & 1]
+            costo, _ = self.evaluator._leaf_purchase_cost(stats, self.natura if natura else None, obbligatorio, sesso)
+        return costo
+
+    def _coppie_genitori(self, mask: int, natura: bool) -> List[Tuple[Tuple[int, bool], Tuple[int, bool]]]:
+        """The (genitore1, genitore2) pairs that can produce the state, both orders."""
+        bits = [1 << i for i in range(len(self.ivs)) if mask >> i & 1]
+        coppie = []
+        if natura:
+            for b in bits:
+                coppie.append(((mask ^ b, True), (mask, False)))
+                coppie.append(((mask, False), (mask ^ b, True)))
+        elif len(bits) >= 2:
+            for a in bits:
+                for b in bits:
+                    if a != b:
+                        coppie.append(((mask ^ a, False), (mask ^ b, False)))
+        return coppie
+
+    def costo(self, stato: Stato) -> int:
+        """Minimum cost of the state (memoized; the parents always have fewer requirements)."""
+        if stato in self.memo:
+            return self.memo[stato][0]
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise _RicercaAnnullata()
+        mask, natura, obbligatorio, sesso = stato
+        migliore: Tuple[int, Optional[Tuple[Stato, Stato]]] = (self._costo_foglia(mask, natura, obbligatorio, sesso), None)
+
+        if migliore[0] > 0:
+            tassa = self.evaluator._get_gender_cost(sesso) + (15000 if natura else 20000)
+            for (m1, n1), (m2, n2) in self._coppie_genitori(mask, natura):
+                if self.is_genderless_species:
+                    opzioni = [((m1, n1, obbligatorio, 'Genderless'), (m2, n2, False, 'Ditto'))]
+                else:
+                    # A: genitore1 is the mother of the line; B: Ditto + male of the species
+                    opzioni = [((m1, n1, obbligatorio, 'F'), (m2, n2, False, 'M'))]
+                    if obbligatorio:
+                        opzioni.append(((m1, n1, False, 'Ditto'), (m2, n2, True, 'M')))
+                for s1, s2 in opzioni:
+                    totale = tassa + self.costo(s1) + self.costo(s2)
+                    if totale < migliore[0]:
+                        migliore = (totale, (s1, s2))
+
+        self.memo[stato] = migliore
+        return migliore[0]
+
+    def piano_ottimo(self, id_piano: int = 1) -> Optional[PianoCompleto]:
+        """Rebuilds the cheapest tree for the target as a PianoCompleto (None if it cannot be obtained)."""
+        radice: Stato = ((1 << len(self.ivs)) - 1, bool(self.natura), True, 'F')
+        try:
+            if self.costo(radice) >= INFINITO:
+                return None
+        except _RicercaAnnullata:
+            return None
+
+        livelli: Dict[int, List[Accoppiamento]] = defaultdict(list)
+
+        def costruisci(stato: Stato) -> Tuple[PokemonRichiesto, int]:
+            nodo = self._nodo(stato[0], stato[1])
+            scelta = self.memo[stato][1]
+            if scelta is None:
+                return nodo, 0
+            genitore1, altezza1 = costruisci(scelta[0])
+            genitore2, altezza2 = costruisci(scelta[1])
+            altezza = max(altezza1, altezza2) + 1
+            livelli[altezza].append(Accoppiamento(genitore1, genitore2, nodo))
+            return nodo, altezza
+
+        costruisci(radice)
+        if not livelli:
+            # The target itself is owned: nothing to breed
+            return None
+        return PianoCompleto(id_piano, list(self.ivs), self.natura, dict(self.legenda),
+                             [Livello(livello_id, livelli[livello_id]) for livello_id in sorted(livelli)])
+
+
+def genera_piani_ottimi(ivs_desiderate: List[str], natura_desiderata: Optional[str], pokemon_posseduti: List[PokemonPosseduto],
+                        price_manager: PriceManager, target_species: str, pokemon_data: Dict, gender_data: Dict, id_iniziale: int = 1,
+                        cancel_event: Optional[threading.Event] = None) -> List[PianoCompleto]:
+    """
+    The cheapest tree buying everything and, if different, the cheapest one that also
+    uses the owned Pokemon. They are meant to be evaluated and costed with the
+    generated plans (valuta_piani + update_cost). When cancel_event is set the search
+    stops and the plans found so far are returned.
+    """
+    piani: List[PianoCompleto] = []
+    firme = set()
+    for usa_posseduti in (False, True):
+        if cancel_event is not None and cancel_event.is_set():
+            print("[INFO] Ricerca esatta annullata.")
+            return piani
+        if usa_posseduti and not pokemon_posseduti:
+            continue
+        dp = SubsetBreedingDP(ivs_desiderate, natura_desiderata, pokemon_posseduti, price_manager,
+                              target_species, pokemon_data, gender_data, usa_posseduti=usa_posseduti,
+                              cancel_event=cancel_event)
+        piano = dp.piano_ottimo(id_iniziale + len(piani))
+        if piano is None:
+            continue
+        firma = repr([[(a.genitore1, a.genitore2, a.figlio) for a in livello.accoppiamenti] for livello in piano.livelli])
+        if firma not in firme:
+            firme.add(firma)
+            piani.append(piano)
+    print(f"[INFO] Ricerca esatta: {len(piani)} piani ottimi per {len(ivs_desiderate)}IV{' + ' + natura_desiderata if natura_desiderata else ''}.")
+    return piani
@@ -1,68 +1,120 @@
+import time
+# Reference for the time-to-interactive measure printed once the window is ready
+_APP_START = time.perf_counter()
+
 import tkinter as tk
 import os
 from tkinter import ttk, messagebox
 import json
 import uuid
 import copy
+import threading
+import concurrent.futures
 from typing import Set, List
 import logging
 import datetime
-import bisect
 
 # Importa le classi e le funzioni necessarie dai file del progetto
 # Aggiornamento: Gestione automatica sesso e ottimizzazione costi
 from structures import PokemonPosseduto, PokemonRichiesto, PianoValutato
 import core_engine
 import plan_evaluator
+import dp_engine
 from price_manager import PriceManager
-from market_overlay import PriceAcquisitionOverlay
-import tesseract_setup  # [NEW] Import setup module
-
-# [NEW] Setup Tesseract immediately on startup
-tesseract_setup.setup_tesseract()
+from background_task import BackgroundTask
+from plan_tree_view import PlanTreeView
+from virtual_list import VirtualTreeview
+from owned_index import OwnedPokemonIndex, ANY
+from async_log import DictDiff, flatten_prices, setup_logging
+from species_search import SpeciesSearchIndex, normalize
+import tesseract_setup  # [NEW] Import setup module (light: pytesseract is imported on setup)
+
+_ocr_configured = False
+
+# Cheapest plans priced exactly and shown in the ranked list after phase 2: far more
+# than a page, the list is virtualized (the branch-and-bound still skips the others)
+PIANI_IN_CLASSIFICA = 500
+
+# Fixed Stats for GTL
+GTL_STATS = ["Base", "PS", "Attacco", "Difesa", "Attacco Speciale", "Difesa Speciale", "Velocità"]
+
+# Egg Groups (Display -> Internal Key)
+GTL_EGG_GROUPS = [
+    ("Mostro", "Mostro"),
+    ("Water A", "Water A"),
+    ("Coleottero", "Coleottero"),
+    ("Volante", "Volante"),
+    ("Campo", "Campo"),
+    ("Folletto", "Folletto"),
+    ("Pianta", "Pianta"),
+    ("Umanoide", "Umanoide"),
+    ("Water C", "Water C"),
+    ("Minerale", "Minerale"),
+    ("Caos", "Caos"),
+    ("Water B", "Water B"),
+    ("Ditto", "Ditto"),
+    ("Drago", "Drago")
+]
+
+
+def load_price_overlay():
+    """
+    Imports the OCR stack (PIL, pytesseract, pynput) the first time the GTL price
+    acquisition is used, configures Tesseract and returns PriceAcquisitionOverlay.
+    """
+    global _ocr_configured
+    from market_overlay import PriceAcquisitionOverlay
+    if not _ocr_configured:
+        try:
+            tesseract_setup.setup_tesseract()
+        except ImportError as e:
+            print(f"[AVVISO] pytesseract non disponibile: {e}")
+        _ocr_configured = True
+    return PriceAcquisitionOverlay
 
 
 # --- Classe AutocompleteCombobox ---
 class AutocompleteCombobox(ttk.Combobox):
-    def set_completion_list(self, completion_list):
+    def set_completion_list(self, completion_list, search_index: SpeciesSearchIndex = None):
+        """search_index can be shared between combos; by default one is built over completion_list."""
         self._completion_list = sorted(completion_list, key=str.lower)
+        self._search_index = search_index if search_index else SpeciesSearchIndex(self._completion_list)
         self._hits = []
         self._hit_index = 0
+        self._query = ""
         self.position = 0
         self.bind('<KeyRelease>', self.handle_keyrelease)
         self['values'] = self._completion_list
 
     def autocomplete(self, delta=0):
         if delta:
-            self.delete(self.position, tk.END)
+            # Cycling through the hits: search again with what the user typed
+            query = self._query
         else:
-            self.position = len(self.get())
-
-        _hits = []
-        prefix = self.get().lower()
+            query = self.get()
+            self._query = query
+            self.position = len(query)
 
-        if not prefix:
+        if not query:
             _hits = self._completion_list[:]
         else:
-            # Optimized search using binary search (bisect)
-            start_index = bisect.bisect_left(self._completion_list, prefix, key=str.lower)
-            for i in range(start_index, len(self._completion_list)):
-                element = self._completion_list[i]
-                if element.lower().startswith(prefix):
-                    _hits.append(element)
-                else:
-                    # List is sorted, so we can stop as soon as prefix doesn't match
-                    break
+            # Ranked fuzzy search: prefix matches first, then substrings and typos
+            _hits = self._search_index.search(query)
 
         if _hits != self._hits:
             self._hit_index = 0
             self._hits = _hits
+            self['values'] = _hits if query else self._completion_list
 
         if _hits:
             self._hit_index = (self._hit_index + delta) % len(self._hits)
-            self.delete(0, tk.END)
-            self.insert(0, self._hits[self._hit_index])
-            self.select_range(self.position, tk.END)
+            hit = self._hits[self._hit_index]
+            is_prefix = hit.lower().startswith(query.lower())
+            # Inline completion only extends the typed text; typo matches replace it on Up/Down
+            if is_prefix or delta:
+                self.delete(0, tk.END)
+                self.insert(0, hit)
+                self.select_range(self.position if is_prefix else 0, tk.END)
 
     def handle_keyrelease(self, event):
         if event.keysym in ("Up", "Down"):
@@ -362,7 +414,7 @@ class PriceInputDialog(tk.Toplevel):
              add_task(stat, "Ditto", "X", display, (stat, "Ditto"))
 
         # Start Overlay
-        overlay = PriceAcquisitionOverlay(
+        overlay = load_price_overlay()(
             self,
             self.price_manager,
             None, # No close callback needed for popup mode
@@ -426,11 +478,11 @@ class PriceInputDialog(tk.Toplevel):
                 return
 
         # Do NOT save to disk. Pass the temporary manager to the evaluator.
-        # Log the prices used for this specific calculation
+        # Log the prices used for this specific calculation (only what differs from the saved book)
         try:
-             logging.info(f"PRICES CONFIRMED (Session Only):\n{json.dumps(temp_pm.prices, indent=2)}")
+             logging.info(DictDiff("PRICES CONFIRMED (Session Only)", flatten_prices(self.price_manager.prices), flatten_prices(temp_pm.prices)))
         except Exception as e:
-             logging.error(f"Failed to log prices: {e}")
+             logging.error("Failed to log prices: %s", e)
 
         self.on_confirm(temp_pm)
         self.destroy()
@@ -454,16 +506,15 @@ class BreedingToolApp(tk.Tk):
         self.title("PokeMMO Breeding Planner")
         self.geometry("1200x800")
 
-        # [NEW] delayed health check display
-        if not tesseract_setup.verify_tesseract_available():
-             messagebox.showwarning(
-                "Tesseract OCR Mancante",
-                "Impossibile trovare Tesseract OCR nella cartella del progetto.\n"
-                "Le funzionalità di scansione dei prezzi non saranno disponibili.\n\n"
-                "Assicurati che la cartella 'Tesseract-OCR' sia presente."
-            )
-
         # --- Caricamento Dati ---
+        # The JSON files are parsed on worker threads while the window is built:
+        # the futures are applied by _load_pokemon_data/_load_gender_data once ready.
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.pokemon_data_future = executor.submit(self._read_json, 'pokemon_data.json')
+        self.gender_data_future = executor.submit(self._read_json, 'pokemon_gender.json')
+        executor.shutdown(wait=False)
+        self.data_loaded = False
+
         self.pokemon_names = []
         self.pokemon_data = {}
         self.natures = [
@@ -474,13 +525,17 @@ class BreedingToolApp(tk.Tk):
         ]
         self.stats = ["PS", "Attacco", "Difesa", "Attacco Speciale", "Difesa Speciale", "Velocità"]
         self.gender_data = {}
-        self._load_pokemon_data()
-        self._load_gender_data()
 
         self.price_manager = PriceManager()
 
         # --- Variabili di stato ---
-        self.owned_pokemon_list = []
+        self.owned_index = OwnedPokemonIndex()
+        # Rows currently shown in the owned table (result of the filter)
+        self.owned_filtered = []
+        self.owned_filter_species_var = tk.StringVar()
+        self.owned_filter_nature_var = tk.StringVar(value="Tutte")
+        self.owned_filter_gender_var = tk.StringVar(value="Tutti")
+        self.owned_filter_ivs_vars = {stat: tk.BooleanVar() for stat in self.stats}
         self.target_ivs_vars = {stat: tk.BooleanVar() for stat in self.stats}
         self.owned_ivs_vars = {stat: tk.BooleanVar() for stat in self.stats}
         self.target_nature_var = tk.StringVar(value=self.natures[0])
@@ -491,58 +546,113 @@ class BreedingToolApp(tk.Tk):
 
         # Stored generated plans for phase 2
         self.generated_plans_cache = []
+        # Generation/evaluation running in the background (BackgroundTask)
+        self.evaluation_task = None
+        # Set by "Usa i migliori": stops the scoring and keeps the plans scored so far
+        self.stop_early_event = None
+        # Owned Pokemon by id, used while drawing the results tree
+        self.owned_map_for_tree = {}
+        # Text reports already built, by plan: id -> (PianoValutato, text)
+        self.text_report_cache = {}
 
         # --- Setup Logging ---
-        log_dir = "debug"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-
-        logging.basicConfig(
-            filename=os.path.join(log_dir, "gui_events.log"),
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            encoding='utf-8' # Force UTF-8 for special characters
-        )
-        # Clear log on startup
-        with open(os.path.join("debug", "gui_events.log"), 'w'):
-             pass
+        # Records are written by a background thread; the previous session is kept as '.1'
+        self.log_listener = setup_logging(os.path.join("debug", "gui_events.log"))
+        # Last state written by _log_state (flat snapshot), to log only the differences
+        self._last_logged_state = None
         logging.info("Application Started")
 
         # --- Creazione dell'interfaccia ---
         self._create_widgets()
 
+        # Data and Tesseract are checked once the window is on screen
+        self.after_idle(self._on_window_ready)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _on_close(self):
+        # Prices edited in the last second are still waiting for the debounced save
+        self.price_manager.flush()
+        logging.info("Application Closed")
+        # Writes the queued records now instead of relying on the exit hook
+        self.log_listener.stop()
+        self.destroy()
+
     def _log_state(self, action_name: str):
-        """Logs the current application state for debugging."""
+        """Logs what changed in the application state since the previous call (formatted off the UI thread)."""
         try:
-            state_dump = {
-                "action": action_name,
-                "timestamp": str(datetime.datetime.now()),
-                "target": {
-                    "species": self.target_species_var.get(),
-                    "nature": self.target_nature_var.get(),
-                    "ivs": [s for s, v in self.target_ivs_vars.items() if v.get()]
-                },
-                "owned_pokemon": [
-                   {
-                       "specie": p.specie,
-                       "sesso": p.sesso,
-                       "natura": p.natura,
-                       "ivs": p.ivs,
-                       "id": p.id_utente
-                   } for p in self.owned_pokemon_list
-                ],
-                "prices": self.price_manager.prices
+            state = {
+                "target.species": self.target_species_var.get(),
+                "target.nature": self.target_nature_var.get(),
+                "target.ivs": ", ".join(s for s, v in self.target_ivs_vars.items() if v.get())
             }
-            logging.info(f"STATE DUMP [{action_name}]:\n{json.dumps(state_dump, indent=2)}")
+            for p in self.owned_pokemon_list:
+                state[f"owned.{p.id_utente}"] = f"{p.specie} | {p.sesso} | {p.natura} | {', '.join(p.ivs)}"
+            state.update(flatten_prices(self.price_manager.prices))
+
+            if state == self._last_logged_state:
+                logging.info("STATE [%s]: nessuna modifica", action_name)
+                return
+            logging.info(DictDiff(f"STATE [{action_name}] {datetime.datetime.now()}", self._last_logged_state, state))
+            self._last_logged_state = state
         except Exception as e:
-            logging.error(f"Failed to log state: {e}")
+            logging.error("Failed to log state: %s", e)
+
+    @staticmethod
+    def _read_json(file_name):
+        """Runs on a worker thread: only parses the file, errors are raised by the future."""
+        with open(os.path.join('data', file_name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _on_window_ready(self):
+        startup_ms = (time.perf_counter() - _APP_START) * 1000
+        print(f"[INFO] Finestra interattiva in {startup_ms:.0f} ms")
+        logging.info("Time to interactive window: %.0f ms", startup_ms)
+
+        # Non-modal health check: the result only updates the status bar
+        BackgroundTask(
+            self,
+            lambda report, cancel_event: tesseract_setup.verify_tesseract_available(),
+            on_done=self._on_tesseract_checked,
+            on_error=lambda e: self._on_tesseract_checked(False)
+        ).start()
+        self._poll_data_loaded()
+
+    def _poll_data_loaded(self):
+        if self.pokemon_data_future.done() and self.gender_data_future.done():
+            self._ensure_data_loaded()
+        else:
+            self.after(20, self._poll_data_loaded)
+
+    def _ensure_data_loaded(self) -> bool:
+        """Applies the loaded data files (waiting for them if needed). False if the app cannot run."""
+        if not self.data_loaded:
+            self.data_loaded = True
+            self._load_pokemon_data()
+            if not self.pokemon_names:
+                return False # Window already destroyed by the error handler
+            self._load_gender_data()
+            # One fuzzy index shared by the species combos, with the dex numbers as aliases
+            # (alternate spellings of the names are built into SpeciesSearchIndex)
+            dex_numbers = {normalize(name): [entry['dex']] for name, entry in self.gender_data.items() if 'dex' in entry}
+            self.species_index = SpeciesSearchIndex(self.pokemon_names, {name: dex_numbers.get(normalize(name), []) for name in self.pokemon_names})
+            self.target_species_combo.set_completion_list(self.pokemon_names, self.species_index)
+            self.owned_species_combo.set_completion_list(self.pokemon_names, self.species_index)
+            ready_ms = (time.perf_counter() - _APP_START) * 1000
+            self.status_label.config(text=f"Pronto ({len(self.pokemon_names)} specie caricate in {ready_ms:.0f} ms)")
+        return bool(self.pokemon_names)
+
+    def _on_tesseract_checked(self, available):
+        if not available:
+            self.ocr_status_label.config(
+                text="Tesseract OCR non trovato nella cartella 'Tesseract-OCR': la scansione dei prezzi non sarà disponibile.",
+                foreground="#B8860B"
+            )
 
     def _load_pokemon_data(self):
         try:
-            with open(os.path.join('data', 'pokemon_data.json'), 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.pokemon_data = data
-                self.pokemon_names = sorted(data.keys())
+            data = self.pokemon_data_future.result()
+            self.pokemon_data = data
+            self.pokemon_names = sorted(data.keys())
         except FileNotFoundError:
             messagebox.showerror("Errore", "File 'pokemon_data.json' non trovato.")
             self.destroy()
@@ -552,17 +662,24 @@ class BreedingToolApp(tk.Tk):
 
     def _load_gender_data(self):
         try:
-            with open(os.path.join('data', 'pokemon_gender.json'), 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # Crea una mappa {nome: dati_sesso}
-                for entry in data:
-                    self.gender_data[entry['name']] = entry
+            data = self.gender_data_future.result()
+            # Crea una mappa {nome: dati_sesso}
+            for entry in data:
+                self.gender_data[entry['name']] = entry
         except FileNotFoundError:
             messagebox.showwarning("Avviso", "File 'pokemon_gender.json' non trovato. Funzionalità automatica sesso disabilitata.")
         except json.JSONDecodeError:
             messagebox.showwarning("Avviso", "File 'pokemon_gender.json' corrotto.")
 
     def _create_widgets(self):
+        # Status bar (data loading, Tesseract health check)
+        status_frame = ttk.Frame(self, padding=(10, 2))
+        status_frame.pack(side="bottom", fill="x")
+        self.status_label = ttk.Label(status_frame, text="Caricamento dati...")
+        self.status_label.pack(side="left")
+        self.ocr_status_label = ttk.Label(status_frame, text="")
+        self.ocr_status_label.pack(side="right")
+
         # Create Main Notebook (Root Component)
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill="both", expand=True)
@@ -617,41 +734,22 @@ class BreedingToolApp(tk.Tk):
         container.rowconfigure(1, weight=1) # Give weight to canvas row
         container.columnconfigure(0, weight=1) # Give weight to canvas column
 
-        # Fixed Stats for GTL
-        gtl_stats = ["Base", "PS", "Attacco", "Difesa", "Attacco Speciale", "Difesa Speciale", "Velocità"]
-
-        # Egg Groups (Display -> Internal Key)
-        egg_groups_map = [
-            ("Mostro", "Mostro"),
-            ("Water A", "Water A"),
-            ("Coleottero", "Coleottero"),
-            ("Volante", "Volante"),
-            ("Campo", "Campo"),
-            ("Folletto", "Folletto"),
-            ("Pianta", "Pianta"),
-            ("Umanoide", "Umanoide"),
-            ("Water C", "Water C"),
-            ("Minerale", "Minerale"),
-            ("Caos", "Caos"),
-            ("Water B", "Water B"),
-            ("Ditto", "Ditto"),
-            ("Drago", "Drago")
-        ]
-
         # Headers
         ttk.Label(scrollable_frame, text="Stat", font=("Arial", 9, "bold")).grid(row=0, column=0, padx=5, pady=5)
-        for col_idx, (display_name, key) in enumerate(egg_groups_map):
+        for col_idx, (display_name, key) in enumerate(GTL_EGG_GROUPS):
             ttk.Label(scrollable_frame, text=display_name, font=("Arial", 9, "bold")).grid(row=0, column=col_idx + 1, padx=2, pady=5)
 
         # Rows
         self.gtl_inputs = {}
-        for row_idx, stat in enumerate(gtl_stats):
+        # Price shown by each cell, (stat, key) -> int: only cells whose value changes are saved or redrawn
+        self.gtl_cell_values = {}
+        for row_idx, stat in enumerate(GTL_STATS):
             row = row_idx + 1
             ttk.Label(scrollable_frame, text=stat).grid(row=row, column=0, padx=5, pady=2, sticky="w")
 
             self.gtl_inputs[stat] = {}
 
-            for col_idx, (display_name, key) in enumerate(egg_groups_map):
+            for col_idx, (display_name, key) in enumerate(GTL_EGG_GROUPS):
                 entry = ttk.Entry(scrollable_frame, width=8)
                 entry.grid(row=row, column=col_idx + 1, padx=1, pady=1)
 
@@ -662,6 +760,7 @@ class BreedingToolApp(tk.Tk):
                 val = self.price_manager.get_price(stat, category, gender)
                 if val != 999999999:
                     entry.insert(0, str(val))
+                self.gtl_cell_values[(stat, key)] = val
 
                 # Bind events to save
                 entry.bind("<FocusOut>", lambda e, s=stat, c=category, g=gender, ent=entry: self._save_gtl_price(s, c, g, ent))
@@ -672,49 +771,31 @@ class BreedingToolApp(tk.Tk):
         # Save Button (Explicit)
         btn_frame = ttk.Frame(parent)
         btn_frame.pack(pady=5)
-        ttk.Button(btn_frame, text="Salva Prezzi GTL", command=self.price_manager.save_prices).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Salva Prezzi GTL", command=lambda: self.price_manager.request_save(0)).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Acquisizione Prezzi (Auto)", command=self._start_auto_acquisition).pack(side="left", padx=5)
 
     def _start_auto_acquisition(self):
-        overlay = PriceAcquisitionOverlay(self, self.price_manager, self._refresh_gtl_view)
+        overlay = load_price_overlay()(self, self.price_manager, self._refresh_gtl_view)
         overlay.start()
 
     def _refresh_gtl_view(self):
-        """Reloads prices from PriceManager into the GTL input fields."""
-        # Fixed Stats for GTL
-        gtl_stats = ["Base", "PS", "Attacco", "Difesa", "Attacco Speciale", "Difesa Speciale", "Velocità"]
-
-        # Egg Groups (Display -> Internal Key)
-        egg_groups_map = [
-            ("Mostro", "Mostro"),
-            ("Water A", "Water A"),
-            ("Coleottero", "Coleottero"),
-            ("Volante", "Volante"),
-            ("Campo", "Campo"),
-            ("Folletto", "Folletto"),
-            ("Pianta", "Pianta"),
-            ("Umanoide", "Umanoide"),
-            ("Water C", "Water C"),
-            ("Minerale", "Minerale"),
-            ("Caos", "Caos"),
-            ("Water B", "Water B"),
-            ("Ditto", "Ditto"),
-            ("Drago", "Drago")
-        ]
-
-        for stat in gtl_stats:
-            for _, key in egg_groups_map:
+        """Reloads prices from PriceManager into the GTL input fields (only the cells that changed)."""
+        for stat in GTL_STATS:
+            for _, key in GTL_EGG_GROUPS:
                  # Determine gender/category
                 category = key
                 gender = "X" if key == "Ditto" else "M"
 
                 val = self.price_manager.get_price(stat, category, gender)
+                if self.gtl_cell_values.get((stat, key)) == val:
+                    continue
 
                 entry = self.gtl_inputs.get(stat, {}).get(key)
                 if entry:
                     entry.delete(0, tk.END)
                     if val != 999999999:
                         entry.insert(0, str(val))
+                    self.gtl_cell_values[(stat, key)] = val
 
     def _save_gtl_price(self, stat, category, gender, entry_widget):
         try:
@@ -723,9 +804,16 @@ class BreedingToolApp(tk.Tk):
                 val = 999999999
             else:
                 val = int(val_str)
-            self.price_manager.set_price(stat, category, gender, val)
         except ValueError:
-            pass # Ignore invalid input during focus out
+            return # Ignore invalid input during focus out
+
+        # Leaving a cell without editing it is not a change
+        if self.gtl_cell_values.get((stat, category)) == val:
+            return
+        self.gtl_cell_values[(stat, category)] = val
+        self.price_manager.set_price(stat, category, gender, val)
+        # Edits in quick succession end up in a single write, off the UI thread
+        self.price_manager.request_save()
 
     def _create_target_section(self, parent):
         target_frame = ttk.LabelFrame(parent, text="Pokémon Target", padding="10")
@@ -733,9 +821,9 @@ class BreedingToolApp(tk.Tk):
         target_frame.columnconfigure(1, weight=1)
 
         ttk.Label(target_frame, text="Specie:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
-        target_combo = AutocompleteCombobox(target_frame, textvariable=self.target_species_var)
-        target_combo.set_completion_list(self.pokemon_names)
-        target_combo.grid(row=0, column=1, sticky="ew", padx=5, pady=2)
+        self.target_species_combo = AutocompleteCombobox(target_frame, textvariable=self.target_species_var)
+        self.target_species_combo.set_completion_list(self.pokemon_names)
+        self.target_species_combo.grid(row=0, column=1, sticky="ew", padx=5, pady=2)
 
         ttk.Label(target_frame, text="IVs Desiderate:").grid(row=1, column=0, sticky="w", padx=5, pady=5)
         iv_frame = ttk.Frame(target_frame)
@@ -757,9 +845,9 @@ class BreedingToolApp(tk.Tk):
         add_form.columnconfigure(1, weight=1)
 
         ttk.Label(add_form, text="Specie:").grid(row=0, column=0, sticky="w")
-        owned_combo = AutocompleteCombobox(add_form, textvariable=self.owned_species_var)
-        owned_combo.set_completion_list(self.pokemon_names)
-        owned_combo.grid(row=0, column=1, columnspan=2, sticky="ew", pady=2)
+        self.owned_species_combo = AutocompleteCombobox(add_form, textvariable=self.owned_species_var)
+        self.owned_species_combo.set_completion_list(self.pokemon_names)
+        self.owned_species_combo.grid(row=0, column=1, columnspan=2, sticky="ew", pady=2)
 
         # Callback per aggiornamento automatico sesso
         self.owned_species_var.trace('w', self._on_species_change)
@@ -784,25 +872,37 @@ class BreedingToolApp(tk.Tk):
         list_frame.grid(row=1, column=0, sticky="nsew", pady=10)
         owned_frame.rowconfigure(1, weight=1)
 
-        self.owned_pokemon_tree = ttk.Treeview(list_frame, columns=("ID", "Specie", "Sesso", "IVs", "Natura"), show="headings", height=10)
-        self.owned_pokemon_tree.heading("ID", text="ID")
-        self.owned_pokemon_tree.heading("Specie", text="Specie")
-        self.owned_pokemon_tree.heading("Sesso", text="Sesso")
-        self.owned_pokemon_tree.heading("IVs", text="IVs")
-        self.owned_pokemon_tree.heading("Natura", text="Natura")
-        self.owned_pokemon_tree.column("ID", width=0, stretch=tk.NO)
-        self.owned_pokemon_tree.column("Specie", width=100)
-        self.owned_pokemon_tree.column("Sesso", width=80)
-        self.owned_pokemon_tree.column("IVs", width=200)
-        self.owned_pokemon_tree.column("Natura", width=100)
-
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.owned_pokemon_tree.yview)
-        self.owned_pokemon_tree.configure(yscrollcommand=scrollbar.set)
-
-        self.owned_pokemon_tree.grid(row=0, column=0, sticky="nsew")
-        scrollbar.grid(row=0, column=1, sticky="ns")
+        # Filter bar: every change re-queries the in-memory index
+        filter_frame = ttk.Frame(list_frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        filter_frame.columnconfigure(1, weight=1)
+        ttk.Label(filter_frame, text="Filtro:").grid(row=0, column=0, sticky="w")
+        ttk.Entry(filter_frame, textvariable=self.owned_filter_species_var).grid(row=0, column=1, sticky="ew", padx=2)
+        ttk.Combobox(filter_frame, textvariable=self.owned_filter_gender_var, values=["Tutti", "Maschio", "Femmina", "Genderless"], state="readonly", width=10).grid(row=0, column=2, padx=2)
+        ttk.Combobox(filter_frame, textvariable=self.owned_filter_nature_var, values=["Tutte"] + self.natures, state="readonly", width=10).grid(row=0, column=3, padx=2)
+        iv_filter_button = ttk.Menubutton(filter_frame, text="IVs")
+        iv_filter_menu = tk.Menu(iv_filter_button, tearoff=0)
+        for stat in self.stats:
+            iv_filter_menu.add_checkbutton(label=stat, variable=self.owned_filter_ivs_vars[stat])
+        iv_filter_button["menu"] = iv_filter_menu
+        iv_filter_button.grid(row=0, column=4, padx=2)
+        self.owned_count_label = ttk.Label(filter_frame, text="0/0")
+        self.owned_count_label.grid(row=0, column=5, padx=(5, 0))
+
+        for var in [self.owned_filter_species_var, self.owned_filter_nature_var, self.owned_filter_gender_var] + list(self.owned_filter_ivs_vars.values()):
+            var.trace('w', lambda *args: self._refresh_owned_table())
+
+        self.owned_pokemon_table = VirtualTreeview(
+            list_frame,
+            columns=("Specie", "Sesso", "IVs", "Natura"),
+            headings=("Specie", "Sesso", "IVs", "Natura"),
+            widths=(100, 80, 200, 100),
+            height=10,
+            selectmode="extended"
+        )
+        self.owned_pokemon_table.grid(row=1, column=0, columnspan=2, sticky="nsew")
         list_frame.columnconfigure(0, weight=1)
-        list_frame.rowconfigure(0, weight=1)
+        list_frame.rowconfigure(1, weight=1)
 
         ttk.Button(owned_frame, text="Rimuovi Selezionato", command=self._remove_owned_pokemon).grid(row=2, column=0, sticky="e", pady=5)
 
@@ -812,15 +912,45 @@ class BreedingToolApp(tk.Tk):
         actions_frame.columnconfigure(0, weight=1)
         actions_frame.columnconfigure(1, weight=1)
 
-        ttk.Button(actions_frame, text="Genera e Valuta Piani", command=self._run_evaluation_phase_1).grid(row=0, column=0, padx=5, sticky="ew")
-        ttk.Button(actions_frame, text="Reset", command=self._reset_all).grid(row=0, column=1, padx=5, sticky="ew")
+        self.generate_button = ttk.Button(actions_frame, text="Genera e Valuta Piani", command=self._run_evaluation_phase_1)
+        self.generate_button.grid(row=0, column=0, padx=5, sticky="ew")
+        self.reset_button = ttk.Button(actions_frame, text="Reset", command=self._reset_all)
+        self.reset_button.grid(row=0, column=1, padx=5, sticky="ew")
+
+        # Progress of the background evaluation (shown only while it runs)
+        self.progress_frame = ttk.Frame(actions_frame)
+        self.progress_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(10, 0))
+        self.progress_frame.columnconfigure(0, weight=1)
+        self.progress_label = ttk.Label(self.progress_frame, text="")
+        self.progress_label.grid(row=0, column=0, columnspan=3, sticky="w", padx=5)
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode="determinate")
+        self.progress_bar.grid(row=1, column=0, sticky="ew", padx=5)
+        self.stop_early_button = ttk.Button(self.progress_frame, text="Usa i migliori", command=self._stop_evaluation_early, state="disabled")
+        self.stop_early_button.grid(row=1, column=1, padx=5)
+        ttk.Button(self.progress_frame, text="Annulla", command=self._cancel_evaluation).grid(row=1, column=2, padx=5)
+        self.progress_frame.grid_remove()
 
     def _create_results_section(self, parent):
-        results_notebook = ttk.Notebook(parent)
-        results_notebook.grid(row=0, column=0, sticky="nsew")
+        results_paned = ttk.PanedWindow(parent, orient="horizontal")
+        results_paned.grid(row=0, column=0, sticky="nsew")
         parent.rowconfigure(0, weight=1)
         parent.columnconfigure(0, weight=1)
 
+        # Ranked list of every costed plan: selecting a row shows it in the tabs on the right
+        ranking_frame = ttk.LabelFrame(results_paned, text="Classifica Piani", padding="5")
+        self.ranked_plans_list = VirtualTreeview(
+            ranking_frame,
+            columns=("rank", "cost", "score", "owned", "bought"),
+            headings=("#", "Costo", "Punteggio", "Posseduti", "Acquisti"),
+            widths=(35, 90, 70, 70, 65),
+            on_select=self._on_ranked_plan_selected
+        )
+        self.ranked_plans_list.pack(fill="both", expand=True)
+        results_paned.add(ranking_frame, weight=1)
+
+        results_notebook = ttk.Notebook(results_paned)
+        results_paned.add(results_notebook, weight=3)
+
         tree_frame = ttk.Frame(results_notebook, padding="5")
         results_notebook.add(tree_frame, text="Albero Genealogico")
         tree_frame.rowconfigure(0, weight=1)
@@ -829,7 +959,7 @@ class BreedingToolApp(tk.Tk):
         self.results_canvas = tk.Canvas(tree_frame, bg="white")
         h_scroll = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.results_canvas.xview)
         v_scroll = ttk.Scrollbar(tree_frame, orient="vertical", command=self.results_canvas.yview)
-        self.results_canvas.configure(xscrollcommand=h_scroll.set, yscrollcommand=v_scroll.set)
+        self.tree_view = PlanTreeView(self.results_canvas, self._describe_tree_node, xscrollcommand=h_scroll.set, yscrollcommand=v_scroll.set)
         self.results_canvas.grid(row=0, column=0, sticky="nsew")
         h_scroll.grid(row=1, column=0, sticky="ew")
         v_scroll.grid(row=0, column=1, sticky="ns")
@@ -846,6 +976,8 @@ class BreedingToolApp(tk.Tk):
         text_scroll.grid(row=0, column=1, sticky="ns")
 
     def _add_owned_pokemon(self):
+        if not self._ensure_data_loaded():
+            return
         specie = self.owned_species_var.get()
         if not specie or specie not in self.pokemon_names:
             messagebox.showwarning("Input Invalido", "Seleziona una specie valida per il Pokémon.")
@@ -860,11 +992,7 @@ class BreedingToolApp(tk.Tk):
 
         pokemon_id = str(uuid.uuid4())
         new_pokemon = PokemonPosseduto(id_utente=pokemon_id, specie=specie, ivs=ivs, natura=natura, sesso=sesso)
-        self.owned_pokemon_list.append(new_pokemon)
-
-        iv_str = ", ".join(ivs) if ivs else "Nessuno"
-        natura_str = natura if natura else "Nessuna"
-        self.owned_pokemon_tree.insert("", "end", iid=pokemon_id, values=(pokemon_id, specie, sesso, iv_str, natura_str))
+        self._add_owned_pokemon_bulk([new_pokemon])
 
         self.owned_species_var.set("")
         for var in self.owned_ivs_vars.values():
@@ -898,16 +1026,50 @@ class BreedingToolApp(tk.Tk):
             self.owned_gender_combo.config(state="readonly")
 
     def _remove_owned_pokemon(self):
-        selected_items = self.owned_pokemon_tree.selection()
-        if not selected_items:
+        selected_rows = self.owned_pokemon_table.selected_indices()
+        if not selected_rows:
             messagebox.showwarning("Nessuna Selezione", "Seleziona un Pokémon dalla lista per rimuoverlo.")
             return
-        for item_id in selected_items:
-            self.owned_pokemon_list = [p for p in self.owned_pokemon_list if p.id_utente != item_id]
-            self.owned_pokemon_tree.delete(item_id)
+        self._remove_owned_pokemon_bulk([self.owned_filtered[i].id_utente for i in selected_rows])
+
+    @property
+    def owned_pokemon_list(self):
+        """Snapshot of every owned Pokemon, in insertion order."""
+        return self.owned_index.all()
+
+    def _add_owned_pokemon_bulk(self, pokemon_list):
+        """Adds many Pokemon with a single refresh of the table."""
+        self.owned_index.add_many(pokemon_list)
+        self._refresh_owned_table()
+
+    def _remove_owned_pokemon_bulk(self, pokemon_ids):
+        """Removes many Pokemon (by id_utente) with a single refresh of the table."""
+        self.owned_index.remove_many(pokemon_ids)
+        self._refresh_owned_table()
+
+    def _refresh_owned_table(self):
+        """Runs the current filter on the index and shows the result."""
+        nature = self.owned_filter_nature_var.get()
+        gender = self.owned_filter_gender_var.get()
+        self.owned_filtered = self.owned_index.query(
+            species=self.owned_filter_species_var.get(),
+            ivs=[stat for stat, var in self.owned_filter_ivs_vars.items() if var.get()],
+            nature=ANY if nature == "Tutte" else (None if nature == "Nessuna" else nature),
+            gender=ANY if gender == "Tutti" else gender
+        )
+        rows = [
+            (p.specie, p.sesso, ", ".join(p.ivs) if p.ivs else "Nessuno", p.natura if p.natura else "Nessuna")
+            for p in self.owned_filtered
+        ]
+        self.owned_pokemon_table.set_rows(rows)
+        self.owned_count_label.config(text=f"{len(self.owned_filtered)}/{len(self.owned_index)}")
 
     def _run_evaluation_phase_1(self):
-        """Generates plans and selects candidates, then opens price dialog."""
+        """Generates and scores plans in the background, then opens the price dialog."""
+        if self.evaluation_task and self.evaluation_task.running:
+            return
+        if not self._ensure_data_loaded():
+            return
         self._log_state("START_EVALUATION")
         target_ivs = [stat for stat, var in self.target_ivs_vars.items() if var.get()]
         target_nature = self.target_nature_var.get()
@@ -924,87 +1086,67 @@ class BreedingToolApp(tk.Tk):
 
         self._clear_results()
         self.results_canvas.create_text(300, 100, text=f"Generazione piani per {len(target_ivs)}IV in corso...", font=("Arial", 12))
-        self.update_idletasks()
 
-        try:
-            piani_generati = core_engine.esegui_generazione(target_ivs, target_nature)
-        except Exception as e:
-            messagebox.showerror("Errore Engine", f"Si è verificato un errore durante la generazione dei piani:\n{e}")
-            self._clear_results()
-            return
-
-        if not piani_generati:
-            messagebox.showinfo("Nessun Piano", f"Nessun piano trovato.")
-            self._clear_results()
-            return
+        # The worker thread only sees snapshots of the GUI state
+        owned_snapshot = list(self.owned_pokemon_list)
+        error_title = ["Errore Engine"]
+        stop_early = threading.Event()
+        self.stop_early_event = stop_early
 
-        # Initial Evaluation (Score Only)
-        try:
-            piani_valutati = plan_evaluator.valuta_piani(
-                piani_generati, 
-                self.owned_pokemon_list, 
-                target_species, 
-                self.pokemon_data, 
-                self.gender_data
+        def work(report, cancel_event):
+            piani_generati = core_engine.esegui_generazione(
+                target_ivs,
+                target_nature,
+                progress_callback=lambda done, total: report("Generazione piani", done, total),
+                cancel_event=cancel_event
             )
-        except Exception as e:
-            messagebox.showerror("Errore Valutatore", f"Si è verificato un errore:\n{e}")
+            if not piani_generati or cancel_event.is_set():
+                return []
+
+            # Initial Evaluation (Score Only)
+            error_title[0] = "Errore Valutatore"
+            return plan_evaluator.valuta_piani(
+                piani_generati,
+                owned_snapshot,
+                target_species,
+                self.pokemon_data,
+                self.gender_data,
+                progress_callback=lambda done, total: report("Valutazione piani", done, total),
+                cancel_event=stop_early,
+                top_k_callback=self.evaluation_task.publish,
+                top_k=PIANI_IN_CLASSIFICA
+            )
+
+        self._start_evaluation_task(
+            work,
+            lambda piani_valutati: self._on_phase_1_done(piani_valutati, target_species, target_nature),
+            error_title,
+            on_partial=self._on_best_so_far
+        )
+
+    def _on_best_so_far(self, best_plans):
+        """Shows the current leader while the evaluation is still running."""
+        self._display_plan(best_plans[0])
+        self.results_text.config(state="normal")
+        self.results_text.insert("1.0", f"[PROVVISORIO] Valutazione in corso: miglior piano finora ({len(best_plans)} candidati in classifica).\n\n")
+        self.results_text.config(state="disabled")
+        self.stop_early_button.config(state="normal")
+
+    def _on_phase_1_done(self, piani_valutati, target_species, target_nature):
+        if not piani_valutati:
+            messagebox.showinfo("Nessun Piano", f"Nessun piano trovato.")
             self._clear_results()
             return
 
-        # Keep Top candidates (e.g. Top 20)
-        self.generated_plans_cache = piani_valutati[:20]
-
-        # Analyze Ingredients for Price Dialog
-        required_stats = set()
-
-        # Helper to traverse plan and find holes
-        def find_holes(plan_val):
-            holes = set()
-            piano = plan_val.piano_originale
-            mappa = plan_val.mappa_assegnazioni
-
-            # Map nodes
-            node_map = {}
-            child_to_parents = {}
-            for l in piano.livelli:
-                for acc in l.accoppiamenti:
-                    node_map[id(acc.genitore1)] = acc.genitore1
-                    node_map[id(acc.genitore2)] = acc.genitore2
-                    node_map[id(acc.figlio)] = acc.figlio
-                    child_to_parents[id(acc.figlio)] = (id(acc.genitore1), id(acc.genitore2))
-
-            def traverse(node_id):
-                if node_id in mappa:
-                    return # Owned
-
-                # Check if leaf
-                if node_id not in child_to_parents:
-                    # Is a hole
-                    node = node_map[node_id]
-                    # Get stats
-                    for r in node.ruoli_iv:
-                        stat = piano.legenda_ruoli.get(r)
-                        if stat: holes.add(stat)
-                    if node.ruolo_natura:
-                        n = piano.legenda_ruoli.get(node.ruolo_natura)
-                        if n: holes.add("Natura")
-                else:
-                    p1, p2 = child_to_parents[node_id]
-                    traverse(p1)
-                    traverse(p2)
-
-            # Start from root
-            final_node = piano.livelli[-1].accoppiamenti[0].figlio
-            traverse(id(final_node))
-            return holes
+        # Every evaluated plan is a candidate for the costing
+        self.generated_plans_cache = piani_valutati
 
-        for p in self.generated_plans_cache:
-            required_stats.update(find_holes(p))
+        # Prices needed by any plan (unfilled leaves computed by the evaluator)
+        required_stats = set(plan_evaluator.aggrega_requisiti_mancanti(self.generated_plans_cache))
 
         if not required_stats:
-            # No holes! All owned. Just show result.
-            self._display_plan(self.generated_plans_cache[0])
+            # No holes! All owned. Just show result (valuta_piani ranks the best ones first).
+            self._show_ranked_plans(self.generated_plans_cache[:PIANI_IN_CLASSIFICA])
             return
 
         # Extract Relevant Egg Groups
@@ -1024,38 +1166,134 @@ class BreedingToolApp(tk.Tk):
         )
 
     def _run_evaluation_phase_2(self, price_manager_override=None):
-        """Calculates costs using entered prices and shows best result."""
+        """Calculates costs in the background using entered prices and shows best result."""
+        if self.evaluation_task and self.evaluation_task.running:
+            return
         target_species = self.target_species_var.get()
         target_nature = self.target_nature_var.get()
         if target_nature == "Nessuna": target_nature = None
 
-        # Use the override if provided (from Popup), otherwise use the main one (shouldn't happen in normal flow but safe fallback)
-        pm_to_use = price_manager_override if price_manager_override else self.price_manager
+        # Use the override if provided (from Popup), otherwise a snapshot of the main one,
+        # so that edits in the GTL tab cannot race with the worker thread
+        pm_to_use = price_manager_override if price_manager_override else copy.deepcopy(self.price_manager)
+        owned_snapshot = list(self.owned_pokemon_list)
+        candidates = list(self.generated_plans_cache)
+        target_ivs = list(candidates[0].piano_originale.ivs_target) if candidates else []
 
-        # Re-evaluate cost for cached plans
-        for p_val in self.generated_plans_cache:
-            ev = plan_evaluator.PlanEvaluator(
-                p_val.piano_originale,
-                self.owned_pokemon_list,
+        self._clear_results()
+        self.results_canvas.create_text(300, 100, text="Calcolo dei costi in corso...", font=("Arial", 12))
+
+        def work(report, cancel_event):
+            # The exact search over IV subsets needs the prices: its plans join the candidates here
+            if target_ivs:
+                optimal_plans = dp_engine.genera_piani_ottimi(
+                    target_ivs, target_nature, owned_snapshot, pm_to_use, target_species,
+                    self.pokemon_data, self.gender_data,
+                    id_iniziale=max(p.piano_originale.id_piano for p in candidates) + 1,
+                    cancel_event=cancel_event
+                )
+                candidates.extend(plan_evaluator.valuta_piani(
+                    optimal_plans, owned_snapshot, target_species, self.pokemon_data, self.gender_data,
+                    cancel_event=cancel_event
+                ))
+                if cancel_event.is_set():
+                    return None
+
+            # Branch-and-bound: only the plans that can still be among the cheapest are priced
+            costati = plan_evaluator.costa_piani(
+                candidates,
+                owned_snapshot,
                 pm_to_use,
                 target_species,
                 self.pokemon_data,
                 target_nature,
-                self.gender_data # Pass Gender Data
+                self.gender_data,
+                top_k=PIANI_IN_CLASSIFICA,
+                progress_callback=lambda done, total: report("Calcolo costi", done, total),
+                cancel_event=cancel_event
             )
-            ev._build_tree_maps()
-            ev._identify_mandatory_nodes() # Important for cost calculation context
-            ev.update_cost(p_val)
+            if cancel_event.is_set():
+                return None
+            return costati
+
+        self._start_evaluation_task(work, self._on_phase_2_done, ["Errore Valutatore"])
+
+    def _on_phase_2_done(self, candidates):
+        self._show_ranked_plans(candidates)
+
+    def _show_ranked_plans(self, plans):
+        """Fills the ranked list (best first) and shows the best plan."""
+        self.generated_plans_cache = plans
+        # Costs may have changed since the reports were built
+        self.text_report_cache.clear()
+
+        rows = []
+        for rank, p in enumerate(plans, start=1):
+            cost_str = f"{p.costo_totale:,}".replace(",", ".")
+            if p.costo_totale >= 999999990: cost_str = "N/D"
+            rows.append((rank, cost_str, f"{p.punteggio:.1f}", len(p.mappa_assegnazioni), plan_evaluator.conta_acquisti(p)))
+        self.ranked_plans_list.set_rows(rows)
+        if plans:
+            self.ranked_plans_list.select(0)
+
+    def _on_ranked_plan_selected(self, index):
+        if index < len(self.generated_plans_cache):
+            self._display_plan(self.generated_plans_cache[index])
+
+    def _start_evaluation_task(self, work, on_done, error_title, on_partial=None):
+        """Runs 'work' on a BackgroundTask, showing progress and the cancel button."""
+        def finish():
+            self.progress_frame.grid_remove()
+            self.stop_early_button.config(state="disabled")
+            self.stop_early_event = None
+            self.generate_button.config(state="normal")
+            self.reset_button.config(state="normal")
+            self.evaluation_task = None
+
+        def done(result):
+            finish()
+            on_done(result)
+
+        def error(e):
+            finish()
+            messagebox.showerror(error_title[0], f"Si è verificato un errore:\n{e}")
+            self._clear_results()
+
+        def cancelled():
+            finish()
+            self._clear_results()
+            self.results_canvas.create_text(300, 100, text="Operazione annullata.", font=("Arial", 12))
 
-        # Sort: Primary Cost (Asc), Secondary Score (Desc)
-        self.generated_plans_cache.sort(key=lambda p: p.punteggio, reverse=True) # Ensure score priority
-        self.generated_plans_cache.sort(key=lambda p: p.costo_totale) # Then sort by cost (Cheapest first)
+        self.generate_button.config(state="disabled")
+        self.reset_button.config(state="disabled")
+        self.progress_label.config(text="Avvio...")
+        self.progress_bar.config(value=0, maximum=1)
+        self.progress_frame.grid()
 
-        best = self.generated_plans_cache[0]
-        self._display_plan(best)
+        self.evaluation_task = BackgroundTask(self, work, on_progress=self._on_evaluation_progress, on_done=done, on_error=error, on_cancelled=cancelled, on_partial=on_partial)
+        self.evaluation_task.start()
+
+    def _on_evaluation_progress(self, stage, done, total):
+        self.progress_label.config(text=f"{stage}: {done}/{total}")
+        self.progress_bar.config(value=done, maximum=max(total, 1))
+
+    def _cancel_evaluation(self):
+        if self.evaluation_task:
+            self.progress_label.config(text="Annullamento...")
+            if self.stop_early_event:
+                self.stop_early_event.set()
+            self.evaluation_task.cancel()
+
+    def _stop_evaluation_early(self):
+        if self.stop_early_event:
+            self.progress_label.config(text="Interruzione, uso dei piani valutati finora...")
+            self.stop_early_event.set()
 
     def _display_plan(self, piano_valutato: PianoValutato):
-        self._clear_results()
+        # The tree is not wiped: the view reuses the items of the previous plan when it can
+        self.results_text.config(state="normal")
+        self.results_text.delete("1.0", tk.END)
+        self.results_text.config(state="disabled")
         try:
             self._display_tree_plan(piano_valutato)
         except Exception as e:
@@ -1073,6 +1311,12 @@ class BreedingToolApp(tk.Tk):
         self.results_text.config(state="normal")
         self.results_text.delete("1.0", tk.END) # Safety clear
 
+        cached = self.text_report_cache.get(id(piano_valutato))
+        if cached is not None and cached[0] is piano_valutato:
+            self.results_text.insert("1.0", cached[1])
+            self.results_text.config(state="disabled")
+            return
+
         piano = piano_valutato.piano_originale
         legenda = piano.legenda_ruoli
         costo = piano_valutato.costo_totale
@@ -1107,39 +1351,40 @@ class BreedingToolApp(tk.Tk):
                 output.append(f"  {gen1_str:<45} + {gen2_str:<45} -> {figlio_str}\n")
 
         self.results_text.insert("1.0", "".join(output))
+        self.text_report_cache[id(piano_valutato)] = (piano_valutato, "".join(output))
         
         # Log the final text plan
         try:
-            logging.info("FINAL TEXT PLAN GENERATED:\n" + "".join(output))
+            # Reached only the first time a plan is shown (later displays use text_report_cache)
+            logging.info("FINAL TEXT PLAN GENERATED:\n%s", self.text_report_cache[id(piano_valutato)][1])
         except Exception as e:
-            logging.error(f"Failed to log text plan: {e}")
+            logging.error("Failed to log text plan: %s", e)
 
         self.results_text.config(state="disabled")
 
     def _display_tree_plan(self, piano_valutato: PianoValutato):
         self.update_idletasks()
-        piano = piano_valutato.piano_originale
-        assegnazioni = piano_valutato.mappa_assegnazioni
-        owned_pokemon_map = {p.id_utente: p for p in self.owned_pokemon_list}
-
-        child_to_parents_map = {}
-        for livello in piano.livelli:
-            for acc in livello.accoppiamenti:
-                child_id = id(acc.figlio)
-                child_to_parents_map[child_id] = (acc.genitore1, acc.genitore2)
+        self.owned_map_for_tree = {p.id_utente: p for p in self.owned_pokemon_list}
+        self.tree_view.show(piano_valutato)
 
-        final_target = piano.livelli[-1].accoppiamenti[0].figlio
-        self.node_widths = {}
-        self._calculate_node_widths(final_target, child_to_parents_map, assegnazioni)
+    def _describe_tree_node(self, node, piano_valutato):
+        """Text and colors of a node of the results tree: (text, fill, outline, bold)."""
+        node_id = id(node)
+        is_owned = node_id in piano_valutato.mappa_assegnazioni
+        is_bought = node_id in piano_valutato.mappa_acquisti
 
-        total_width = self.node_widths.get(id(final_target), 120)
-        start_x = total_width / 2 + 50
+        fill_color = "#ADD8E6"
+        outline_color = "#00008B"
 
-        self._draw_node(final_target, start_x, 50, child_to_parents_map, piano_valutato, owned_pokemon_map, piano.legenda_ruoli)
+        if is_owned:
+            fill_color = "#90EE90"
+            outline_color = "#006400"
+        elif is_bought:
+            fill_color = "#FFD700" # Gold for bought
+            outline_color = "#B8860B"
 
-        bbox = self.results_canvas.bbox("all")
-        if bbox:
-            self.results_canvas.config(scrollregion=(0, 0, total_width + 100, bbox[3] + 50))
+        text = self._get_node_text(node, piano_valutato.piano_originale.legenda_ruoli, piano_valutato, self.owned_map_for_tree)
+        return text, fill_color, outline_color, is_owned
 
     def _get_node_text(self, node, legenda, piano_valutato, owned_map):
         node_id = id(node)
@@ -1172,60 +1417,10 @@ class BreedingToolApp(tk.Tk):
         else:
             return f"{iv_str}\n[{len(iv_names)}IV]"
 
-    def _calculate_node_widths(self, node, child_to_parents_map, assegnazioni):
-        node_id = id(node)
-        node_width = 120
-        h_spacing = 30
-        is_owned = node_id in assegnazioni
-        if is_owned or node_id not in child_to_parents_map:
-            self.node_widths[node_id] = node_width
-            return node_width
-        if node_id in self.node_widths:
-            return self.node_widths[node_id]
-        genitore1, genitore2 = child_to_parents_map[node_id]
-        width1 = self._calculate_node_widths(genitore1, child_to_parents_map, assegnazioni)
-        width2 = self._calculate_node_widths(genitore2, child_to_parents_map, assegnazioni)
-        total_width = width1 + width2 + h_spacing
-        self.node_widths[node_id] = total_width
-        return total_width
-
-    def _draw_node(self, node, x, y, child_to_parents_map, piano_valutato, owned_map, legenda):
-        node_id = id(node)
-        node_width, node_height = 120, 50
-        v_spacing = 90
-        h_spacing = 30
-        is_owned = node_id in piano_valutato.mappa_assegnazioni
-        is_bought = node_id in piano_valutato.mappa_acquisti
-
-        fill_color = "#ADD8E6"
-        outline_color = "#00008B"
-
-        if is_owned:
-            fill_color = "#90EE90"
-            outline_color = "#006400"
-        elif is_bought:
-            fill_color = "#FFD700" # Gold for bought
-            outline_color = "#B8860B"
-
-        self.results_canvas.create_rectangle(x - node_width/2, y - node_height/2, x + node_width/2, y + node_height/2, fill=fill_color, outline=outline_color, width=2)
-        text = self._get_node_text(node, legenda, piano_valutato, owned_map)
-        self.results_canvas.create_text(x, y, text=text, font=("Arial", 8, "bold" if is_owned else "normal"), justify=tk.CENTER)
-
-        if not is_owned and node_id in child_to_parents_map:
-            genitore1, genitore2 = child_to_parents_map[node_id]
-            width1 = self.node_widths.get(id(genitore1), node_width)
-            width2 = self.node_widths.get(id(genitore2), node_width)
-            new_y = y + v_spacing
-            start_x1 = x - (width1 + width2 + h_spacing) / 2
-            x1 = start_x1 + width1 / 2
-            x2 = start_x1 + width1 + h_spacing + width2 / 2
-            self.results_canvas.create_line(x, y + node_height/2, x1, new_y - node_height/2, width=1.5)
-            self.results_canvas.create_line(x, y + node_height/2, x2, new_y - node_height/2, width=1.5)
-            self._draw_node(genitore1, x1, new_y, child_to_parents_map, piano_valutato, owned_map, legenda)
-            self._draw_node(genitore2, x2, new_y, child_to_parents_map, piano_valutato, owned_map, legenda)
-
     def _clear_results(self):
-        self.results_canvas.delete("all")
+        self.tree_view.clear()
+        self.ranked_plans_list.set_rows([])
+        self.text_report_cache.clear()
         self.results_text.config(state="normal")
         self.results_text.delete("1.0", tk.END)
         self.results_text.config(state="disabled")
@@ -1239,9 +1434,8 @@ class BreedingToolApp(tk.Tk):
         for var in self.owned_ivs_vars.values():
             var.set(False)
         self.owned_nature_var.set("Nessuna")
-        for item in self.owned_pokemon_tree.get_children():
-            self.owned_pokemon_tree.delete(item)
-        self.owned_pokemon_list.clear()
+        self.owned_index.clear()
+        self._refresh_owned_table()
         self._clear_results()
         messagebox.showinfo("Reset", "Tutti i campi sono stati resettati.")
 
@@ -0,0 +1,97 @@
+import queue
+import time
+import tkinter as tk
+from typing import Callable, Dict, Hashable, Optional
+
+
+class KeyEventBridge:
+    """
+    Hands key events from a background thread (e.g. the pynput listener) to the Tk thread.
+
+    Tk is not thread-safe, so the listener only puts events on a queue with post().
+    The Tk thread drains the queue on a fixed 'after' tick: repeated presses of the
+    same key inside one tick are coalesced, presses closer than the debounce
+    interval are dropped, and after stop() nothing else reaches the handlers.
+    """
+    TICK_MS = 30
+    DEBOUNCE_SECONDS = 0.25
+
+    def __init__(self, widget: tk.Misc, handlers: Dict[Hashable, Callable[[], None]], tick_ms: Optional[int] = None, debounce_seconds: Optional[float] = None):
+        self.widget = widget
+        self.handlers = handlers
+        self.tick_ms = tick_ms if tick_ms is not None else self.TICK_MS
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else self.DEBOUNCE_SECONDS
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._last_dispatch: Dict[Hashable, float] = {}
+        self._after_id = None
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def post(self, key: Hashable):
+        """Thread-safe: queues a key event. Ignored once the bridge is stopped."""
+        if self._running:
+            self._queue.put((key, time.monotonic()))
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._schedule()
+
+    def stop(self):
+        """Stops the polling and drops pending events. Must be called from the Tk thread."""
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass  # Widget already destroyed
+            self._after_id = None
+        self._discard_pending()
+
+    def _schedule(self):
+        self._after_id = self.widget.after(self.tick_ms, self._drain)
+
+    def _discard_pending(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _drain(self):
+        self._after_id = None
+        if not self._running:
+            return
+
+        # Coalesce: one dispatch per key per tick, in order of first arrival
+        batch: Dict[Hashable, float] = {}
+        while True:
+            try:
+                key, timestamp = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if key not in batch:
+                batch[key] = timestamp
+
+        for key, timestamp in batch.items():
+            last = self._last_dispatch.get(key)
+            if last is not None and timestamp - last < self.debounce_seconds:
+                continue
+            self._last_dispatch[key] = timestamp
+
+            handler = self.handlers.get(key)
+            if handler:
+                try:
+                    handler()
+                except Exception as e:
+                    # Keep the bridge alive: an error in one handler must not stop the polling
+                    print(f"Error handling key {key}: {e}")
+            # A handler may have closed the overlay (and stopped the bridge)
+            if not self._running:
+                return
+
+        self._schedule()
@@ -5,6 +5,9 @@ import time
 import re
 import ctypes
 
+from ocr_cache import OcrCache
+from key_event_bridge import KeyEventBridge
+
 try:
     # Handle DPI awareness for 2K/4K screens
     ctypes.windll.shcore.SetProcessDpiAwareness(1)
@@ -19,6 +22,26 @@ except ImportError:
     # Fail silently here; the GUI will catch import errors when button is clicked
     pass
 
+try:
+    from ocr_preprocess import PreprocessConfig, preprocess_price_image
+    from screen_grabber import create_grabber
+except ImportError:
+    # NumPy not available: crops are grabbed with ImageGrab and passed to the OCR as they are
+    PreprocessConfig = None
+    preprocess_price_image = None
+    create_grabber = None
+
+
+def _ocr_tesseract(image):
+    # Configuration: Assume single block of text, numeric priority
+    custom_config = r'--psm 7 -c tessedit_char_whitelist=0123456789$,.'
+    return pytesseract.image_to_string(image, config=custom_config)
+
+# Registry of the OCR engines available for the price capture: name -> callable(image) -> raw text
+OCR_BACKENDS = {
+    "tesseract": _ocr_tesseract,
+}
+
 class PriceAcquisitionOverlay:
     """
     A minimal overlay to guide the user through capturing prices from the game window.
@@ -27,8 +50,11 @@ class PriceAcquisitionOverlay:
     # Coordinates calibrated from 2K screen (User provided)
     # Region targeting the top price in the list (Left, Top, Right, Bottom)
     PRICE_REGION = (619, 205, 739, 245)
+    # OCR text of a well-formed price ('$4,999', '1.000', '750'): only such readings are
+    # cached, so that a misread is not repeated on every later capture
+    PRICE_TEXT = re.compile(r'\$?\d{1,3}(?:[.,]\d{3})*')
 
-    def __init__(self, root, price_manager, on_close_callback, tasks=None, update_callback=None):
+    def __init__(self, root, price_manager, on_close_callback, tasks=None, update_callback=None, ocr_backend="tesseract", preprocess_config=None, grabber=None):
         self.root = root
         self.price_manager = price_manager
         self.on_close_callback = on_close_callback
@@ -36,9 +62,24 @@ class PriceAcquisitionOverlay:
 
         self.overlay = None
         self.listener = None
+        self.key_bridge = None
         self.current_index = 0
         self.running = False
 
+        # Cache of already recognized price crops (persisted across sessions)
+        self.ocr_cache = OcrCache()
+        self.ocr_backend = ocr_backend
+        if preprocess_config is None and PreprocessConfig is not None:
+            preprocess_config = PreprocessConfig()
+        self.preprocess_config = preprocess_config
+        # Screen capture backend; created on the first capture unless injected (e.g. a FileGrabber)
+        self.grabber = grabber
+        # Duration in seconds of each stage of the last capture (grab, preprocess, hash, ocr, parse)
+        self.last_timings = {}
+        # Cache key of the last recognized crop, and (task index, key) of the last capture (F8 undoes it)
+        self.last_cache_key = None
+        self.last_capture = None
+
         if tasks is not None:
             self.tasks = tasks
         else:
@@ -107,7 +148,7 @@ class PriceAcquisitionOverlay:
         self.overlay.configure(bg="#2c3e50")
 
         # Layout
-        self.lbl_instruction = tk.Label(self.overlay, text="F10: Cattura | F9: Manuale | F11: Salta", font=("Arial", 10), fg="#ecf0f1", bg="#2c3e50")
+        self.lbl_instruction = tk.Label(self.overlay, text="F10: Cattura | F9: Manuale | F11: Salta | F8: Annulla", font=("Arial", 10), fg="#ecf0f1", bg="#2c3e50")
         self.lbl_instruction.pack(pady=(10, 0))
 
         self.lbl_current_task = tk.Label(self.overlay, text="In attesa...", font=("Arial", 14, "bold"), fg="#f1c40f", bg="#2c3e50")
@@ -125,21 +166,25 @@ class PriceAcquisitionOverlay:
         self.lbl_progress.pack(pady=(5, 10))
 
     def _start_keyboard_listener(self):
+        # pynput runs on its own thread: key events reach the Tk thread through the bridge,
+        # which the root window drains (the overlay itself is destroyed by _finish)
+        self.key_bridge = KeyEventBridge(self.root, {
+            keyboard.Key.f10: self._capture_price,
+            keyboard.Key.f11: self._skip_item,
+            keyboard.Key.f9: self._manual_input,
+            keyboard.Key.f8: self._undo_last_capture,
+        })
+        self.key_bridge.start()
         self.listener = keyboard.Listener(on_release=self._on_key_release)
         self.listener.start()
 
     def _on_key_release(self, key):
+        # Runs on the pynput thread: never touch Tk here
         if not self.running:
             return False
 
-        if key == keyboard.Key.f10:
-            # Capture must be done on the main thread or handled carefully
-            # Since pynput is a separate thread, we schedule the capture on the GUI thread
-            self.overlay.after(0, self._capture_price)
-        elif key == keyboard.Key.f11:
-            self.overlay.after(0, self._skip_item)
-        elif key == keyboard.Key.f9:
-            self.overlay.after(0, self._manual_input)
+        if key in self.key_bridge.handlers:
+            self.key_bridge.post(key)
 
     def _manual_input(self):
         """Opens a dialog for manual price entry."""
@@ -152,6 +197,7 @@ class PriceAcquisitionOverlay:
         if price is not None:
              task = self.tasks[self.current_index]
              print(f"Manual Entry: {price} for {task['stat']} - {task['display']}")
+             self.last_capture = None
 
              if self.update_callback:
                  self.update_callback(task, price)
@@ -170,6 +216,7 @@ class PriceAcquisitionOverlay:
             return
 
         print(f"Skipped: {self.tasks[self.current_index]['display']}")
+        self.last_capture = None
         self.current_index += 1
 
         if self.current_index >= len(self.tasks):
@@ -178,44 +225,117 @@ class PriceAcquisitionOverlay:
             self._update_display()
 
     def _capture_price(self):
+        """F10 handler: a failed capture is reported and the overlay stays open."""
+        try:
+            self._capture_price_step()
+        except Exception as e:
+            print(f"Error capturing: {e}")
+
+    def _capture_price_step(self):
+        """
+        Grabs, recognizes and stores the price of the current task.
+        Exceptions (grabber, OCR backend) reach the caller.
+        """
         if self.current_index >= len(self.tasks):
             return
 
         # 1. Grab Image
-        try:
-            screenshot = ImageGrab.grab(bbox=self.PRICE_REGION)
-
-            # 2. OCR
-            # Configuration: Assume single block of text, numeric priority
-            custom_config = r'--psm 7 -c tessedit_char_whitelist=0123456789$,.'
-            text = pytesseract.image_to_string(screenshot, config=custom_config)
-
-            # 3. Parse Price
-            price = self._parse_price(text)
-
-            if price is not None:
-                # 4. Save Logic
-                task = self.tasks[self.current_index]
-                print(f"Captured: {price} for {task['stat']} - {task['display']}")
-
-                if self.update_callback:
-                    self.update_callback(task, price)
-                else:
-                    self.price_manager.set_price(task['stat'], task['category'], task['gender'], price)
-
-                # 5. Advance
-                self.current_index += 1
-                if self.current_index >= len(self.tasks):
-                    self._finish()
-                else:
-                    self._update_display()
+        t_start = time.perf_counter()
+        screenshot = self._grab_price_image()
+        self.last_timings = {"grab": time.perf_counter() - t_start}
+
+        # 2-3. OCR + Parse
+        price = self._recognize_price(screenshot)
+
+        if price is not None:
+            # 4. Save Logic
+            task = self.tasks[self.current_index]
+            print(f"Captured: {price} for {task['stat']} - {task['display']}")
+            self.last_capture = (self.current_index, self.last_cache_key)
+
+            if self.update_callback:
+                self.update_callback(task, price)
             else:
-                # Visual feedback for failure
-                self.lbl_instruction.config(text="Errore lettura! Riprova (F10)", fg="#e74c3c")
-                self.overlay.after(1000, lambda: self.lbl_instruction.config(text="Premi F10 per catturare", fg="#ecf0f1"))
+                self.price_manager.set_price(task['stat'], task['category'], task['gender'], price)
 
-        except Exception as e:
-            print(f"Error capturing: {e}")
+            # 5. Advance
+            self.current_index += 1
+            if self.current_index >= len(self.tasks):
+                self._finish()
+            else:
+                self._update_display()
+        else:
+            # Visual feedback for failure
+            self.lbl_instruction.config(text="Errore lettura! Riprova (F10)", fg="#e74c3c")
+            self.overlay.after(1000, lambda: self.lbl_instruction.config(text="Premi F10 per catturare", fg="#ecf0f1"))
+
+    def _undo_last_capture(self):
+        """
+        Goes back to the task of the last OCR capture, to capture it again or enter the
+        price by hand, and forgets the cached reading that produced the wrong price.
+        """
+        if self.last_capture is None:
+            return
+        index, cache_key = self.last_capture
+        self.last_capture = None
+        if cache_key is not None:
+            self.ocr_cache.invalidate(cache_key)
+        task = self.tasks[index]
+        print(f"Undone: {task['stat']} - {task['display']}")
+        self.current_index = index
+        self._update_display()
+
+    def _grab_price_image(self):
+        """
+        Grabs the price region of the game window.
+        With NumPy available this is a view on the grabber's reusable buffer,
+        valid until the next capture.
+        """
+        if create_grabber is None:
+            return ImageGrab.grab(bbox=self.PRICE_REGION)
+        if self.grabber is None:
+            self.grabber = create_grabber(self.PRICE_REGION)
+            self.grabber.open()
+        return self.grabber.grab()
+
+    def _recognize_price(self, image):
+        """
+        Turns a price crop into an integer price (or None if unreadable).
+        The OCR step is skipped when this exact crop was already recognized.
+        """
+        t_start = time.perf_counter()
+        pixels = None
+        if self.preprocess_config is not None and self.preprocess_config.enabled:
+            pixels = preprocess_price_image(image, self.preprocess_config)
+            t_pre = time.perf_counter()
+            self.last_timings["preprocess"] = t_pre - t_start
+            cache_key = self.ocr_cache.array_key(pixels)
+        else:
+            if not isinstance(image, Image.Image):
+                image = Image.fromarray(image)
+            t_pre = t_start
+            cache_key = self.ocr_cache.image_key(image)
+        self.last_cache_key = cache_key
+        price = self.ocr_cache.get(cache_key)
+        t_hash = time.perf_counter()
+        self.last_timings["hash"] = t_hash - t_pre
+        if price is not None:
+            return price
+
+        ocr_input = Image.fromarray(pixels) if pixels is not None else image
+        text = OCR_BACKENDS[self.ocr_backend](ocr_input)
+        t_ocr = time.perf_counter()
+        self.last_timings["ocr"] = t_ocr - t_hash
+
+        price = self._parse_price(text)
+        self.last_timings["parse"] = time.perf_counter() - t_ocr
+        if price is not None and self._is_plausible(text):
+            self.ocr_cache.put(cache_key, price)
+        return price
+
+    def _is_plausible(self, text):
+        """True if the raw OCR text looks like a GTL price, digits grouped by thousands."""
+        return bool(text) and self.PRICE_TEXT.fullmatch(re.sub(r'\s', '', text)) is not None
 
     def _parse_price(self, text):
         """Cleans OCR text '$4,999' or '1.000' -> 4999, 1000"""
@@ -261,11 +381,21 @@ class PriceAcquisitionOverlay:
 
     def _finish(self):
         self.running = False
+        if self.key_bridge:
+            self.key_bridge.stop()
         if self.listener:
             self.listener.stop()
 
+        if self.grabber:
+            self.grabber.close()
+
+        stats = self.ocr_cache.stats()
+        print(f"[OCR] Cache: {stats['hits']} hit / {stats['misses']} miss ({stats['hit_rate']:.0%}), {stats['size']} voci")
+        self.ocr_cache.save()
+
         if not self.update_callback:
-            self.price_manager.save_prices()
+            # Written on a background thread: the overlay closes without waiting for the disk
+            self.price_manager.request_save(0)
 
         if self.overlay:
             self.overlay.destroy()
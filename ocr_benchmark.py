@@ -0,0 +1,225 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from unittest import mock
+from typing import List, Tuple, Dict, Optional
+
+from PIL import Image
+
+import market_overlay
+from market_overlay import PriceAcquisitionOverlay, OCR_BACKENDS
+from ocr_preprocess import PreprocessConfig
+from screen_grabber import FileGrabber
+from ocr_cache import OcrCache
+
+# Replays saved price crops through the overlay capture path, without a game window:
+# the screen is replaced by a FileGrabber that serves the saved images.
+#
+# Each dataset directory contains PNG crops of the GTL price region (or full
+# screenshots, with --full-screen). The expected
+# price is read from an optional 'labels.json' ({"file.png": 4999, ...}) or, if
+# missing, from the leading digits of the file name (e.g. '4999_monster_ps.png').
+#
+# Usage:
+#   python ocr_benchmark.py dataset_dir [dataset_dir ...] [--backend tesseract] [--repeat 3] [--preprocess both]
+
+LABELS_FILE = "labels.json"
+
+
+def load_dataset(directories: List[str]) -> List[Tuple[str, int]]:
+    """Returns the list of (png_path, expected_price) found in the given directories."""
+    samples = []
+    for directory in directories:
+        labels = {}
+        labels_path = os.path.join(directory, LABELS_FILE)
+        if os.path.exists(labels_path):
+            with open(labels_path, 'r', encoding='utf-8') as f:
+                labels = json.load(f)
+
+        for name in sorted(os.listdir(directory)):
+            if not name.lower().endswith(".png"):
+                continue
+            if name in labels:
+                expected = int(labels[name])
+            else:
+                digits = ""
+                for ch in name:
+                    if not ch.isdigit():
+                        break
+                    digits += ch
+                if not digits:
+                    print(f"[AVVISO] Nessuna etichetta per {name}, ignorato.")
+                    continue
+                expected = int(digits)
+            samples.append((os.path.join(directory, name), expected))
+    return samples
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def build_headless_overlay(backend: str, cache_path: str, preprocess_config: PreprocessConfig) -> Tuple[PriceAcquisitionOverlay, List[Optional[int]]]:
+    """
+    Creates an overlay whose Tk widgets are mocked, so that _capture_price_step
+    can run on a machine without a display. The grabber is set per sample.
+    """
+    captured: List[Optional[int]] = []
+    task = {"stat": "Base", "display": "BENCHMARK", "category": "Ditto", "gender": "X"}
+    overlay = PriceAcquisitionOverlay(
+        mock.MagicMock(),
+        None,
+        None,
+        tasks=[task, task],
+        update_callback=lambda t, price: captured.append(price),
+        ocr_backend=backend,
+        preprocess_config=preprocess_config
+    )
+    overlay.ocr_cache = OcrCache(file_path=cache_path)
+    overlay.overlay = mock.MagicMock()
+    for label in ("lbl_instruction", "lbl_current_task", "lbl_warning", "lbl_recommendation", "lbl_progress"):
+        setattr(overlay, label, mock.MagicMock())
+    return overlay, captured
+
+
+def build_grabbers(samples: List[Tuple[str, int]], full_screen: bool) -> List[FileGrabber]:
+    """One fake screen per sample, each decoded once so that disk I/O is not measured."""
+    grabbers = []
+    for path, _ in samples:
+        if full_screen:
+            region = PriceAcquisitionOverlay.PRICE_REGION
+        else:
+            with Image.open(path) as img:
+                region = (0, 0, img.width, img.height)
+        grabbers.append(FileGrabber(region, [path]))
+    return grabbers
+
+
+def run_backend(backend: str, samples: List[Tuple[str, int]], grabbers: List[FileGrabber], repeat: int, use_cache: bool, preprocess_config: PreprocessConfig) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        overlay, captured = build_headless_overlay(backend, os.path.join(tmp_dir, "ocr_cache.json"), preprocess_config)
+        latencies = []
+        stage_totals: Dict[str, float] = {}
+        correct = 0
+        unreadable = 0
+        # "ExceptionType: message" -> occurrences, for the captures that raised
+        errors: Dict[str, int] = {}
+
+        for _ in range(repeat):
+            for (path, expected), grabber in zip(samples, grabbers):
+                overlay.grabber = grabber
+                overlay.last_cache_key = None
+                overlay.current_index = 0
+                captured.clear()
+
+                # The capture path prints one line per price: keep the report readable.
+                # The step without the F10 handler's catch-all: a failing backend is an error here.
+                with contextlib.redirect_stdout(io.StringIO()):
+                    t_start = time.perf_counter()
+                    try:
+                        overlay._capture_price_step()
+                    except Exception as e:
+                        error = f"{type(e).__name__}: {e}"
+                        errors[error] = errors.get(error, 0) + 1
+                        continue
+                    finally:
+                        latencies.append(time.perf_counter() - t_start)
+                        if not use_cache:
+                            # Forget the reading, not the hit/miss counters: every capture runs the OCR
+                            overlay.ocr_cache.invalidate(overlay.last_cache_key)
+
+                for stage, seconds in overlay.last_timings.items():
+                    stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+                price = captured[0] if captured else None
+                if price is None:
+                    unreadable += 1
+                elif price == expected:
+                    correct += 1
+
+        total = len(latencies)
+        elapsed = sum(latencies)
+        return {
+            "backend": backend,
+            "preprocess": preprocess_config.enabled,
+            "captures": total,
+            "accuracy": correct / total if total else 0.0,
+            "unreadable": unreadable,
+            "errors": sum(errors.values()),
+            "error_messages": errors,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p90_ms": percentile(latencies, 90) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies) * 1000 if latencies else 0.0,
+            "throughput": total / elapsed if elapsed else 0.0,
+            "stages_ms": {k: v / total * 1000 for k, v in stage_totals.items()} if total else {},
+            "cache": overlay.ocr_cache.stats(),
+        }
+
+
+def print_report(result: Dict):
+    print("=" * 60)
+    print(f"BACKEND: {result['backend']} (preprocessing: {'si' if result['preprocess'] else 'no'})")
+    print("=" * 60)
+    print(f"Catture:      {result['captures']}")
+    print(f"Accuratezza:  {result['accuracy']:.1%} (illeggibili: {result['unreadable']}, errori: {result['errors']})")
+    for message, count in result["error_messages"].items():
+        print(f"  [ERRORE] {count}x {message}")
+    print(f"Latenza (ms): p50 {result['p50_ms']:.1f} | p90 {result['p90_ms']:.1f} | p99 {result['p99_ms']:.1f} | max {result['max_ms']:.1f}")
+    print(f"Throughput:   {result['throughput']:.1f} catture/s")
+    stages = " | ".join(f"{k} {v:.2f}" for k, v in result["stages_ms"].items())
+    print(f"Fasi (media ms): {stages}")
+    cache = result["cache"]
+    print(f"Cache OCR:    {cache['hits']} hit / {cache['misses']} miss")
+    print("")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline della cattura prezzi OCR.")
+    parser.add_argument("directories", nargs="+", help="Cartelle con i ritagli PNG etichettati.")
+    parser.add_argument("--backend", action="append", choices=sorted(OCR_BACKENDS), help="Backend OCR da misurare (default: tutti).")
+    parser.add_argument("--repeat", type=int, default=1, help="Numero di passate sul dataset.")
+    parser.add_argument("--cache", action="store_true", help="Abilita la cache OCR tra le passate.")
+    parser.add_argument("--full-screen", action="store_true", help="Le immagini sono screenshot interi: ritaglia PRICE_REGION.")
+    parser.add_argument("--preprocess", choices=["on", "off", "both"], default="both", help="Misura con e/o senza preprocessing.")
+    parser.add_argument("--tesseract-cmd", help="Percorso dell'eseguibile tesseract (default: quello nel PATH).")
+    parser.add_argument("--json", help="Salva i risultati in questo file JSON.")
+    args = parser.parse_args(argv)
+
+    if args.tesseract_cmd:
+        market_overlay.pytesseract.pytesseract.tesseract_cmd = args.tesseract_cmd
+
+    samples = load_dataset(args.directories)
+    if not samples:
+        print("[ERRORE] Nessun ritaglio PNG etichettato trovato.")
+        return 1
+    grabbers = build_grabbers(samples, args.full_screen)
+    print(f"[INFO] {len(samples)} ritagli caricati.\n")
+
+    results = []
+    modes = {"on": [True], "off": [False], "both": [False, True]}[args.preprocess]
+    for backend in (args.backend or sorted(OCR_BACKENDS)):
+        for enabled in modes:
+            result = run_backend(backend, samples, grabbers, args.repeat, args.cache, PreprocessConfig(enabled=enabled))
+            print_report(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
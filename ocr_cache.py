@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class OcrCache:
+    """
+    LRU cache that maps the hash of a binarized price crop to the parsed price.
+
+    The same GTL listing produces the same pixels every time it is captured, so
+    after binarization the crop hashes to the same key and the OCR step can be
+    skipped entirely. The cache is persisted across sessions and capped in size.
+    A wrong reading would be repeated forever, so entries expire after MAX_AGE
+    seconds, the whole file is dropped when FORMAT_VERSION changes (e.g. a new
+    preprocessing or OCR setup) and a corrected reading can be removed with
+    invalidate().
+    """
+    FILE_PATH = os.path.join("data", "ocr_cache.json")
+    MAX_ENTRIES = 512
+    FORMAT_VERSION = 2
+    # Seconds after which a cached reading is recognized again (30 days)
+    MAX_AGE = 30 * 24 * 3600
+    # Grayscale level that separates text pixels from the background
+    BINARIZE_THRESHOLD = 128
+
+    def __init__(self, file_path: Optional[str] = None, max_entries: Optional[int] = None, max_age: Optional[float] = None):
+        self.file_path = file_path if file_path else self.FILE_PATH
+        self.max_entries = max_entries if max_entries else self.MAX_ENTRIES
+        self.max_age = max_age if max_age else self.MAX_AGE
+        # key -> (price, time it was recognized)
+        self.entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self.load()
+
+    @classmethod
+    def image_key(cls, image) -> str:
+        """
+        Returns an exact hash of the binarized crop.
+        Binarizing first makes the key insensitive to the small color noise of the
+        game background, while keeping different digits on different keys.
+        """
+        gray = image.convert("L")
+        threshold = cls.BINARIZE_THRESHOLD
+        binary = gray.point(lambda v: 255 if v >= threshold else 0, mode="1")
+        digest = hashlib.sha1()
+        digest.update(f"{binary.width}x{binary.height}:".encode("ascii"))
+        digest.update(binary.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def array_key(pixels) -> str:
+        """Returns an exact hash of an already binarized (preprocessed) crop array."""
+        digest = hashlib.sha1()
+        digest.update(f"{pixels.shape}:".encode("ascii"))
+        digest.update(pixels.tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[int]:
+        """Returns the cached price (and marks it as recently used) or None on a miss."""
+        entry = self.entries.get(key)
+        if entry is not None and time.time() - entry[1] > self.max_age:
+            del self.entries[key]
+            self._dirty = True
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, price: int):
+        """
+        Stores a parsed price, evicting the least recently used entries. Only readings
+        that passed the caller's plausibility check should be stored.
+        """
+        self.entries[key] = (price, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._dirty = True
+
+    def invalidate(self, key: str):
+        """Forgets a reading, e.g. when the user corrects the price it produced."""
+        if self.entries.pop(key, None) is not None:
+            self._dirty = True
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.entries),
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            with open(self.file_path, 'w', encoding='utf-8') as f:
+                # Stored oldest -> newest so that load() restores the LRU order
+                json.dump({"version": self.FORMAT_VERSION,
+                           "entries": [[k, price, saved_at] for k, (price, saved_at) in self.entries.items()]}, f)
+            self._dirty = False
+        except IOError as e:
+            print(f"Error saving OCR cache: {e}")
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            return
+
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Files of another version (or of the old unversioned list format) are purged
+            if not isinstance(data, dict) or data.get("version") != self.FORMAT_VERSION:
+                print("[OCR] Cache di un'altra versione: viene svuotata.")
+                self._dirty = True
+                return
+            oldest = time.time() - self.max_age
+            self.entries = OrderedDict((str(k), (int(price), float(saved_at)))
+                                       for k, price, saved_at in data["entries"] if float(saved_at) >= oldest)
+            self._dirty = len(self.entries) != len(data["entries"])
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        except (IOError, ValueError, TypeError, KeyError) as e:
+            print(f"Error loading OCR cache: {e}")
+            self.entries = OrderedDict()
@@ -0,0 +1,108 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from structures import PokemonPosseduto
+
+# Filter value that matches everything (None is a real value: no nature)
+ANY = object()
+
+STATS = ["PS", "Attacco", "Difesa", "Attacco Speciale", "Difesa Speciale", "Velocità"]
+
+
+def iv_mask(ivs: Iterable[str]) -> int:
+    """Bitmask of a list of IV names (one bit per stat, in STATS order)."""
+    mask = 0
+    for stat in ivs:
+        if stat in STATS:
+            mask |= 1 << STATS.index(stat)
+    return mask
+
+
+class OwnedPokemonIndex:
+    """
+    In-memory collection of the owned Pokemon with lookup tables for filtering.
+
+    Pokemon keep their insertion order. Species, nature and gender have inverted
+    indexes (value -> ids) and IVs are stored as bitmasks: a filter query
+    intersects the candidate sets and checks the IVs with a single AND.
+    """
+
+    def __init__(self, pokemon: Iterable[PokemonPosseduto] = ()):
+        self.by_id: Dict[str, PokemonPosseduto] = {}
+        self.masks: Dict[str, int] = {}
+        self.by_species: Dict[str, Set[str]] = defaultdict(set)
+        self.by_nature: Dict[Optional[str], Set[str]] = defaultdict(set)
+        self.by_gender: Dict[Optional[str], Set[str]] = defaultdict(set)
+        self.add_many(pokemon)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def all(self) -> List[PokemonPosseduto]:
+        return list(self.by_id.values())
+
+    def add(self, pokemon: PokemonPosseduto):
+        self.add_many([pokemon])
+
+    def add_many(self, pokemon: Iterable[PokemonPosseduto]):
+        for p in pokemon:
+            if p.id_utente in self.by_id:
+                self._unindex(self.by_id.pop(p.id_utente))
+            self.by_id[p.id_utente] = p
+            self.masks[p.id_utente] = iv_mask(p.ivs)
+            self.by_species[p.specie].add(p.id_utente)
+            self.by_nature[p.natura].add(p.id_utente)
+            self.by_gender[p.sesso].add(p.id_utente)
+
+    def remove_many(self, ids: Iterable[str]):
+        for pokemon_id in ids:
+            p = self.by_id.pop(pokemon_id, None)
+            if p is not None:
+                self._unindex(p)
+
+    def clear(self):
+        self.by_id.clear()
+        self.masks.clear()
+        self.by_species.clear()
+        self.by_nature.clear()
+        self.by_gender.clear()
+
+    def _unindex(self, p: PokemonPosseduto):
+        self.masks.pop(p.id_utente, None)
+        for table, key in ((self.by_species, p.specie), (self.by_nature, p.natura), (self.by_gender, p.sesso)):
+            ids = table.get(key)
+            if ids is not None:
+                ids.discard(p.id_utente)
+                if not ids:
+                    del table[key]
+
+    def query(self, species: str = "", ivs: Iterable[str] = (), nature=ANY, gender=ANY) -> List[PokemonPosseduto]:
+        """
+        Returns the Pokemon matching every given filter, in insertion order.
+        species: case-insensitive substring of the species name ("" = any);
+        ivs: IVs the Pokemon must have (it may have more);
+        nature / gender: exact value (ANY = no filter, None = not set).
+        """
+        candidate_sets = []
+        species = species.strip().lower()
+        if species:
+            # Few distinct species: matching the keys is cheap, the union is the candidate set
+            matched = set()
+            for name, ids in self.by_species.items():
+                if name and species in name.lower():
+                    matched |= ids
+            candidate_sets.append(matched)
+        if nature is not ANY:
+            candidate_sets.append(self.by_nature.get(nature, set()))
+        if gender is not ANY:
+            candidate_sets.append(self.by_gender.get(gender, set()))
+
+        required = iv_mask(ivs)
+        if candidate_sets:
+            candidate_sets.sort(key=len)
+            candidates = set(candidate_sets[0]).intersection(*candidate_sets[1:])
+            selected = [pokemon_id for pokemon_id in self.by_id if pokemon_id in candidates] if candidates else []
+        else:
+            selected = self.by_id
+
+        return [self.by_id[pokemon_id] for pokemon_id in selected if self.masks[pokemon_id] & required == required]
@@ -1,17 +1,25 @@
 import copy
+import heapq
 import itertools
-from typing import List, Dict, Optional, Any, Tuple, Set
-from collections import defaultdict
+import threading
+from functools import lru_cache
+from typing import List, Dict, Optional, Any, Tuple, Set, Callable
+from collections import Counter, defaultdict
 
-from structures import PianoCompleto, PokemonRichiesto, PokemonPosseduto, PianoValutato
+from structures import Accoppiamento, PianoCompleto, PokemonRichiesto, PokemonPosseduto, PianoValutato, RequisitoMancante
 from price_manager import PriceManager
+from assignment import max_weight_matching
+from core_engine import Modello, NATURA_ROLE
+
+# Matching weight of an assignment: filling a slot always beats any score difference
+PESO_ASSEGNAZIONE = 1000000
 
 class PlanEvaluator:
     """
     A comprehensive and robust class to evaluate breeding plans.
     """
 
-    def __init__(self, piano: PianoCompleto, pokemon_posseduti: List[PokemonPosseduto], price_manager: Optional[PriceManager] = None, target_species: str = "Ditto", pokemon_data: Dict = {}, target_nature: Optional[str] = None, gender_data: Dict = {}):
+    def __init__(self, piano: PianoCompleto, pokemon_posseduti: List[PokemonPosseduto], price_manager: Optional[PriceManager] = None, target_species: str = "Ditto", pokemon_data: Dict = {}, target_nature: Optional[str] = None, gender_data: Dict = {}, candidate_cache: Optional[Dict] = None):
         self.piano = piano
         self.pokemon_posseduti = pokemon_posseduti
         self.legenda = piano.legenda_ruoli
@@ -24,6 +32,17 @@ class PlanEvaluator:
         self._node_map: Dict[int, PokemonRichiesto] = {}
         self._mandatory_species_nodes: Set[int] = set()
         self.fulfilled_req_ids: Set[int] = set()
+        # Costing state (see update_cost): nodes whose couplings may be costed with the
+        # parents swapped, and {memo key: (swapped, memo keys of the two parents)}
+        self._sottoalberi_liberi: Set[int] = set()
+        self._scelte_costo: Dict[tuple, Tuple[bool, Tuple[tuple, tuple]]] = {}
+        # (real stats, real nature, mandatory, role) -> (valid owned Pokemon for such a slot, best score).
+        # It only depends on the owned list and the target species, so the plans of
+        # one evaluation can share it (see valuta_piani).
+        self._candidate_cache: Dict[tuple, Tuple[List[Tuple[int, float, Tuple[int, int]]], float]] = candidate_cache if candidate_cache is not None else {}
+        self._slot_candidate_cache: Dict[tuple, Tuple[List[Tuple[int, float, Tuple[int, int]]], float]] = {}
+        # Inventory masks of the real stats (_inventory_masks), built by _forma when first needed
+        self._maschere: Optional[Dict[str, int]] = None
 
     def _identify_mandatory_nodes(self):
         """
@@ -34,7 +53,8 @@ class PlanEvaluator:
             return
 
         final_node = self.piano.livelli[-1].accoppiamenti[0].figlio
-        self._mandatory_species_nodes.add(id(final_node))
+        # Recomputed from scratch: the parents may have been swapped since the last call
+        self._mandatory_species_nodes = {id(final_node)}
 
         q = [id(final_node)]
         while q:
@@ -99,6 +119,10 @@ class PlanEvaluator:
         req_id: The ID of the requirement node.
         role: 'gen1' (Mother/Species) or 'gen2' (Father/Partner).
         """
+        return self._is_valid_for_role(richiesto, posseduto, req_id in self._mandatory_species_nodes, role)
+
+    def _is_valid_for_role(self, richiesto: PokemonRichiesto, posseduto: PokemonPosseduto, is_mandatory: bool, role: str) -> bool:
+        """Same as _is_valid_candidate with the mandatory flag given explicitly."""
         # 1. IV Check
         ivs_reali_richieste = {self.legenda.get(r) for r in richiesto.ruoli_iv if r in self.legenda}
         if not ivs_reali_richieste.issubset(set(posseduto.ivs)):
@@ -111,7 +135,7 @@ class PlanEvaluator:
 
         # 3. Species Check
         # If the node is marked as Mandatory Species, the possessed pokemon MUST be the target species.
-        if req_id in self._mandatory_species_nodes:
+        if is_mandatory:
             if posseduto.specie != self.target_species:
                 return False
 
@@ -254,6 +278,179 @@ class PlanEvaluator:
 
         return best_price, best_group
 
+    def _leaf_purchase_cost(self, required_stats: List[str], required_nature: Optional[str], is_species_mandatory: bool, required_gender: str) -> Tuple[int, str]:
+        """
+        Cheapest way to buy (or breed from purchases) a leaf Pokemon with the given
+        real stats/nature in the given context. Returns (cost, decision description).
+        """
+        primary_stat_key = None
+        if required_stats:
+            primary_stat_key = required_stats[0]
+        elif required_nature:
+            primary_stat_key = "Natura"
+        else:
+            primary_stat_key = "Base"
+
+        cost = 999999999
+        decision_desc = "Sconosciuto"
+
+        # Check for Genderless Biological Nature
+        target_gender_type = "maschio e femmina"
+        if self.target_species in self.gender_data:
+            target_gender_type = self.gender_data[self.target_species].get("gender_type", "maschio e femmina").lower()
+        elif "Genderless" in self.pokemon_data.get(self.target_species, []):
+             target_gender_type = "genderless"
+
+        is_genderless_species = "genderless" in target_gender_type
+
+        if is_species_mandatory:
+
+            if is_genderless_species:
+                # Genderless Logic: Must buy Species (Base/Stat) + Ditto (Stat/Base)
+                # No "Female" or "Male" logic.
+                # We treat "Specie M" input as generic "Specie" for Genderless in this context.
+                
+                # Fees for breeding the leaf node (Genderless + Ditto -> Genderless)
+                leaf_item_cost = 15000 if required_nature is not None else 20000
+                # No gender fee for genderless usually, or handled by _get_gender_cost('X')?
+                # Using existing logic:
+                leaf_breeding_fee = self._get_gender_cost('Genderless') # Should return 0
+                extra_leaf_cost = leaf_breeding_fee + leaf_item_cost
+
+                c_specie_stat = self.price_manager.get_price(primary_stat_key, "Specie", "M") # Using M/F field as generic
+                c_specie_base = self.price_manager.get_price("Base", "Specie", "M")
+
+                c_ditto_stat = self.price_manager.get_price(primary_stat_key, "Ditto", "X")
+                c_ditto_base = self.price_manager.get_price("Base", "Ditto", "X")
+
+                # Option 1: Species(Stat) + Ditto(Base)
+                opt1 = c_specie_stat + c_ditto_base + extra_leaf_cost
+                # Option 2: Species(Base) + Ditto(Stat)
+                opt2 = c_specie_base + c_ditto_stat + extra_leaf_cost
+
+                if opt1 <= opt2:
+                    cost = opt1
+                    decision_desc = f"Comprare {self.target_species} (Stat) + Ditto (Base) - ${cost}"
+                else:
+                    cost = opt2
+                    decision_desc = f"Comprare {self.target_species} (Base) + Ditto (Stat) - ${cost}"
+
+            else:
+                # Standard Gendered Logic
+                
+                # Calculate extra breeding costs for Options B and C (Implicit Breeding)
+                leaf_breeding_fee = self._get_gender_cost('F') # We are creating the Mandatory Species (Female)
+                leaf_item_cost = 15000 if required_nature is not None else 20000
+                extra_leaf_cost = leaf_breeding_fee + leaf_item_cost
+
+                # Option A: Buy Female Species (Standard) - Direct Purchase (No breeding fee)
+                cost_A = self.price_manager.get_price(primary_stat_key, "Specie", "F")
+
+                # Option B: Buy Male Species + Ditto (Ditto Trick)
+                c_specie_m_stat = self.price_manager.get_price(primary_stat_key, "Specie", "M")
+                c_ditto_base = self.price_manager.get_price("Base", "Ditto", "X")
+                cost_B1 = c_specie_m_stat + c_ditto_base
+
+                c_specie_m_base = self.price_manager.get_price("Base", "Specie", "M")
+                c_ditto_stat = self.price_manager.get_price(primary_stat_key, "Ditto", "X")
+                cost_B2 = c_specie_m_base + c_ditto_stat
+                
+                cost_B = min(cost_B1, cost_B2) + extra_leaf_cost
+
+                if cost_B1 < cost_B2:
+                    desc_B = f"Comprare {self.target_species} ♂ ({primary_stat_key}) + Ditto (Base) - ${cost_B}"
+                else:
+                    desc_B = f"Comprare Ditto ({primary_stat_key}) + {self.target_species} ♂ (Base) - ${cost_B}"
+
+                # Option C: Buy Female Species (Base) + Male EggGroup (Stat)
+                # This ensures the Line is preserved (Female Species) but gets stats from cheap EggGroup.
+                c_specie_f_base = self.price_manager.get_price("Base", "Specie", "F")
+
+                # UPDATE: Use Specific Egg Group Prices
+                c_group_m_stat, group_name_C = self._get_best_egg_group_price(primary_stat_key, "M")
+                
+                cost_C = c_specie_f_base + c_group_m_stat + extra_leaf_cost
+                desc_C = f"Comprare {self.target_species} ♀ (Base) + EggGroup: {group_name_C} ♂ ({primary_stat_key}) - ${cost_C}"
+
+                # Find Min(A, B, C)
+                options = [
+                    (cost_A, f"Comprare {self.target_species} ♀\n({primary_stat_key}) - ${cost_A}"),
+                    (cost_B, desc_B),
+                    (cost_C, desc_C)
+                ]
+                options.sort(key=lambda x: x[0])
+
+                cost = options[0][0]
+                decision_desc = options[0][1]
+
+        else:
+            # Not Mandatory Species (Donor Branch).
+            # We can choose between Specie, EggGroup, or Ditto.
+
+            options = []
+
+            if required_gender == 'M':
+                # Need a Male Partner (or Ditto)
+                c_specie_m = self.price_manager.get_price(primary_stat_key, "Specie", "M")
+                options.append((c_specie_m, f"Comprare {self.target_species} ♂\n({primary_stat_key}) - ${c_specie_m}"))
+
+                c_group_m, group_name_M = self._get_best_egg_group_price(primary_stat_key, "M")
+                options.append((c_group_m, f"Comprare {group_name_M} ♂\n({primary_stat_key}) - ${c_group_m}"))
+
+                c_ditto = self.price_manager.get_price(primary_stat_key, "Ditto", "X")
+                options.append((c_ditto, f"Comprare Ditto\n({primary_stat_key}) - ${c_ditto}"))
+
+            elif required_gender == 'F':
+                # Need a Female Partner (Mother of a donor branch)
+                c_specie_f = self.price_manager.get_price(primary_stat_key, "Specie", "F")
+                options.append((c_specie_f, f"Comprare {self.target_species} ♀\n({primary_stat_key}) - ${c_specie_f}"))
+
+                # UPDATE: For Female EggGroup, we check if specific prices exist (usually unlikely for F, but possible)
+                # GTL tab only has Male EggGroups. But logic might require Female.
+                # The user said "GTL tab... ONLY prices for Male Egg Groups".
+                # So we probably rely on "EggGroup" generic price OR assume Male price applies?
+                # Wait, if we only input Male prices, then getting Female EggGroup price will return Infinity unless we have a generic "F" price.
+                # But wait, Indirect Breeding (Option below) creates a Female from Male + Ditto.
+                # So direct purchase of Female EggGroup might be expensive/infinity, favoring Indirect.
+                # I will stick to the same helper but ask for "F". If GTL is M-only, this will return Infinity (correct).
+
+                c_group_f, group_name_F = self._get_best_egg_group_price(primary_stat_key, "F")
+                options.append((c_group_f, f"Comprare {group_name_F} ♀\n({primary_stat_key}) - ${c_group_f}"))
+
+                # Indirect: Breed Male EggGroup + Ditto -> Female EggGroup
+                # We need a Cheap Male Egg Group
+                c_group_m, group_name_ind = self._get_best_egg_group_price(primary_stat_key, "M")
+                c_ditto_base = self.price_manager.get_price("Base", "Ditto", "X")
+                
+                # Calculate extra cost for indirect breeding
+                _fee = self._get_gender_cost('F')
+                _items = 15000 if required_nature is not None else 20000
+                _extra = _fee + _items
+
+                cost_indirect = c_group_m + c_ditto_base + _extra
+                desc_indirect = f"Allevare {group_name_ind} ♀ da {group_name_ind} ♂ + Ditto - ${cost_indirect}"
+                options.append((cost_indirect, desc_indirect))
+
+            elif required_gender == 'Ditto':
+                # Specific request for a Ditto (e.g. for Genderless breeding)
+                c_ditto = self.price_manager.get_price(primary_stat_key, "Ditto", "X")
+                options.append((c_ditto, f"Comprare Ditto\n({primary_stat_key}) - ${c_ditto}"))
+
+            elif required_gender == 'Genderless':
+                 # Specific request for Genderless Species (e.g. Beldum)
+                 # Treat "Specie M" as generic Specie
+                 c_specie = self.price_manager.get_price(primary_stat_key, "Specie", "M")
+                 options.append((c_specie, f"Comprare {self.target_species}\n({primary_stat_key}) - ${c_specie}"))
+
+            # Find min
+            if options:
+                options.sort(key=lambda x: x[0])
+                cost, decision_desc = options[0]
+            else:
+                cost = 999999999 # Should not happen
+
+        return cost, decision_desc
+
     def calculate_cost_recursive(self, node_id: int, piano_valutato: PianoValutato, is_species_mandatory: bool, required_gender: str = 'F', memo: Optional[Dict] = None) -> Tuple[int, Dict[int, str]]:
         """
         Calculates the cost to obtain the Pokemon at node_id.
@@ -291,171 +488,7 @@ class PlanEvaluator:
                 memo[cache_key] = (999999999, {})
                 return 999999999, {}
 
-            primary_stat_key = None
-            if required_stats:
-                primary_stat_key = required_stats[0]
-            elif required_nature:
-                primary_stat_key = "Natura"
-            else:
-                primary_stat_key = "Base"
-
-            cost = 999999999
-            decision_desc = "Sconosciuto"
-
-            # Check for Genderless Biological Nature
-            target_gender_type = "maschio e femmina"
-            if self.target_species in self.gender_data:
-                target_gender_type = self.gender_data[self.target_species].get("gender_type", "maschio e femmina").lower()
-            elif "Genderless" in self.pokemon_data.get(self.target_species, []):
-                 target_gender_type = "genderless"
-
-            is_genderless_species = "genderless" in target_gender_type
-
-            if is_species_mandatory:
-
-                if is_genderless_species:
-                    # Genderless Logic: Must buy Species (Base/Stat) + Ditto (Stat/Base)
-                    # No "Female" or "Male" logic.
-                    # We treat "Specie M" input as generic "Specie" for Genderless in this context.
-                    
-                    # Fees for breeding the leaf node (Genderless + Ditto -> Genderless)
-                    leaf_item_cost = 15000 if required_nature is not None else 20000
-                    # No gender fee for genderless usually, or handled by _get_gender_cost('X')?
-                    # Using existing logic:
-                    leaf_breeding_fee = self._get_gender_cost('Genderless') # Should return 0
-                    extra_leaf_cost = leaf_breeding_fee + leaf_item_cost
-
-                    c_specie_stat = self.price_manager.get_price(primary_stat_key, "Specie", "M") # Using M/F field as generic
-                    c_specie_base = self.price_manager.get_price("Base", "Specie", "M")
-
-                    c_ditto_stat = self.price_manager.get_price(primary_stat_key, "Ditto", "X")
-                    c_ditto_base = self.price_manager.get_price("Base", "Ditto", "X")
-
-                    # Option 1: Species(Stat) + Ditto(Base)
-                    opt1 = c_specie_stat + c_ditto_base + extra_leaf_cost
-                    # Option 2: Species(Base) + Ditto(Stat)
-                    opt2 = c_specie_base + c_ditto_stat + extra_leaf_cost
-
-                    if opt1 <= opt2:
-                        cost = opt1
-                        decision_desc = f"Comprare {self.target_species} (Stat) + Ditto (Base) - ${cost}"
-                    else:
-                        cost = opt2
-                        decision_desc = f"Comprare {self.target_species} (Base) + Ditto (Stat) - ${cost}"
-
-                else:
-                    # Standard Gendered Logic
-                    
-                    # Calculate extra breeding costs for Options B and C (Implicit Breeding)
-                    leaf_breeding_fee = self._get_gender_cost('F') # We are creating the Mandatory Species (Female)
-                    leaf_item_cost = 15000 if required_nature is not None else 20000
-                    extra_leaf_cost = leaf_breeding_fee + leaf_item_cost
-
-                    # Option A: Buy Female Species (Standard) - Direct Purchase (No breeding fee)
-                    cost_A = self.price_manager.get_price(primary_stat_key, "Specie", "F")
-
-                    # Option B: Buy Male Species + Ditto (Ditto Trick)
-                    c_specie_m_stat = self.price_manager.get_price(primary_stat_key, "Specie", "M")
-                    c_ditto_base = self.price_manager.get_price("Base", "Ditto", "X")
-                    cost_B1 = c_specie_m_stat + c_ditto_base
-
-                    c_specie_m_base = self.price_manager.get_price("Base", "Specie", "M")
-                    c_ditto_stat = self.price_manager.get_price(primary_stat_key, "Ditto", "X")
-                    cost_B2 = c_specie_m_base + c_ditto_stat
-                    
-                    cost_B = min(cost_B1, cost_B2) + extra_leaf_cost
-
-                    if cost_B1 < cost_B2:
-                        desc_B = f"Comprare {self.target_species} ♂ ({primary_stat_key}) + Ditto (Base) - ${cost_B}"
-                    else:
-                        desc_B = f"Comprare Ditto ({primary_stat_key}) + {self.target_species} ♂ (Base) - ${cost_B}"
-
-                    # Option C: Buy Female Species (Base) + Male EggGroup (Stat)
-                    # This ensures the Line is preserved (Female Species) but gets stats from cheap EggGroup.
-                    c_specie_f_base = self.price_manager.get_price("Base", "Specie", "F")
-
-                    # UPDATE: Use Specific Egg Group Prices
-                    c_group_m_stat, group_name_C = self._get_best_egg_group_price(primary_stat_key, "M")
-                    
-                    cost_C = c_specie_f_base + c_group_m_stat + extra_leaf_cost
-                    desc_C = f"Comprare {self.target_species} ♀ (Base) + EggGroup: {group_name_C} ♂ ({primary_stat_key}) - ${cost_C}"
-
-                    # Find Min(A, B, C)
-                    options = [
-                        (cost_A, f"Comprare {self.target_species} ♀\n({primary_stat_key}) - ${cost_A}"),
-                        (cost_B, desc_B),
-                        (cost_C, desc_C)
-                    ]
-                    options.sort(key=lambda x: x[0])
-
-                    cost = options[0][0]
-                    decision_desc = options[0][1]
-
-            else:
-                # Not Mandatory Species (Donor Branch).
-                # We can choose between Specie, EggGroup, or Ditto.
-
-                options = []
-
-                if required_gender == 'M':
-                    # Need a Male Partner (or Ditto)
-                    c_specie_m = self.price_manager.get_price(primary_stat_key, "Specie", "M")
-                    options.append((c_specie_m, f"Comprare {self.target_species} ♂\n({primary_stat_key}) - ${c_specie_m}"))
-
-                    c_group_m, group_name_M = self._get_best_egg_group_price(primary_stat_key, "M")
-                    options.append((c_group_m, f"Comprare {group_name_M} ♂\n({primary_stat_key}) - ${c_group_m}"))
-
-                    c_ditto = self.price_manager.get_price(primary_stat_key, "Ditto", "X")
-                    options.append((c_ditto, f"Comprare Ditto\n({primary_stat_key}) - ${c_ditto}"))
-
-                elif required_gender == 'F':
-                    # Need a Female Partner (Mother of a donor branch)
-                    c_specie_f = self.price_manager.get_price(primary_stat_key, "Specie", "F")
-                    options.append((c_specie_f, f"Comprare {self.target_species} ♀\n({primary_stat_key}) - ${c_specie_f}"))
-
-                    # UPDATE: For Female EggGroup, we check if specific prices exist (usually unlikely for F, but possible)
-                    # GTL tab only has Male EggGroups. But logic might require Female.
-                    # The user said "GTL tab... ONLY prices for Male Egg Groups".
-                    # So we probably rely on "EggGroup" generic price OR assume Male price applies?
-                    # Wait, if we only input Male prices, then getting Female EggGroup price will return Infinity unless we have a generic "F" price.
-                    # But wait, Indirect Breeding (Option below) creates a Female from Male + Ditto.
-                    # So direct purchase of Female EggGroup might be expensive/infinity, favoring Indirect.
-                    # I will stick to the same helper but ask for "F". If GTL is M-only, this will return Infinity (correct).
-
-                    c_group_f, group_name_F = self._get_best_egg_group_price(primary_stat_key, "F")
-                    options.append((c_group_f, f"Comprare {group_name_F} ♀\n({primary_stat_key}) - ${c_group_f}"))
-
-                    # Indirect: Breed Male EggGroup + Ditto -> Female EggGroup
-                    # We need a Cheap Male Egg Group
-                    c_group_m, group_name_ind = self._get_best_egg_group_price(primary_stat_key, "M")
-                    c_ditto_base = self.price_manager.get_price("Base", "Ditto", "X")
-                    
-                    # Calculate extra cost for indirect breeding
-                    _fee = self._get_gender_cost('F')
-                    _items = 15000 if required_nature is not None else 20000
-                    _extra = _fee + _items
-
-                    cost_indirect = c_group_m + c_ditto_base + _extra
-                    desc_indirect = f"Allevare {group_name_ind} ♀ da {group_name_ind} ♂ + Ditto - ${cost_indirect}"
-                    options.append((cost_indirect, desc_indirect))
-
-                elif required_gender == 'Ditto':
-                    # Specific request for a Ditto (e.g. for Genderless breeding)
-                    c_ditto = self.price_manager.get_price(primary_stat_key, "Ditto", "X")
-                    options.append((c_ditto, f"Comprare Ditto\n({primary_stat_key}) - ${c_ditto}"))
-
-                elif required_gender == 'Genderless':
-                     # Specific request for Genderless Species (e.g. Beldum)
-                     # Treat "Specie M" as generic Specie
-                     c_specie = self.price_manager.get_price(primary_stat_key, "Specie", "M")
-                     options.append((c_specie, f"Comprare {self.target_species}\n({primary_stat_key}) - ${c_specie}"))
-
-                # Find min
-                if options:
-                    options.sort(key=lambda x: x[0])
-                    cost, decision_desc = options[0]
-                else:
-                    cost = 999999999 # Should not happen
+            cost, decision_desc = self._leaf_purchase_cost(required_stats, required_nature, is_species_mandatory, required_gender)
 
             memo[cache_key] = (cost, {node_id: decision_desc})
             return cost, {node_id: decision_desc}
@@ -499,6 +532,40 @@ class PlanEvaluator:
         # Genitore 1 (Mother) inherits the mandatory status of the child IF the child is mandatory.
         # Genitore 2 (Father) is always a donor (not mandatory).
 
+        # The coupling as generated and, when no owned Pokemon hangs below it, with the
+        # parents swapped: the mother line may go through either of them
+        total_cost, decisions_1, decisions_2, chiavi = self._cost_parents(p1_id, p2_id, piano_valutato, is_species_mandatory, total_breeding_cost, memo)
+        scambio = False
+        if p1_id in self._sottoalberi_liberi and p2_id in self._sottoalberi_liberi:
+            alternativa = self._cost_parents(p2_id, p1_id, piano_valutato, is_species_mandatory, total_breeding_cost, memo)
+            if alternativa[0] < total_cost:
+                (total_cost, decisions_1, decisions_2, chiavi), scambio = alternativa, True
+        self._scelte_costo[cache_key] = (scambio, chiavi)
+
+        # Merge decisions smartly to prioritize Species description over EggGroup description
+        # This handles cases where nodes are merged/shared but used in different contexts.
+        decisions = decisions_1.copy()
+        for k, v in decisions_2.items():
+            if k in decisions:
+                current_desc = decisions[k]
+                # Avoid duplicates
+                if v not in current_desc:
+                     decisions[k] = f"{current_desc} / {v}"
+            else:
+                decisions[k] = v
+
+        # Add intermediate step description
+        decisions[node_id] = f"Allevamento (Tassa: ${fee}, Items: ${base_item_cost})"
+
+        memo[cache_key] = (total_cost, decisions)
+        return total_cost, decisions
+
+    def _cost_parents(self, p1_id: int, p2_id: int, piano_valutato: PianoValutato, is_species_mandatory: bool, total_breeding_cost: int, memo: Dict) -> Tuple[int, Dict[int, str], Dict[int, str], Tuple[tuple, tuple]]:
+        """
+        Cost of breeding a node from p1_id (Gen1) and p2_id (Gen2), options A and B of
+        calculate_cost_recursive. Returns (total cost, decisions of p1, decisions of p2,
+        the memo keys the two parents were costed with).
+        """
         # Genderless Handling for Recursion
         target_gender_type = "maschio e femmina"
         if self.target_species in self.gender_data:
@@ -520,6 +587,8 @@ class PlanEvaluator:
 
              cost_1, decisions_1 = self.calculate_cost_recursive(p1_id, piano_valutato, p1_mandatory, required_gender='Genderless', memo=memo)
              cost_2, decisions_2 = self.calculate_cost_recursive(p2_id, piano_valutato, p2_mandatory, required_gender='Ditto', memo=memo) # Helper to indicate Ditto role
+             total_cost = total_breeding_cost + cost_1 + cost_2
+             chiavi = ((p1_id, p1_mandatory, 'Genderless'), (p2_id, p2_mandatory, 'Ditto'))
 
         else:
             # Standard
@@ -576,122 +645,224 @@ class PlanEvaluator:
                 cost_2 = cost_B_2
                 decisions_1 = decisions_B_1
                 decisions_2 = decisions_B_2
+                chiavi = ((p1_id, False, 'Ditto'), (p2_id, True, 'M'))
             else:
                 total_cost = total_cost_A
                 cost_1 = cost_A_1
                 cost_2 = cost_A_2
                 decisions_1 = decisions_A_1
                 decisions_2 = decisions_A_2
+                chiavi = ((p1_id, p1_mandatory, 'F'), (p2_id, p2_mandatory, 'M'))
 
-        # Merge decisions smartly to prioritize Species description over EggGroup description
-        # This handles cases where nodes are merged/shared but used in different contexts.
-        decisions = decisions_1.copy()
-        for k, v in decisions_2.items():
-            if k in decisions:
-                current_desc = decisions[k]
-                # Avoid duplicates
-                if v not in current_desc:
-                     decisions[k] = f"{current_desc} / {v}"
+        return total_cost, decisions_1, decisions_2, chiavi
+
+    def _is_genderless_species(self) -> bool:
+        target_gender_type = "maschio e femmina"
+        if self.target_species in self.gender_data:
+            target_gender_type = self.gender_data[self.target_species].get("gender_type", "maschio e femmina").lower()
+        elif "Genderless" in self.pokemon_data.get(self.target_species, []):
+            target_gender_type = "genderless"
+        return "genderless" in target_gender_type
+
+    def cost_lower_bound(self, piano_valutato: PianoValutato, leaf_prices: Dict[tuple, int]) -> int:
+        """
+        Admissible lower bound of the cost update_cost would compute for this plan.
+        It follows the same recursion as calculate_cost_recursive (owned nodes cost 0,
+        options A and B for the mandatory line) but builds no decision map and always
+        allows option B, skipping the species check on owned fathers, and the swapped
+        parents, also above owned Pokemon: allowing more options can only lower the result.
+        leaf_prices caches the leaf purchases by price key and context and can be
+        shared by all the plans costed with the same prices.
+        """
+        if not self.piano.livelli:
+            return 0
+        if self.price_manager is None:
+            return 999999999
+        genderless = self._is_genderless_species()
+        memo: Dict[Tuple[int, bool, str], int] = {}
+
+        def bound(node_id: int, mandatory: bool, gender: str) -> int:
+            if node_id in piano_valutato.mappa_assegnazioni:
+                return 0
+            cache_key = (node_id, mandatory, gender)
+            if cache_key in memo:
+                return memo[cache_key]
+            node = self._node_map.get(node_id)
+            if node is None:
+                return 999999999
+            required_stats = [self.legenda.get(r) for r in node.ruoli_iv if r in self.legenda]
+            required_nature = self.legenda.get(node.ruolo_natura) if node.ruolo_natura in self.legenda else None
+
+            parents = self._child_to_parents_map.get(node_id)
+            if parents is None:
+                result = self._leaf_price(required_stats, required_nature, mandatory, gender, leaf_prices)
             else:
-                decisions[k] = v
+                step = self._get_gender_cost(gender) + (15000 if required_nature is not None else 20000)
+                result = step + min(bound(madre, mandatory_madre, gender_madre) + bound(padre, mandatory_padre, gender_padre)
+                                    for madre, padre in (parents, parents[::-1])
+                                    for (mandatory_madre, gender_madre), (mandatory_padre, gender_padre)
+                                    in _opzioni_genitori(mandatory, genderless))
+            memo[cache_key] = result
+            return result
 
-        # Add intermediate step description
-        decisions[node_id] = f"Allevamento (Tassa: ${fee}, Items: ${base_item_cost})"
+        return bound(id(self.piano.livelli[-1].accoppiamenti[0].figlio), True, 'F')
 
-        memo[cache_key] = (total_cost, decisions)
-        return total_cost, decisions
+    def _slot_candidates(self, req: PokemonRichiesto, role: str, is_mandatory: bool) -> Tuple[List[Tuple[int, float, Tuple[int, int]]], float]:
+        """
+        Owned Pokemon that can fill a slot, as (index in pokemon_posseduti, match score, rank),
+        and the best of their scores. Validity and score only depend on the real stats
+        and nature of the slot, its species constraint and its role, so they are
+        computed once per combination.
+        """
+        # The roles of the node map to the same entry for the whole plan
+        ruoli = (req.ruoli_iv, req.ruolo_natura, is_mandatory, role)
+        voce = self._slot_candidate_cache.get(ruoli)
+        if voce is not None:
+            return voce
+        key = (tuple(sorted(self.legenda.get(r) for r in req.ruoli_iv if r in self.legenda)),
+               self.legenda.get(req.ruolo_natura) if req.ruolo_natura in self.legenda else None,
+               is_mandatory, role)
+        voce = self._candidate_cache.get(key)
+        if voce is None:
+            candidati = [
+                (indice, self._calcola_punteggio_match(req, candidato), self._rank_candidate(req, candidato))
+                for indice, candidato in enumerate(self.pokemon_posseduti)
+                if self._is_valid_for_role(req, candidato, is_mandatory, role)
+            ]
+            voce = self._candidate_cache[key] = (candidati, max((c[1] for c in candidati), default=0.0))
+        self._slot_candidate_cache[ruoli] = voce
+        return voce
+
+    def _candidates_for(self, req: PokemonRichiesto, role: str, is_mandatory: bool) -> List[Tuple[int, float, Tuple[int, int]]]:
+        return self._slot_candidates(req, role, is_mandatory)[0]
+
+    def purchase_only_cost(self, leaf_prices: Dict[tuple, int]) -> Optional[int]:
+        """
+        Cost of the plan when no owned Pokemon is used, from the demand program of the
+        template it was generated from (_programma_domanda): its ingredients are priced
+        once with this plan's legend, then one pass over the program takes the cheapest
+        combination, with no tree walk. It equals what update_cost computes for a plan
+        without assignments (both parent orders are tried everywhere then, so the
+        mirror flag of the template does not matter). None when the plan does not come
+        from a template. leaf_prices is the cache of cost_lower_bound.
+        """
+        if self.piano.struttura is None or self.price_manager is None:
+            return None
+        ingredienti, istruzioni = _programma_domanda(self.piano.struttura[0], self._is_genderless_species())
+        prezzi = [self._demand_price(voce, leaf_prices) for voce in ingredienti]
+        valori: List[int] = []
+        for ingrediente, alternative in istruzioni:
+            valori.append(prezzi[ingrediente] + (min(valori[i] + valori[j] for i, j in alternative) if alternative else 0))
+        return valori[-1]
+
+    def _demand_price(self, voce: tuple, leaf_prices: Dict[tuple, int]) -> int:
+        """Price of one ingredient of a demand program under this plan's legend."""
+        if voce[0] == 'passo':
+            _, con_natura, gender = voce
+            return self._get_gender_cost(gender) + (15000 if con_natura else 20000)
+        _, ruolo, con_natura, mandatory, gender = voce
+        required_stats = [self.legenda[ruolo]] if ruolo in self.legenda else []
+        required_nature = self.legenda.get(NATURA_ROLE) if con_natura else None
+        return self._leaf_price(required_stats, required_nature, mandatory, gender, leaf_prices)
+
+    def _leaf_price(self, required_stats: List[str], required_nature: Optional[str], mandatory: bool, gender: str, leaf_prices: Dict[tuple, int]) -> int:
+        """_leaf_purchase_cost through the leaf_prices cache (it only looks at the first stat and at the presence of a nature)."""
+        price_key = (required_stats[0] if required_stats else ("Natura" if required_nature else "Base"),
+                     required_nature is not None, mandatory, gender)
+        if price_key not in leaf_prices:
+            leaf_prices[price_key] = self._leaf_purchase_cost(required_stats, required_nature, mandatory, gender)[0]
+        return leaf_prices[price_key]
 
     def _calculate_score_for_role(self, req: PokemonRichiesto, role: str, is_mandatory: bool) -> float:
         """Helper to calculate max score for a requirement if we strictly check validity."""
-        max_score = 0.0
-
-        for candidato in self.pokemon_posseduti:
-            # Mimic _is_valid_candidate logic but manually pass mandatory flag
-            valid = True
-
-            # 1. IV Check
-            ivs_reali = {self.legenda.get(r) for r in req.ruoli_iv if r in self.legenda}
-            if not ivs_reali.issubset(set(candidato.ivs)):
-                valid = False
-
-            # 2. Nature Check
-            natura_reale = self.legenda.get(req.ruolo_natura) if req.ruolo_natura in self.legenda else None
-            if valid and natura_reale is not None and candidato.natura != natura_reale:
-                valid = False
-
-            # 3. Species Check
-            if valid:
-                if is_mandatory:
-                    if candidato.specie != self.target_species:
-                        valid = False
-                else:
-                    if candidato.specie == self.target_species:
-                        pass
-                    elif candidato.specie == 'Ditto':
-                        pass
-                    else:
-                        t_groups = self.pokemon_data.get(self.target_species, [])
-                        c_groups = self.pokemon_data.get(candidato.specie, [])
-                        if t_groups and c_groups:
-                             if set(t_groups).isdisjoint(set(c_groups)):
-                                 valid = False
-
-            # 4. Gender Check
-            if valid:
-                target_gender_type = "maschio e femmina"
-                if self.target_species in self.gender_data:
-                    target_gender_type = self.gender_data[self.target_species].get("gender_type", "").lower()
-                elif "Genderless" in self.pokemon_data.get(self.target_species, []):
-                     target_gender_type = "genderless"
-
-                p_sesso = candidato.sesso
-                if p_sesso == 'M': p_sesso = 'Maschio'
-                if p_sesso == 'F': p_sesso = 'Femmina'
-
-                if "genderless" in target_gender_type:
-                    if role == 'gen1':
-                         if p_sesso != 'Genderless': valid = False
-                    elif role == 'gen2':
-                         if candidato.specie != 'Ditto': valid = False
-                else:
-                    if role == 'gen1':
-                         if p_sesso != 'Femmina': valid = False
-                    elif role == 'gen2':
-                         if candidato.specie == 'Ditto': pass
-                         elif p_sesso != 'Maschio': valid = False
-
-            if valid:
-                score = self._calcola_punteggio_match(req, candidato)
-                if score > max_score:
-                    max_score = score
-            
-        return max_score
+        return max(self._slot_candidates(req, role, is_mandatory)[1], 0.0)
 
-    def _optimize_gender_roles(self):
+    def _forma(self, nodo: PokemonRichiesto, produttori: Dict[int, Accoppiamento], forme: Dict[int, tuple]) -> tuple:
         """
-        Swaps Gen1 (Mother) and Gen2 (Father) in the plan if owned Pokemon
-        fit the swapped roles better.
+        Shape of the subtree of a node, with the two parents of every coupling
+        unordered and every stat replaced by its inventory mask, as in _equivalence_key:
+        plans with the same key give their nodes the same shapes and break their ties
+        the same way, and so do plans that are the same tree of real Pokemon.
         """
-        for livello in self.piano.livelli:
-            for acc in livello.accoppiamenti:
-                # Current Configuration: G1=Mother(Mandatory), G2=Father(Donor)
-                score_current = self._calculate_score_for_role(acc.genitore1, 'gen1', True) + \
-                                self._calculate_score_for_role(acc.genitore2, 'gen2', False)
+        if self._maschere is None:
+            self._maschere = _inventory_masks(self.pokemon_posseduti)
+        if id(nodo) not in forme:
+            etichetta = (tuple(sorted(self._maschere.get(self.legenda.get(r), 0) for r in nodo.ruoli_iv)),
+                         self.legenda.get(nodo.ruolo_natura, '') if nodo.ruolo_natura else '')
+            acc = produttori.get(id(nodo))
+            forme[id(nodo)] = (etichetta,) if acc is None else (etichetta,) + tuple(sorted(
+                (self._forma(acc.genitore1, produttori, forme), self._forma(acc.genitore2, produttori, forme))))
+        return forme[id(nodo)]
 
-                # Swapped Configuration: G2=Mother(Mandatory), G1=Father(Donor)
-                score_swap = self._calculate_score_for_role(acc.genitore2, 'gen1', True) + \
-                             self._calculate_score_for_role(acc.genitore1, 'gen2', False)
-
-                # UPDATE: Use >= to favor the Swap in case of ties.
-                # Prioritizing the 'gen1' (Mother/Mandatory) slot is financially better
-                # because the Mother determines the Species (expensive), whereas the Father
-                # is a generic donor (cheap).
-                # If both configurations have the same score (e.g. Owned Mother vs Owned Father),
-                # we prefer the one that uses the Owned Mother.
-
-                if score_swap >= score_current and score_swap > 0:
-                    # Perform Swap
-                    acc.genitore1, acc.genitore2 = acc.genitore2, acc.genitore1
+    def _optimize_gender_roles(self):
+        """
+        Chooses for every coupling which parent is the mother (Gen1) and which the
+        father (Gen2), for the whole tree at once, with a tree DP.
+        The state of a coupling is its orientation, and the female line links it to
+        the couplings above it: only the mother inherits the species constraint.
+        The value of a slot is the best score of an owned Pokemon for it (cached by
+        _calculate_score_for_role) when there is one, because the assignment fills it
+        and prunes its subtree; otherwise it is the value of the coupling that
+        produces it. The value of a coupling is the best, over its two orientations,
+        of the sum of the values of its two slots.
+        Values are vectors with one score per assignment priority group (mandatory
+        first, then by level, as in evaluate()) and a last entry counting the owned
+        Mothers, compared lexicographically: an owned Pokemon is given to the first
+        group that wants it, so a score in a later group cannot make up for one in an
+        earlier group. Among equal scores an owned Mother is financially better than
+        an owned Father, because the Mother determines the Species (expensive); full
+        ties make the parent with the larger shape (_forma) the mother, and keep the
+        generated orientation when the shapes are equal too. The argmax is applied
+        top-down.
+        """
+        if not self.piano.livelli:
+            return
+        produttori = {id(acc.figlio): acc for livello in self.piano.livelli for acc in livello.accoppiamenti}
+        livello_di = {id(acc): livello.livello_id for livello in self.piano.livelli for acc in livello.accoppiamenti}
+        livello_max = max(livello_di.values())
+        zero = (0.0,) * (2 * livello_max + 1)
+        # (coupling id, mandatory) -> (value of the coupling, swap)
+        memo: Dict[Tuple[int, bool], Tuple[Tuple[float, ...], bool]] = {}
+        forme: Dict[int, tuple] = {}
+
+        def valore_slot(nodo: PokemonRichiesto, role: str, is_mandatory: bool, livello_id: int) -> Tuple[float, ...]:
+            score = self._calculate_score_for_role(nodo, role, is_mandatory)
+            if score > 0:
+                valore = list(zero)
+                valore[(0 if is_mandatory else livello_max) + livello_max - livello_id] = score
+                valore[-1] = 1.0 if role == 'gen1' else 0.0
+                return tuple(valore)
+            acc = produttori.get(id(nodo))
+            return migliore(acc, is_mandatory)[0] if acc is not None else zero
+
+        def valore(acc, madre: PokemonRichiesto, padre: PokemonRichiesto, is_mandatory: bool) -> Tuple[float, ...]:
+            livello_id = livello_di[id(acc)]
+            return tuple(m + p for m, p in zip(valore_slot(madre, 'gen1', is_mandatory, livello_id),
+                                               valore_slot(padre, 'gen2', False, livello_id)))
+
+        def migliore(acc, is_mandatory: bool) -> Tuple[Tuple[float, ...], bool]:
+            chiave = (id(acc), is_mandatory)
+            if chiave not in memo:
+                corrente = valore(acc, acc.genitore1, acc.genitore2, is_mandatory)
+                scambio = valore(acc, acc.genitore2, acc.genitore1, is_mandatory)
+                if scambio == corrente:
+                    pari = self._forma(acc.genitore2, produttori, forme) > self._forma(acc.genitore1, produttori, forme)
+                    memo[chiave] = (corrente, pari)
+                else:
+                    memo[chiave] = (scambio, True) if scambio > corrente else (corrente, False)
+            return memo[chiave]
+
+        # Couplings under a filled slot are oriented too, in case the assignment
+        # gives its Pokemon to another slot
+        stack = [(self.piano.livelli[-1].accoppiamenti[0], True)]
+        while stack:
+            acc, is_mandatory = stack.pop()
+            if migliore(acc, is_mandatory)[1]:
+                # Perform Swap
+                acc.genitore1, acc.genitore2 = acc.genitore2, acc.genitore1
+            for nodo, nodo_mandatory in ((acc.genitore1, is_mandatory), (acc.genitore2, False)):
+                if id(nodo) in produttori:
+                    stack.append((produttori[id(nodo)], nodo_mandatory))
 
     def evaluate(self) -> PianoValutato:
         """
@@ -706,72 +877,176 @@ class PlanEvaluator:
         self._build_tree_maps()
         self._identify_mandatory_nodes()
         piano_valutato = PianoValutato(piano_originale=self.piano)
-        posseduti_disponibili = list(self.pokemon_posseduti)
 
-        potential_reqs = []
+        # Slots grouped by priority, highest first:
+        # 1. Mandatory Species Nodes (e.g. Mothers), because they are highly constrained.
+        #    If we fill generic Donor nodes first, we might consume the only Pokemon
+        #    capable of being the Mother, forcing a very expensive purchase.
+        # 2. Level (Higher = closer to the target), so an owned Pokemon prunes the
+        #    largest subtree it can.
+        gruppi: Dict[Tuple[bool, int], List[Tuple[int, PokemonRichiesto, str]]] = defaultdict(list)
         for livello in self.piano.livelli:
             for acc in livello.accoppiamenti:
-                potential_reqs.append({'req': acc.genitore1, 'id': id(acc.genitore1), 'level': livello.livello_id, 'role': 'gen1'})
-                potential_reqs.append({'req': acc.genitore2, 'id': id(acc.genitore2), 'level': livello.livello_id, 'role': 'gen2'})
-
-        # FIX PRIORITY BUG:
-        # We must prioritize Mandatory Species Nodes (e.g. Mothers) because they are highly constrained.
-        # If we fill generic Donor nodes first (because they have more IVs), we might consume
-        # the only Pokemon capable of being the Mother, forcing a very expensive purchase.
-        #
-        # Sort Key (Descending Order - Higher values processed first):
-        # 1. Is Mandatory? (True=1 > False=0)
-        # 2. Level (Higher = Deeper in tree)
-        # 3. IV Count (More constraints)
-        # 4. Has Nature (More constraints)
-        potential_reqs.sort(
-            key=lambda item: (
-                item['id'] in self._mandatory_species_nodes, # Primary: Mandatory Nodes First
-                item['level'],
-                len(item['req'].ruoli_iv),
-                item['req'].ruolo_natura is not None
-            ),
-            reverse=True
-        )
-
-        self.fulfilled_req_ids = set()
+                for richiesto, role in ((acc.genitore1, 'gen1'), (acc.genitore2, 'gen2')):
+                    req_id = id(richiesto)
+                    gruppi[(req_id in self._mandatory_species_nodes, livello.livello_id)].append((req_id, richiesto, role))
+        # Slots in order of shape, then of generation
+        produttori = {id(acc.figlio): acc for livello in self.piano.livelli for acc in livello.accoppiamenti}
+        forme: Dict[int, tuple] = {}
+        for slots in gruppi.values():
+            slots.sort(key=lambda slot: (self._forma(slot[1], produttori, forme), slot[2]))
+
+        # The matching is optimal inside each group, but a different choice in a group
+        # prunes different subtrees: the greedy result is kept when it scores higher
+        punteggio, assegnati, self.fulfilled_req_ids = self._assign_slots(gruppi, usa_matching=False)
+        if len(self.pokemon_posseduti) > 1:
+            risultato_matching = self._assign_slots(gruppi, usa_matching=True)
+            if risultato_matching[0] > punteggio:
+                punteggio, assegnati, self.fulfilled_req_ids = risultato_matching
+
+        piano_valutato.punteggio = punteggio
+        for req_id, indice in assegnati.items():
+            piano_valutato.pokemon_usati.add(self.pokemon_posseduti[indice].id_utente)
+            piano_valutato.mappa_assegnazioni[req_id] = self.pokemon_posseduti[indice].id_utente
+
+        piano_valutato.requisiti_mancanti = self._collect_unfilled_leaves(piano_valutato)
+        return piano_valutato
 
-        for item in potential_reqs:
-            req_id = item['id']
-            if req_id in self.fulfilled_req_ids:
+    def _assign_slots(self, gruppi: Dict[Tuple[bool, int], List[Tuple[int, PokemonRichiesto, str]]], usa_matching: bool) -> Tuple[float, Dict[int, int], Set[int]]:
+        """
+        Assigns the owned Pokemon to the slots, group by group in priority order.
+        The slots of a group are never ancestors of one another, so each group is an
+        independent assignment problem:
+        - greedy: slots with more IVs, then with a nature, first; each takes the valid
+          Pokemon with the least waste (first in the owned list on ties);
+        - matching: a maximum weight matching over the whole group, i.e. as many slots
+          as possible, then the best total score (which already counts the wasted IVs),
+          then fewer wasted natures.
+        An assigned slot prunes its subtree. Returns (score, {slot id: index in
+        pokemon_posseduti}, fulfilled slot ids).
+        """
+        punteggio = 0.0
+        assegnati: Dict[int, int] = {}
+        fulfilled: Set[int] = set()
+        disponibili = set(range(len(self.pokemon_posseduti)))
+
+        for chiave_gruppo in sorted(gruppi, reverse=True):
+            aperti = [slot for slot in gruppi[chiave_gruppo] if slot[0] not in fulfilled]
+            candidati = [[c for c in self._candidates_for(richiesto, role, chiave_gruppo[0]) if c[0] in disponibili]
+                         for _, richiesto, role in aperti]
+            if not any(candidati):
                 continue
 
-            richiesto = item['req']
+            if usa_matching:
+                scelte = max_weight_matching([
+                    {indice: PESO_ASSEGNAZIONE + 10 * score - nature_waste for indice, score, (_, nature_waste) in riga}
+                    for riga in candidati
+                ])
+                ordine = range(len(aperti))
+            else:
+                scelte = [None] * len(aperti)
+                ordine = sorted(range(len(aperti)), reverse=True,
+                                key=lambda k: (len(aperti[k][1].ruoli_iv), aperti[k][1].ruolo_natura is not None))
+
+            for k in ordine:
+                req_id, richiesto, _ = aperti[k]
+                indice = scelte[k]
+                if not usa_matching:
+                    validi = [(rank, i) for i, _, rank in candidati[k] if i in disponibili]
+                    indice = min(validi)[1] if validi else None
+                if indice is None:
+                    continue
+                punteggio += self._calcola_punteggio_match(richiesto, self.pokemon_posseduti[indice])
+                assegnati[req_id] = indice
+                disponibili.discard(indice)
+
+                q = [req_id]
+                while q:
+                    req_id_to_prune = q.pop(0)
+                    if req_id_to_prune not in fulfilled:
+                        fulfilled.add(req_id_to_prune)
+                        if req_id_to_prune in self._child_to_parents_map:
+                            q.extend(self._child_to_parents_map[req_id_to_prune])
+
+        return punteggio, assegnati, fulfilled
+
+    def _slot_nodes(self) -> List[PokemonRichiesto]:
+        """The nodes of every coupling in plan order: (genitore1, genitore2, figlio) for each."""
+        return [nodo for livello in self.piano.livelli for acc in livello.accoppiamenti
+                for nodo in (acc.genitore1, acc.genitore2, acc.figlio)]
+
+    def replicate(self, source: 'PlanEvaluator', source_result: PianoValutato, source_slots: List[PokemonRichiesto]) -> PianoValutato:
+        """
+        Builds the evaluation of this plan from the one of an equivalent plan (see
+        _equivalence_key) without running the assignment again: the slots correspond
+        by position, so the gender swaps and the assignments are copied over.
+        source_slots are the source nodes after _ensure_unique_nodes, before evaluate().
+        """
+        self._ensure_unique_nodes()
+        slots = self._slot_nodes()
+        corrispondenti = {id(nodo_sorgente): nodo for nodo_sorgente, nodo in zip(source_slots, slots)}
 
-            candidati_validi = []
-            role = item['role']
-            for candidato in posseduti_disponibili:
-                if self._is_valid_candidate(richiesto, candidato, req_id, role):
-                    rank = self._rank_candidate(richiesto, candidato)
-                    candidati_validi.append({'pokemon': candidato, 'rank': rank})
+        # Replay the swaps chosen by _optimize_gender_roles on the source
+        accoppiamenti_sorgente = [acc for livello in source.piano.livelli for acc in livello.accoppiamenti]
+        accoppiamenti = [acc for livello in self.piano.livelli for acc in livello.accoppiamenti]
+        for k, (acc_sorgente, acc) in enumerate(zip(accoppiamenti_sorgente, accoppiamenti)):
+            if acc_sorgente.genitore1 is not source_slots[3 * k]:
+                acc.genitore1, acc.genitore2 = acc.genitore2, acc.genitore1
 
-            if not candidati_validi:
-                continue
+        self._build_tree_maps()
+        self._identify_mandatory_nodes()
+        piano_valutato = PianoValutato(piano_originale=self.piano)
+        piano_valutato.punteggio = source_result.punteggio
+        piano_valutato.pokemon_usati = set(source_result.pokemon_usati)
+        piano_valutato.mappa_assegnazioni = {
+            id(corrispondenti[req_id]): id_utente for req_id, id_utente in source_result.mappa_assegnazioni.items()
+        }
+        self.fulfilled_req_ids = {id(corrispondenti[req_id]) for req_id in source.fulfilled_req_ids}
+        piano_valutato.requisiti_mancanti = self._collect_unfilled_leaves(piano_valutato)
+        return piano_valutato
 
-            candidati_validi.sort(key=lambda x: x['rank'])
-            best_candidate = candidati_validi[0]
-            best_pokemon_assegnato = best_candidate['pokemon']
+    def _collect_unfilled_leaves(self, piano_valutato: PianoValutato) -> List[RequisitoMancante]:
+        """
+        Lists the leaves reachable from the root without passing through an owned node,
+        reusing the tree maps built by evaluate().
+        """
+        if not self.piano.livelli:
+            return []
 
-            score = self._calcola_punteggio_match(richiesto, best_pokemon_assegnato)
-            piano_valutato.punteggio += score
-            piano_valutato.pokemon_usati.add(best_pokemon_assegnato.id_utente)
-            piano_valutato.mappa_assegnazioni[req_id] = best_pokemon_assegnato.id_utente
-            posseduti_disponibili.remove(best_pokemon_assegnato)
+        target_gender_type = "maschio e femmina"
+        if self.target_species in self.gender_data:
+            target_gender_type = self.gender_data[self.target_species].get("gender_type", "maschio e femmina").lower()
+        elif "Genderless" in self.pokemon_data.get(self.target_species, []):
+            target_gender_type = "genderless"
+        is_genderless_species = "genderless" in target_gender_type
 
-            q = [req_id]
-            while q:
-                req_id_to_prune = q.pop(0)
-                if req_id_to_prune not in self.fulfilled_req_ids:
-                    self.fulfilled_req_ids.add(req_id_to_prune)
-                    if req_id_to_prune in self._child_to_parents_map:
-                        q.extend(self._child_to_parents_map[req_id_to_prune])
+        requisiti = []
+        final_node = self.piano.livelli[-1].accoppiamenti[0].figlio
+        # (node id, role in the pairing that uses it)
+        stack = [(id(final_node), 'gen1')]
+        while stack:
+            node_id, role = stack.pop()
+            if node_id in piano_valutato.mappa_assegnazioni:
+                continue # Owned
+            if node_id in self._child_to_parents_map:
+                gen1_id, gen2_id = self._child_to_parents_map[node_id]
+                stack.append((gen2_id, 'gen2'))
+                stack.append((gen1_id, 'gen1'))
+                continue
 
-        return piano_valutato
+            node = self._node_map[node_id]
+            if is_genderless_species:
+                sesso = 'X'
+            else:
+                sesso = 'F' if role == 'gen1' else 'M'
+            requisiti.append(RequisitoMancante(
+                id_nodo=node_id,
+                statistiche=tuple(self.legenda[r] for r in node.ruoli_iv if r in self.legenda),
+                natura=self.legenda.get(node.ruolo_natura) if node.ruolo_natura else None,
+                obbligatorio=node_id in self._mandatory_species_nodes,
+                sesso=sesso
+            ))
+        return requisiti
 
     def update_cost(self, piano_valutato: PianoValutato):
         """
@@ -782,29 +1057,307 @@ class PlanEvaluator:
              # This ensures that nodes marked as OWNED are treated as Cost=0
              self.fulfilled_req_ids = set(piano_valutato.mappa_assegnazioni.keys())
              
+             self._sottoalberi_liberi = self._nodes_without_owned()
+             self._scelte_costo = {}
+
              final_node = self.piano.livelli[-1].accoppiamenti[0].figlio
              cost, decisions = self.calculate_cost_recursive(id(final_node), piano_valutato, True, memo={})
              piano_valutato.costo_totale = cost
              piano_valutato.mappa_acquisti = decisions
+             self._apply_cost_swaps((id(final_node), True, 'F'))
+
+    def _nodes_without_owned(self) -> Set[int]:
+        """Nodes with no owned Pokemon in their subtree, themselves included."""
+        liberi: Set[int] = set()
+        for livello in self.piano.livelli:  # Lower levels first: parents before their child
+            for acc in livello.accoppiamenti:
+                for nodo in (acc.genitore1, acc.genitore2):
+                    if id(nodo) not in self._child_to_parents_map and id(nodo) not in self.fulfilled_req_ids:
+                        liberi.add(id(nodo))
+                if id(acc.genitore1) in liberi and id(acc.genitore2) in liberi and id(acc.figlio) not in self.fulfilled_req_ids:
+                    liberi.add(id(acc.figlio))
+        return liberi
+
+    def _apply_cost_swaps(self, radice: tuple):
+        """
+        Swaps the parents of the couplings that calculate_cost_recursive costed swapped,
+        following the options it chose from the root, so that Gen1 is the mother of the
+        plan that is shown and priced.
+        """
+        produttori = {id(acc.figlio): acc for livello in self.piano.livelli for acc in livello.accoppiamenti}
+        scambiati = False
+        stack = [radice]
+        while stack:
+            chiave = stack.pop()
+            scelta = self._scelte_costo.get(chiave)
+            if scelta is None:
+                continue
+            scambio, chiavi = scelta
+            if scambio:
+                acc = produttori[chiave[0]]
+                acc.genitore1, acc.genitore2 = acc.genitore2, acc.genitore1
+                scambiati = True
+            stack.extend(chiavi)
+        if scambiati:
+            self._build_tree_maps()
+            self._identify_mandatory_nodes()
+
+
+def _opzioni_genitori(mandatory: bool, genderless: bool) -> List[Tuple[Tuple[bool, str], Tuple[bool, str]]]:
+    """
+    The (mandatory, gender) contexts of the two parents of a node, for the options of
+    calculate_cost_recursive: A (Gen1 is the mother of the line) and, on the mandatory
+    line, B (Ditto mother and a male of the species); genderless species use Ditto.
+    """
+    if genderless:
+        return [((mandatory, 'Genderless'), (False, 'Ditto'))]
+    if mandatory:
+        return [((True, 'F'), (False, 'M')), ((False, 'Ditto'), (True, 'M'))]
+    return [((False, 'F'), (False, 'M'))]
+
+
+@lru_cache(maxsize=None)
+def _programma_domanda(modello: Modello, genderless: bool) -> Tuple[Tuple[tuple, ...], Tuple[Tuple[int, Tuple[Tuple[int, int], ...]], ...]]:
+    """
+    Demand of a template with nothing owned, computed once per template: the distinct
+    ingredients it can need, ('foglia', first IV role or '', nature, mandatory, gender)
+    for a bought leaf or ('passo', nature, gender) for a breeding step (items and gender
+    fee), and a program over them. Every instruction is a subtree in
+    a context (mandatory, gender) of calculate_cost_recursive: (index of its ingredient,
+    pairs of earlier instructions for its parents). Its cost is the price of the
+    ingredient plus the cheapest pair; the last instruction is the whole plan.
+    The pairs are the options of calculate_cost_recursive (_opzioni_genitori) with both
+    parent orders, because with nothing owned update_cost tries both. Listing the demand
+    vector of every combination instead would not scale: over 500k vectors per template
+    at 5IV+nature. Templates are hash-consed, so a shared subtree is one instruction
+    per context.
+    """
+    ingredienti: Dict[tuple, int] = {}
+    istruzioni: List[Tuple[int, Tuple[Tuple[int, int], ...]]] = []
+    memo: Dict[Tuple[int, bool, str], int] = {}
+
+    def compila(m: Modello, mandatory: bool, gender: str) -> int:
+        chiave = (id(m), mandatory, gender)
+        if chiave not in memo:
+            ruoli, con_natura, genitore1, genitore2 = m
+            if genitore1 is None:
+                voce = ('foglia', ruoli[0] if ruoli else '', con_natura, mandatory, gender)
+                alternative = ()
+            else:
+                voce = ('passo', con_natura, gender)
+                alternative = tuple((compila(madre, mandatory_madre, gender_madre), compila(padre, mandatory_padre, gender_padre))
+                                    for madre, padre in ((genitore1, genitore2), (genitore2, genitore1))
+                                    for (mandatory_madre, gender_madre), (mandatory_padre, gender_padre)
+                                    in _opzioni_genitori(mandatory, genderless))
+            istruzioni.append((ingredienti.setdefault(voce, len(ingredienti)), alternative))
+            memo[chiave] = len(istruzioni) - 1
+        return memo[chiave]
+
+    compila(modello, True, 'F')
+    return tuple(ingredienti), tuple(istruzioni)
+
+
+def _inventory_masks(pokemon_posseduti: List[PokemonPosseduto]) -> Dict[str, int]:
+    """For each stat, the bitmask of the owned Pokemon (by position) that have it."""
+    maschere: Dict[str, int] = defaultdict(int)
+    for posizione, posseduto in enumerate(pokemon_posseduti):
+        for stat in posseduto.ivs:
+            maschere[stat] |= 1 << posizione
+    return maschere
 
 
-def valuta_piani(piani_generati: List[PianoCompleto], pokemon_posseduti: List[PokemonPosseduto], target_species: str = "Ditto", pokemon_data: Dict = {}, gender_data: Dict = {}) -> List[PianoValutato]:
+def _equivalence_key(piano: PianoCompleto, maschere: Dict[str, int]) -> tuple:
+    """
+    Key under which plans evaluate identically against the same inventory.
+    The evaluation only asks which owned Pokemon have each stat, so the legend is
+    projected on the inventory masks: stats that no owned Pokemon tells apart (e.g.
+    all the stats nobody owns) become the same label, also for the ties of the
+    evaluation (PlanEvaluator._forma). The slots are listed in plan order with the
+    position of their node, so equal keys mean the same shape and the same processing
+    order, and the slots of two such plans correspond one to one.
+    """
+    legenda = piano.legenda_ruoli
+    maschera_ruolo = {ruolo: maschere.get(stat, 0) for ruolo, stat in legenda.items()}
+    # The same role combinations repeat across the nodes of a plan: project each once
+    etichette: Dict[Tuple[Tuple[str, ...], Optional[str]], tuple] = {}
+    posizioni: Dict[int, int] = {}
+    chiave = []
+    for livello in piano.livelli:
+        for acc in livello.accoppiamenti:
+            for nodo in (acc.genitore1, acc.genitore2, acc.figlio):
+                ruoli = (nodo.ruoli_iv, nodo.ruolo_natura)
+                etichetta = etichette.get(ruoli)
+                if etichetta is None:
+                    etichetta = etichette[ruoli] = (
+                        tuple(sorted(maschera_ruolo.get(r, 0) for r in nodo.ruoli_iv)),
+                        legenda.get(nodo.ruolo_natura) if nodo.ruolo_natura else None)
+                chiave.append((posizioni.setdefault(id(nodo), len(posizioni)), etichetta))
+    return tuple(chiave)
+
+
+def valuta_piani(piani_generati: List[PianoCompleto], pokemon_posseduti: List[PokemonPosseduto], target_species: str = "Ditto", pokemon_data: Dict = {}, gender_data: Dict = {}, progress_callback: Optional[Callable[[int, int], None]] = None, cancel_event: Optional[threading.Event] = None, top_k_callback: Optional[Callable[[List[PianoValutato]], None]] = None, top_k: int = 20) -> List[PianoValutato]:
     """
     Initial evaluation based only on Owned Pokemon score.
     Now accepts context data to ensure correct Mandatory Node validation.
+    progress_callback(evaluated, total) reports progress; when cancel_event is set the
+    evaluation stops and the plans evaluated so far are returned.
+    top_k_callback(best_plans) receives the best 'top_k' plans so far (best first)
+    every time the leader changes.
+    Plans that are equivalent for the owned Pokemon (_equivalence_key) are evaluated
+    once; the others copy that result (replicate).
+    Every plan is returned, because the cost search that follows (costa_piani) ranks
+    them by cost, not by score, so none can be dropped there. Only the best 'top_k'
+    are ranked, best score first, from a bounded heap; the others follow them in
+    generation order, unsorted.
     """
     piani_valutati = []
-    for piano in piani_generati:
+    maschere = _inventory_masks(pokemon_posseduti)
+    # Equivalence key -> (evaluator, result, slots before evaluate) of the plan evaluated for it
+    rappresentanti: Dict[tuple, Tuple[PlanEvaluator, PianoValutato, List[PokemonRichiesto]]] = {}
+    # Valid owned Pokemon per kind of slot, the same for every plan (PlanEvaluator._candidates_for)
+    candidate_cache: Dict[tuple, list] = {}
+    posseduti = list(pokemon_posseduti)
+    equivalenti = 0
+    # When the inventory tells every target stat apart no two legends project alike
+    stat_obiettivo = piani_generati[0].ivs_target if piani_generati else []
+    raggruppa = len({maschere.get(stat, 0) for stat in stat_obiettivo}) < len(stat_obiettivo)
+    # Bounded min-heap of the best plans so far: (punteggio, -indice, piano).
+    # On equal score the earlier plan wins.
+    migliori: List[Tuple[float, int, PianoValutato]] = []
+    chiave_leader = None
+    totale = len(piani_generati)
+    for indice, piano in enumerate(piani_generati):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if progress_callback is not None and indice % 10 == 0:
+            progress_callback(indice, totale)
+        chiave = _equivalence_key(piano, maschere) if raggruppa else indice
+        rappresentante = rappresentanti.get(chiave)
+        if rappresentante is not None:
+            equivalenti += 1
         evaluator = PlanEvaluator(
             piano, 
-            list(pokemon_posseduti), 
+            posseduti, 
             target_species=target_species, 
             pokemon_data=pokemon_data, 
-            gender_data=gender_data
+            gender_data=gender_data,
+            candidate_cache=candidate_cache
         )
-        piano_valutato = evaluator.evaluate()
+        if rappresentante is not None:
+            piano_valutato = evaluator.replicate(*rappresentante)
+        else:
+            evaluator._ensure_unique_nodes()
+            slot_originali = evaluator._slot_nodes()
+            piano_valutato = evaluator.evaluate()
+            rappresentanti[chiave] = (evaluator, piano_valutato, slot_originali)
         piano_valutato.evaluator = evaluator  # Store evaluator
         piani_valutati.append(piano_valutato)
 
-    piani_valutati.sort(key=lambda p: p.punteggio, reverse=True)
-    return piani_valutati
+        voce = (piano_valutato.punteggio, -indice, piano_valutato)
+        if len(migliori) < top_k:
+            heapq.heappush(migliori, voce)
+        elif voce[:2] > migliori[0][:2]:
+            heapq.heapreplace(migliori, voce)
+        else:
+            continue
+        if top_k_callback is not None and (chiave_leader is None or voce[:2] > chiave_leader):
+            chiave_leader = voce[:2]
+            top_k_callback([v[2] for v in heapq.nlargest(top_k, migliori, key=lambda v: v[:2])])
+
+    if equivalenti:
+        print(f"[INFO] Valutati {len(rappresentanti)} piani, {equivalenti} equivalenti per i Pokémon posseduti non ricalcolati.")
+    classifica = [v[2] for v in sorted(migliori, key=lambda v: v[:2], reverse=True)]
+    in_classifica = {id(p) for p in classifica}
+    return classifica + [p for p in piani_valutati if id(p) not in in_classifica]
+
+
+def costa_piani(candidati: List[PianoValutato], pokemon_posseduti: List[PokemonPosseduto], price_manager: PriceManager, target_species: str = "Ditto", pokemon_data: Dict = {}, target_nature: Optional[str] = None, gender_data: Dict = {}, top_k: Optional[int] = None, progress_callback: Optional[Callable[[int, int], None]] = None, cancel_event: Optional[threading.Event] = None) -> List[PianoValutato]:
+    """
+    Prices evaluated plans (update_cost) and returns them cheapest first, ties by score.
+    With top_k the search is a branch-and-bound: plans are costed in order of their
+    cost_lower_bound and the search stops when the next bound is above the top_k-th
+    cost found, so the plans returned are exactly the top_k cheapest of all the
+    candidates while the others are never costed.
+    Without top_k every plan is costed. When cancel_event is set the plans costed so
+    far are returned.
+    """
+    valutatori = []
+    leaf_prices: Dict[tuple, int] = {}
+    for p_val in candidati:
+        ev = PlanEvaluator(
+            p_val.piano_originale,
+            pokemon_posseduti,
+            price_manager,
+            target_species,
+            pokemon_data,
+            target_nature,
+            gender_data
+        )
+        limite = None
+        if top_k:
+            # Without assignments the template gives the exact cost: the tightest
+            # bound, and the tree maps are only needed if the plan is costed
+            if not p_val.mappa_assegnazioni:
+                limite = ev.purchase_only_cost(leaf_prices)
+            if limite is None:
+                ev._build_tree_maps()
+                ev._identify_mandatory_nodes()
+                limite = ev.cost_lower_bound(p_val, leaf_prices)
+        valutatori.append((limite, ev, p_val))
+    if top_k:
+        # On equal bounds the better scored plan is costed first (stable for equal scores)
+        valutatori.sort(key=lambda v: (v[0], -v[2].punteggio))
+
+    costati: List[PianoValutato] = []
+    # Max-heap (negated) of the top_k lowest costs found so far
+    migliori_costi: List[int] = []
+    totale = len(valutatori)
+    for i, (limite, ev, p_val) in enumerate(valutatori):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if top_k and len(migliori_costi) == top_k and limite > -migliori_costi[0]:
+            print(f"[INFO] Costati {len(costati)} piani su {totale}: gli altri non possono scendere sotto i {top_k} più economici.")
+            break
+        if progress_callback is not None:
+            progress_callback(i, totale)
+        if not ev._node_map:
+            ev._build_tree_maps()
+            ev._identify_mandatory_nodes()  # Important for cost calculation context
+        ev.update_cost(p_val)
+        costati.append(p_val)
+        if top_k:
+            if len(migliori_costi) < top_k:
+                heapq.heappush(migliori_costi, -p_val.costo_totale)
+            elif p_val.costo_totale < -migliori_costi[0]:
+                heapq.heapreplace(migliori_costi, -p_val.costo_totale)
+
+    # Order: Primary Cost (Asc), Secondary Score (Desc), then the costing order
+    chiavi = {id(p): (p.costo_totale, -p.punteggio, posizione) for posizione, p in enumerate(costati)}
+    if top_k:
+        return heapq.nsmallest(top_k, costati, key=lambda p: chiavi[id(p)])
+    costati.sort(key=lambda p: chiavi[id(p)])
+    return costati
+
+
+def conta_acquisti(piano_valutato: PianoValutato) -> int:
+    """
+    Number of Pokemon to buy for a costed plan: the leaves in mappa_acquisti (which
+    also describes every bred node, as an "Allevamento" step).
+    """
+    figli = {id(acc.figlio) for livello in piano_valutato.piano_originale.livelli for acc in livello.accoppiamenti}
+    return sum(1 for node_id in piano_valutato.mappa_acquisti if node_id not in figli)
+
+
+def aggrega_requisiti_mancanti(piani_valutati: List[PianoValutato]) -> Counter:
+    """
+    Aggregates the unfilled leaves of any number of evaluated plans in one pass.
+    Returns a Counter {price key: number of leaves needing it}, where the keys are
+    the stat names plus "Natura", as used by the price dialog.
+    """
+    conteggi: Counter = Counter()
+    for piano_valutato in piani_valutati:
+        for requisito in piano_valutato.requisiti_mancanti:
+            conteggi.update(requisito.statistiche)
+            if requisito.natura:
+                conteggi["Natura"] += 1
+    return conteggi
@@ -0,0 +1,264 @@
+import tkinter as tk
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from structures import PianoCompleto, PianoValutato, PokemonRichiesto
+
+# Geometry of the breeding tree drawing
+NODE_WIDTH = 120
+NODE_HEIGHT = 50
+H_SPACING = 30
+V_SPACING = 90
+MARGIN_X = 50
+ROOT_Y = 50
+
+
+@dataclass
+class TreeLayout:
+    """
+    Positions of the visible nodes of a tree shape (root first, genitore1 before
+    genitore2). It holds no node of a plan: every plan with the same shape uses it,
+    with the nodes listed by visible_nodes in the same order.
+    """
+    centers: List[Tuple[float, float]] = field(default_factory=list)
+    # Canvas tag of each position, shared by the items drawn there
+    tags: List[str] = field(default_factory=list)
+    # parents[i] = (index of parent 1, index of parent 2) or None for a leaf / owned node
+    parents: List[Optional[Tuple[int, int]]] = field(default_factory=list)
+    # Area covered by each node and by the lines towards its parents
+    bounds: List[Tuple[float, float, float, float]] = field(default_factory=list)
+    width: float = 0
+    height: float = 0
+
+
+def _child_to_parents(piano: PianoCompleto) -> Dict[int, Tuple[PokemonRichiesto, PokemonRichiesto]]:
+    return {id(acc.figlio): (acc.genitore1, acc.genitore2) for livello in piano.livelli for acc in livello.accoppiamenti}
+
+
+def visible_nodes(piano: PianoCompleto, pruned: FrozenSet[int]) -> Tuple[tuple, List[PokemonRichiesto]]:
+    """
+    The shape of the visible tree and its nodes in layout order. Nodes in 'pruned'
+    (owned by the user) are leaves. The shape is the nested tuple of the parents of
+    every node, () for a leaf: it does not depend on the roles or on the node
+    objects, so plans of the same template (and owned nodes) share it.
+    """
+    child_to_parents = _child_to_parents(piano)
+
+    def parents_of(node) -> Optional[Tuple[PokemonRichiesto, PokemonRichiesto]]:
+        return child_to_parents.get(id(node)) if id(node) not in pruned else None
+
+    root = piano.livelli[-1].accoppiamenti[0].figlio
+    # Pre-order, as in compute_tree_layout (genitore1 subtree first)
+    nodes: List[PokemonRichiesto] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        parents = parents_of(node)
+        if parents is not None:
+            stack.append(parents[1])
+            stack.append(parents[0])
+    # Reversed pre-order visits the parents before their child
+    shapes: Dict[int, tuple] = {}
+    for node in reversed(nodes):
+        parents = parents_of(node)
+        shapes[id(node)] = () if parents is None else (shapes[id(parents[0])], shapes[id(parents[1])])
+    return shapes[id(root)], nodes
+
+
+def compute_tree_layout(piano: PianoCompleto, pruned: FrozenSet[int]) -> TreeLayout:
+    """
+    Lays out the tree of a plan without recursion.
+    Nodes in 'pruned' (owned by the user) are drawn as leaves: their subtree is hidden.
+    """
+    child_to_parents = _child_to_parents(piano)
+
+    def expanded(node) -> bool:
+        return id(node) in child_to_parents and id(node) not in pruned
+
+    root = piano.livelli[-1].accoppiamenti[0].figlio
+
+    # Post-order pass: width of every subtree
+    widths: Dict[int, float] = {}
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        node_id = id(node)
+        if node_id in widths:
+            continue
+        if not expanded(node):
+            widths[node_id] = NODE_WIDTH
+        elif visited:
+            genitore1, genitore2 = child_to_parents[node_id]
+            widths[node_id] = widths[id(genitore1)] + widths[id(genitore2)] + H_SPACING
+        else:
+            genitore1, genitore2 = child_to_parents[node_id]
+            stack.append((node, True))
+            stack.append((genitore2, False))
+            stack.append((genitore1, False))
+
+    # Pre-order pass: centers, parent links and bounds
+    layout = TreeLayout()
+    stack = [(root, widths[id(root)] / 2 + MARGIN_X, ROOT_Y, None, 0)]
+    while stack:
+        node, x, y, child_index, slot = stack.pop()
+        index = len(layout.centers)
+        layout.centers.append((x, y))
+        layout.tags.append(f"at{x:.0f}_{y:.0f}")
+        layout.parents.append(None)
+        layout.bounds.append((x - NODE_WIDTH / 2, y - NODE_HEIGHT / 2, x + NODE_WIDTH / 2, y + NODE_HEIGHT / 2))
+        if child_index is not None:
+            links = list(layout.parents[child_index] or (None, None))
+            links[slot] = index
+            layout.parents[child_index] = tuple(links)
+
+        if expanded(node):
+            genitore1, genitore2 = child_to_parents[id(node)]
+            width1 = widths[id(genitore1)]
+            width2 = widths[id(genitore2)]
+            start_x = x - (width1 + width2 + H_SPACING) / 2
+            x1 = start_x + width1 / 2
+            x2 = start_x + width1 + H_SPACING + width2 / 2
+            new_y = y + V_SPACING
+            # Area of the node plus the lines to its parents
+            layout.bounds[index] = (min(x1, x - NODE_WIDTH / 2), y - NODE_HEIGHT / 2, max(x2, x + NODE_WIDTH / 2), new_y - NODE_HEIGHT / 2)
+            stack.append((genitore2, x2, new_y, index, 1))
+            stack.append((genitore1, x1, new_y, index, 0))
+
+    layout.width = widths[id(root)]
+    layout.height = max(b[3] for b in layout.bounds)
+    return layout
+
+
+class PlanTreeView:
+    """
+    Draws the breeding tree of a PianoValutato on a Canvas.
+
+    Layouts are cached per tree shape (visible_nodes: the plan template with the
+    owned nodes as leaves), so the plans of one template share a layout. Canvas
+    items are created only for the nodes inside or near the visible region and added
+    while the user scrolls. Items are tagged by their position in the layout:
+    showing another plan with the same shape updates their text and colors through
+    those tags instead of redrawing.
+    """
+    CACHE_SIZE = 32
+    # Extra area around the viewport (in viewport sizes) drawn in advance
+    PRELOAD = 0.5
+
+    def __init__(self, canvas: tk.Canvas, describe: Callable[[PokemonRichiesto, PianoValutato], Tuple[str, str, str, bool]],
+                 xscrollcommand: Optional[Callable] = None, yscrollcommand: Optional[Callable] = None):
+        """
+        describe(node, piano_valutato) returns (text, fill, outline, bold) for a node.
+        The scroll commands are the scrollbar 'set' methods: the view wraps them to
+        notice scrolling and resizing.
+        """
+        self.canvas = canvas
+        self.describe = describe
+        self._xscrollcommand = xscrollcommand
+        self._yscrollcommand = yscrollcommand
+        self._layouts: "OrderedDict[tuple, TreeLayout]" = OrderedDict()
+        self.layout: Optional[TreeLayout] = None
+        # Nodes of the plan shown, in layout order
+        self.nodes: List[PokemonRichiesto] = []
+        self.piano_valutato: Optional[PianoValutato] = None
+        self._drawn: set = set()
+        self._pending = None
+        canvas.configure(xscrollcommand=self._on_xscroll, yscrollcommand=self._on_yscroll)
+
+    def clear(self):
+        """Removes everything from the canvas (including items not owned by the view)."""
+        self.canvas.delete("all")
+        self.layout = None
+        self.nodes = []
+        self.piano_valutato = None
+        self._drawn.clear()
+
+    def show(self, piano_valutato: PianoValutato):
+        layout, self.nodes = self._get_layout(piano_valutato)
+        self.piano_valutato = piano_valutato
+        if layout is self.layout:
+            # Same shape: refresh the items already on the canvas
+            for index in self._drawn:
+                self._update_node(index)
+        else:
+            self.canvas.delete("all")
+            self._drawn.clear()
+            self.layout = layout
+            self.canvas.config(scrollregion=(0, 0, layout.width + 2 * MARGIN_X, layout.height + MARGIN_X))
+        self._materialize()
+
+    def _get_layout(self, piano_valutato: PianoValutato) -> Tuple[TreeLayout, List[PokemonRichiesto]]:
+        piano = piano_valutato.piano_originale
+        internal = {id(acc.figlio) for livello in piano.livelli for acc in livello.accoppiamenti}
+        pruned = frozenset(internal.intersection(piano_valutato.mappa_assegnazioni))
+        shape, nodes = visible_nodes(piano, pruned)
+        layout = self._layouts.get(shape)
+        if layout is not None:
+            self._layouts.move_to_end(shape)
+            return layout, nodes
+
+        layout = compute_tree_layout(piano, pruned)
+        self._layouts[shape] = layout
+        while len(self._layouts) > self.CACHE_SIZE:
+            self._layouts.popitem(last=False)
+        return layout, nodes
+
+    def _on_xscroll(self, first, last):
+        if self._xscrollcommand:
+            self._xscrollcommand(first, last)
+        self._schedule_materialize()
+
+    def _on_yscroll(self, first, last):
+        if self._yscrollcommand:
+            self._yscrollcommand(first, last)
+        self._schedule_materialize()
+
+    def _schedule_materialize(self):
+        if self._pending is None and self.layout is not None:
+            self._pending = self.canvas.after_idle(self._materialize)
+
+    def _materialize(self):
+        """Creates the items of the nodes that entered the (extended) visible region."""
+        self._pending = None
+        layout = self.layout
+        if layout is None or len(self._drawn) == len(layout.centers):
+            return
+
+        width = max(self.canvas.winfo_width(), 1)
+        height = max(self.canvas.winfo_height(), 1)
+        left = self.canvas.canvasx(0) - width * self.PRELOAD
+        top = self.canvas.canvasy(0) - height * self.PRELOAD
+        right = left + width * (1 + 2 * self.PRELOAD)
+        bottom = top + height * (1 + 2 * self.PRELOAD)
+
+        for index, (x0, y0, x1, y1) in enumerate(layout.bounds):
+            if index in self._drawn:
+                continue
+            if x1 < left or x0 > right or y1 < top or y0 > bottom:
+                continue
+            self._create_node(index)
+
+    def _create_node(self, index: int):
+        layout = self.layout
+        x, y = layout.centers[index]
+        tag = layout.tags[index]
+
+        links = layout.parents[index]
+        if links is not None:
+            for parent_index in links:
+                px, py = layout.centers[parent_index]
+                self.canvas.create_line(x, y + NODE_HEIGHT / 2, px, py - NODE_HEIGHT / 2, width=1.5, tags=("tree", tag))
+            # Lines below the boxes of the parents, if those are already drawn
+            self.canvas.tag_lower(tag)
+
+        self.canvas.create_rectangle(x - NODE_WIDTH / 2, y - NODE_HEIGHT / 2, x + NODE_WIDTH / 2, y + NODE_HEIGHT / 2, width=2, tags=("tree", tag, f"box_{tag}"))
+        self.canvas.create_text(x, y, justify=tk.CENTER, tags=("tree", tag, f"label_{tag}"))
+        self._drawn.add(index)
+        self._update_node(index)
+
+    def _update_node(self, index: int):
+        tag = self.layout.tags[index]
+        text, fill, outline, bold = self.describe(self.nodes[index], self.piano_valutato)
+        self.canvas.itemconfig(f"box_{tag}", fill=fill, outline=outline)
+        self.canvas.itemconfig(f"label_{tag}", text=text, font=("Arial", 8, "bold" if bold else "normal"))
@@ -1,5 +1,7 @@
+import copy
 import json
 import os
+import threading
 from typing import Dict, Optional
 
 class PriceManager:
@@ -14,6 +16,8 @@ class PriceManager:
     """
     FILE_PATH = os.path.join("data", "market_prices.json")
     DEFAULT_PRICE = 999999999
+    # Seconds of inactivity after which request_save() writes the file
+    SAVE_DELAY = 1.0
 
     # Mapping: Italian (App) -> English (DB)
     TRANSLATION_MAP = {
@@ -37,8 +41,25 @@ class PriceManager:
         # Data structure: Dict[Stat, Dict[Category, Dict[Gender, int]]]
         self.prices: Dict[str, Dict[str, Dict[str, int]]] = {}
         self.language = language
+        self._init_sync()
         self.load_prices()
 
+    def _init_sync(self):
+        # _lock guards 'prices' (the debounced save reads it from a timer thread);
+        # _write_lock keeps the file writes in order
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+
+    def __deepcopy__(self, memo):
+        """Copies the prices only: the copy is a session snapshot, without pending saves."""
+        clone = PriceManager.__new__(PriceManager)
+        clone.language = self.language
+        clone._init_sync()
+        with self._lock:
+            clone.prices = copy.deepcopy(self.prices, memo)
+        return clone
+
     def _get_translated_category(self, category: str) -> str:
         """
         Translates the category based on the current language setting.
@@ -80,12 +101,13 @@ class PriceManager:
         # Translate category to ensure consistency (IT -> EN)
         mapped_category = self._get_translated_category(category)
 
-        if stat_name not in self.prices:
-            self.prices[stat_name] = {}
-        if mapped_category not in self.prices[stat_name]:
-            self.prices[stat_name][mapped_category] = {}
+        with self._lock:
+            if stat_name not in self.prices:
+                self.prices[stat_name] = {}
+            if mapped_category not in self.prices[stat_name]:
+                self.prices[stat_name][mapped_category] = {}
 
-        self.prices[stat_name][mapped_category][gender] = price
+            self.prices[stat_name][mapped_category][gender] = price
 
     def get_price(self, stat_name: str, category: str, gender: str) -> int:
         """
@@ -101,16 +123,57 @@ class PriceManager:
              return 999999999
 
     def clear(self):
-        self.prices = {}
+        with self._lock:
+            self.prices = {}
         self.save_prices()
 
     def save_prices(self):
-        self.normalize_prices()
-        try:
-            with open(self.FILE_PATH, 'w', encoding='utf-8') as f:
-                json.dump(self.prices, f, indent=4)
-        except IOError as e:
-            print(f"Error saving prices: {e}")
+        """Writes the whole price book now, on the calling thread."""
+        with self._write_lock:
+            with self._lock:
+                self.normalize_prices()
+                content = json.dumps(self.prices, indent=4)
+            try:
+                # Write to a temporary file first: an interrupted save never truncates the book
+                tmp_path = self.FILE_PATH + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, self.FILE_PATH)
+            except IOError as e:
+                print(f"Error saving prices: {e}")
+
+    def request_save(self, delay: Optional[float] = None):
+        """
+        Debounced save on a background thread: the changes made until 'delay' seconds
+        pass without a new request are written with a single save. The save rewrites
+        the whole file (save_prices); only the Tk thread is spared the write.
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.SAVE_DELAY if delay is None else delay, self._run_scheduled_save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _run_scheduled_save(self):
+        with self._lock:
+            # A newer request may have replaced this timer while it was starting
+            if self._save_timer is not threading.current_thread():
+                return
+            self._save_timer = None
+        self.save_prices()
+
+    def flush(self):
+        """Performs a pending debounced save now (e.g. before exiting)."""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is not None:
+            timer.cancel()
+            self.save_prices()
+        else:
+            # Waits for a save already running on the timer thread
+            with self._write_lock:
+                pass
 
     def load_prices(self):
         if not os.path.exists(self.FILE_PATH):
@@ -118,8 +181,10 @@ class PriceManager:
 
         try:
             with open(self.FILE_PATH, 'r', encoding='utf-8') as f:
-                self.prices = json.load(f)
-            self.normalize_prices()
+                prices = json.load(f)
+            with self._lock:
+                self.prices = prices
+                self.normalize_prices()
         except (IOError, json.JSONDecodeError) as e:
             print(f"Error loading prices: {e}")
             self.prices = {}
@@ -9,7 +9,7 @@ from typing import List, Set, Dict, Any
 from structures import PokemonPosseduto, PokemonRichiesto, PianoValutato
 from price_manager import PriceManager
 from core_engine import esegui_generazione
-from plan_evaluator import PlanEvaluator, valuta_piani
+from plan_evaluator import valuta_piani, costa_piani
 
 def load_data():
     """Carica i dati JSON una sola volta."""
@@ -69,8 +69,7 @@ def run_test_scenario(
     # 3. EVALUATION (Phase 1)
     # Allows assignments of Owned Pokemon
     piani_valutati = valuta_piani(piani_generati, owned_list, target_species, pokemon_data, gender_data)
-    candidates = piani_valutati[:20] # Top 20 based on scoring
-    print(f"[3] Selected {len(candidates)} candidates for pricing.")
+    print(f"[3] Evaluated {len(piani_valutati)} candidates for pricing.")
 
     # 4. SETUP PRICES
     print("[4] Configuring Prices...")
@@ -137,24 +136,9 @@ def run_test_scenario(
                  pm.set_price(stat, group, "F", final_prices["EggGroup_F"])
 
     # 5. COST CALCULATION (Phase 2)
+    # Branch-and-bound over all the candidates: the 20 cheapest are exact
     print("[5] Calculating Final Costs...")
-    for p_val in candidates:
-        ev = PlanEvaluator(
-            p_val.piano_originale,
-            owned_list,
-            pm,
-            target_species,
-            pokemon_data,
-            target_nature,
-            gender_data
-        )
-        ev._build_tree_maps()
-        ev._identify_mandatory_nodes()
-        ev.update_cost(p_val) # Runs calculate_cost_recursive respecting assignments
-
-    # Sort by Cost
-    candidates.sort(key=lambda p: p.punteggio, reverse=True) # Score first
-    candidates.sort(key=lambda p: p.costo_totale) # Then Cost ascending
+    candidates = costa_piani(piani_valutati, owned_list, pm, target_species, pokemon_data, target_nature, gender_data, top_k=20)
 
     best_plan = candidates[0]
 
@@ -0,0 +1,158 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+try:
+    from PIL import Image, ImageGrab
+except ImportError:
+    # Only the file backend needs PIL without a screen; checked when a backend is created
+    pass
+
+try:
+    import mss
+except ImportError:
+    mss = None
+
+
+class ScreenGrabber(ABC):
+    """
+    Captures a fixed screen region into a preallocated RGB buffer.
+
+    grab() fills the same (H, W, 3) uint8 buffer on every call and returns it, so
+    high-frequency polling does not allocate a new output image per frame (what the
+    backend allocates to read the screen is up to the backend). The returned array
+    is overwritten by the next grab(): copy it if it must outlive the frame.
+    Backends implement _fill.
+    """
+    name = "base"
+
+    def __init__(self, region: Tuple[int, int, int, int]):
+        self.region = region
+        left, top, right, bottom = region
+        self.width = right - left
+        self.height = bottom - top
+        self.buffer = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.frames = 0
+
+    def open(self):
+        """Acquires the persistent capture handle (if the backend has one)."""
+
+    def close(self):
+        """Releases the capture handle."""
+
+    def grab(self) -> np.ndarray:
+        self._fill(self.buffer)
+        self.frames += 1
+        return self.buffer
+
+    @abstractmethod
+    def _fill(self, out: np.ndarray):
+        """Writes the current frame of the region into out, an (H, W, 3) RGB buffer."""
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MssGrabber(ScreenGrabber):
+    """
+    Backend based on 'mss': the capture handle is opened once and reused.
+    mss has no way to capture into a given buffer, so every grab still allocates its
+    ScreenShot and raw BGRA bytes; the frame is read through a NumPy view and copied
+    straight into the reused RGB buffer, with no other copy or PIL image.
+    """
+    name = "mss"
+
+    def __init__(self, region: Tuple[int, int, int, int]):
+        super().__init__(region)
+        self._monitor = {"left": region[0], "top": region[1], "width": self.width, "height": self.height}
+        self._sct = None
+
+    def open(self):
+        if self._sct is None:
+            self._sct = mss.mss()
+
+    def close(self):
+        if self._sct is not None:
+            self._sct.close()
+            self._sct = None
+
+    def _fill(self, out: np.ndarray):
+        self.open()
+        shot = self._sct.grab(self._monitor)
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(self.height, self.width, 4)
+        np.copyto(out, bgra[..., 2::-1])
+
+
+class PilGrabber(ScreenGrabber):
+    """Fallback backend based on PIL.ImageGrab (allocates a PIL image per frame)."""
+    name = "pil"
+
+    def _fill(self, out: np.ndarray):
+        image = ImageGrab.grab(bbox=self.region)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        np.copyto(out, np.asarray(image))
+
+
+class FileGrabber(ScreenGrabber):
+    """
+    Fake screen fed from image files, for tests and offline benchmarks.
+
+    Each file is a frame: full screenshots are cropped to the region, while files
+    with exactly the region size are used as they are. Frames are decoded once and
+    replayed in a loop.
+    """
+    name = "file"
+
+    def __init__(self, region: Tuple[int, int, int, int], files: Sequence[str] = ()):
+        super().__init__(region)
+        self._frames: List[np.ndarray] = []
+        self._next = 0
+        for path in files:
+            self.add_file(path)
+
+    def add_file(self, path: str):
+        with Image.open(path) as img:
+            frame = np.array(img.convert("RGB"))
+        if frame.shape[:2] != (self.height, self.width):
+            left, top, right, bottom = self.region
+            frame = frame[top:bottom, left:right]
+            if frame.shape[:2] != (self.height, self.width):
+                raise ValueError(f"'{os.path.basename(path)}' non contiene la regione {self.region}")
+        self._frames.append(frame)
+
+    def seek(self, index: int):
+        """Selects the frame returned by the next grab()."""
+        self._next = index % len(self._frames)
+
+    def _fill(self, out: np.ndarray):
+        if not self._frames:
+            raise RuntimeError("FileGrabber senza frame")
+        np.copyto(out, self._frames[self._next])
+        self._next = (self._next + 1) % len(self._frames)
+
+
+# Registry of the capture backends: name -> class
+GRABBER_BACKENDS: Dict[str, Type[ScreenGrabber]] = {
+    MssGrabber.name: MssGrabber,
+    PilGrabber.name: PilGrabber,
+    FileGrabber.name: FileGrabber,
+}
+
+
+def create_grabber(region: Tuple[int, int, int, int], backend: Optional[str] = None, **kwargs) -> ScreenGrabber:
+    """
+    Creates the grabber for a screen region.
+    Without an explicit backend, 'mss' is preferred when installed, then PIL.ImageGrab.
+    """
+    if backend is None:
+        backend = MssGrabber.name if mss is not None else PilGrabber.name
+    if backend not in GRABBER_BACKENDS:
+        raise ValueError(f"Backend di cattura sconosciuto: {backend}")
+    return GRABBER_BACKENDS[backend](region, **kwargs)
@@ -0,0 +1,124 @@
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Symbols in species names and their spelled-out forms (English and Italian)
+_SYMBOL_ALIASES = {
+    "♀": ["f", "female", "femmina"],
+    "♂": ["m", "male", "maschio"],
+}
+
+# Alternate spellings of species names. Italian and English names are the same, so
+# these are the long forms and common misspellings (and the correct spelling of
+# 'Whirlpede', as it is written in pokemon_data.json).
+_NAME_ALIASES = {
+    "Mr. Mime": ["Mister Mime"],
+    "Mime Jr.": ["Mime Junior"],
+    "Farfetch'd": ["Farfetched"],
+    "Porygon2": ["Porygon Two"],
+    "Porygon-Z": ["Porygon Zeta"],
+    "Whirlpede": ["Whirlipede"],
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, no accents, only letters and digits (e.g. "Mr. Mime" -> "mrmime")."""
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text.lower() if c.isalnum() and not unicodedata.combining(c))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of a normalized string, padded so that the first letters weigh more."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance between a and b, or limit + 1 as soon as it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SpeciesSearchIndex:
+    """
+    Fuzzy search over species names and their aliases.
+
+    Every name and alias is normalized and split into trigrams once; a query only
+    scores the entries that share at least one trigram with it. Results are ranked:
+    prefix matches first (as the old autocomplete did), then substring matches,
+    then typos by edit distance and trigram similarity.
+    """
+    MAX_RESULTS = 20
+
+    def __init__(self, names: Iterable[str], aliases: Optional[Dict[str, Iterable[str]]] = None):
+        self.names: List[str] = sorted(set(names), key=str.lower)
+        # Searchable keys: (normalized text, index of the species in self.names)
+        self.keys: List[Tuple[str, int]] = []
+        self.by_trigram: Dict[str, List[int]] = defaultdict(list)
+
+        for index, name in enumerate(self.names):
+            variants = {normalize(name)}
+            for symbol, spelled in _SYMBOL_ALIASES.items():
+                if symbol in name:
+                    variants.update(normalize(name.replace(symbol, word)) for word in spelled)
+            variants.update(normalize(alias) for alias in _NAME_ALIASES.get(name, ()))
+            if aliases:
+                variants.update(normalize(str(alias)) for alias in aliases.get(name, ()))
+            for variant in variants:
+                if variant:
+                    self._add_key(variant, index)
+
+    def _add_key(self, text: str, species_index: int):
+        key_index = len(self.keys)
+        self.keys.append((text, species_index))
+        for gram in trigrams(text):
+            self.by_trigram[gram].append(key_index)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Returns the species matching 'query', best first."""
+        limit = limit if limit is not None else self.MAX_RESULTS
+        q = normalize(query)
+        if not q:
+            return self.names[:limit]
+
+        query_grams = trigrams(q)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in query_grams:
+            for key_index in self.by_trigram.get(gram, ()):
+                shared[key_index] += 1
+
+        # Allowed typos grow with the length of the query
+        max_typos = 0 if len(q) < 3 else (1 if len(q) < 6 else 2)
+        best: Dict[int, tuple] = {}
+        for key_index, common in shared.items():
+            text, species_index = self.keys[key_index]
+            if text.startswith(q):
+                # Exact match first, then alphabetical like the old prefix completion
+                rank = (0, 0 if text == q else 1, 0)
+            elif q in text:
+                rank = (1, 0, text.index(q))
+            else:
+                if max_typos == 0:
+                    continue
+                # Compare with the start of the name too: the user may still be typing
+                distance = min(edit_distance(q, text, max_typos), edit_distance(q, text[:len(q)], max_typos))
+                if distance > max_typos:
+                    continue
+                similarity = 2 * common / (len(query_grams) + len(trigrams(text)))
+                rank = (2, distance, -similarity)
+
+            current = best.get(species_index)
+            if current is None or rank < current:
+                best[species_index] = rank
+
+        ordered = sorted(best, key=lambda species_index: (best[species_index], self.names[species_index].lower()))
+        return [self.names[species_index] for species_index in ordered[:limit]]
@@ -45,6 +45,8 @@ class PianoCompleto:
     natura_target: Optional[str]
     legenda_ruoli: Dict[str, str]
     livelli: List[Livello] = field(default_factory=list)
+    # (modello, specchio) da cui core_engine ha costruito i livelli, None per gli altri piani
+    struttura: Optional[tuple] = field(default=None, repr=False, compare=False)
 
 @dataclass
 class PokemonPosseduto:
@@ -58,6 +60,17 @@ class PokemonPosseduto:
     def __post_init__(self):
         self.ivs.sort()
 
+@dataclass
+class RequisitoMancante:
+    """Una foglia del piano che nessun Pokémon posseduto copre (da comprare o allevare)."""
+    id_nodo: int
+    statistiche: Tuple[str, ...] = field(default_factory=tuple)
+    natura: Optional[str] = None
+    # True se la foglia deve essere della specie target (linea materna), False se è un donatore
+    obbligatorio: bool = False
+    # 'F' (madre), 'M' (padre) o 'X' (specie genderless: nessun vincolo di sesso)
+    sesso: str = 'F'
+
 @dataclass
 class PianoValutato:
     """Contiene un piano generato e i risultati della sua valutazione."""
@@ -70,4 +83,6 @@ class PianoValutato:
     # per garantire l'univocità di ogni "slot" genitore nel piano.
     mappa_assegnazioni: Dict[int, str] = field(default_factory=dict)
     # Mappa delle decisioni di acquisto: {id_nodo: "Descrizione acquisto"}
-    mappa_acquisti: Dict[int, str] = field(default_factory=dict)
\ No newline at end of file
+    mappa_acquisti: Dict[int, str] = field(default_factory=dict)
+    # Foglie non coperte dai Pokémon posseduti, calcolate da PlanEvaluator.evaluate()
+    requisiti_mancanti: List[RequisitoMancante] = field(default_factory=list)
\ No newline at end of file
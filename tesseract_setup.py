@@ -1,6 +1,5 @@
 import sys
 import os
-import pytesseract
 
 def get_base_path():
     """
@@ -17,7 +16,10 @@ def setup_tesseract():
     Configures pytesseract to use the local Tesseract-OCR folder.
     Sets tesseract_cmd and TESSDATA_PREFIX.
     Returns the absolute path to tesseract.exe.
+    pytesseract is imported here, so that importing this module stays cheap.
     """
+    import pytesseract
+
     base_path = get_base_path()
     
     # Path to Tesseract executalbe
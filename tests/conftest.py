@@ -0,0 +1,44 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RADICE)
+
+from price_manager import PriceManager  # noqa: E402
+
+STATISTICHE = ["PS", "Attacco", "Difesa", "Attacco Speciale", "Difesa Speciale", "Velocità"]
+
+
+@pytest.fixture(scope="session")
+def pokemon_data():
+    with open(os.path.join(RADICE, "data", "pokemon_data.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def gender_data():
+    with open(os.path.join(RADICE, "data", "pokemon_gender.json"), encoding="utf-8") as f:
+        return {voce["name"]: voce for voce in json.load(f)}
+
+
+@pytest.fixture
+def listino(tmp_path, monkeypatch, pokemon_data):
+    """Factory of PriceManagers with random prices for a species, never touching data/."""
+    monkeypatch.setattr(PriceManager, "FILE_PATH", str(tmp_path / "market_prices.json"))
+
+    def crea(specie, seed=0):
+        rnd = random.Random(seed)
+        pm = PriceManager()
+        for stat in ["Base", "Natura"] + STATISTICHE:
+            pm.set_price(stat, "Specie", "M", rnd.randint(2000, 9000))
+            pm.set_price(stat, "Specie", "F", rnd.randint(2000, 12000))
+            pm.set_price(stat, "Ditto", "X", rnd.randint(3000, 9000))
+            for gruppo in pokemon_data.get(specie, []):
+                pm.set_price(stat, gruppo, "M", rnd.randint(1000, 6000))
+        return pm
+    return crea
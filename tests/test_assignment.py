@@ -0,0 +1,75 @@
+import itertools
+import random
+
+import pytest
+
+from assignment import max_weight_matching, min_cost_assignment
+
+
+def costo_greedy(cost):
+    """Each row in turn takes its cheapest free column."""
+    libere = set(range(len(cost[0])))
+    totale = 0
+    for riga in cost:
+        j = min(libere, key=lambda c: riga[c])
+        libere.remove(j)
+        totale += riga[j]
+    return totale
+
+
+def costo_ottimo(cost):
+    return min(sum(cost[i][j] for i, j in enumerate(colonne))
+               for colonne in itertools.permutations(range(len(cost[0])), len(cost)))
+
+
+def test_hungarian_batte_greedy():
+    # Row 0 grabs column 0 and leaves row 1 the expensive column
+    cost = [[1, 2],
+            [2, 100]]
+    assert costo_greedy(cost) == 101
+    assert min_cost_assignment(cost) == [1, 0]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_hungarian_ottimo_su_matrici_casuali(seed):
+    rnd = random.Random(seed)
+    n = rnd.randint(1, 5)
+    m = rnd.randint(n, 6)
+    cost = [[rnd.randint(0, 20) for _ in range(m)] for _ in range(n)]
+    assegnazione = min_cost_assignment(cost)
+    assert len(set(assegnazione)) == n
+    assert sum(cost[i][j] for i, j in enumerate(assegnazione)) == costo_ottimo(cost)
+
+
+def test_righe_piu_delle_colonne():
+    with pytest.raises(ValueError):
+        min_cost_assignment([[1], [2]])
+    assert min_cost_assignment([]) == []
+
+
+def test_matching_batte_greedy():
+    # Greedy gives column 0 to row 0 (its best) and row 1 stays empty
+    weights = [{0: 10, 1: 9}, {0: 9}]
+    assert max_weight_matching(weights) == [1, 0]
+
+
+def test_matching_senza_conflitti_e_righe_vuote():
+    assert max_weight_matching([{2: 1.0}, {}, {0: 3.0, 1: 5.0}]) == [2, None, 1]
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_matching_ottimo_su_grafi_casuali(seed):
+    rnd = random.Random(seed)
+    righe, colonne = rnd.randint(1, 5), rnd.randint(1, 5)
+    weights = [{j: rnd.randint(1, 10) for j in range(colonne) if rnd.random() < 0.5} for _ in range(righe)]
+    scelte = max_weight_matching(weights)
+    usate = [j for j in scelte if j is not None]
+    assert len(usate) == len(set(usate))
+    assert all(j is None or j in weights[i] for i, j in enumerate(scelte))
+
+    migliore = 0
+    for colonne_scelte in itertools.product(*[[None] + list(riga) for riga in weights]):
+        prese = [j for j in colonne_scelte if j is not None]
+        if len(prese) == len(set(prese)):
+            migliore = max(migliore, sum(weights[i][j] for i, j in enumerate(colonne_scelte) if j is not None))
+    assert sum(weights[i][j] for i, j in enumerate(scelte) if j is not None) == migliore
@@ -0,0 +1,66 @@
+import logging
+
+import async_log
+from async_log import RateLimitFilter
+
+
+class Orologio:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def record(nome, msg, *args):
+    return logging.LogRecord(nome, logging.INFO, __file__, 0, msg, args, None)
+
+
+def test_chiave_su_modello_e_logger(monkeypatch):
+    orologio = Orologio()
+    monkeypatch.setattr(async_log.time, "monotonic", orologio)
+    filtro = RateLimitFilter(burst=2, period=1.0)
+    # Same template with different arguments shares one window
+    passati = [filtro.filter(record("gui", "Prezzo %s", i)) for i in range(5)]
+    assert passati == [True, True, False, False, False]
+    # Another logger with the same template has its own window
+    assert filtro.filter(record("ocr", "Prezzo %s", 0))
+    orologio.t = 1.5
+    r = record("gui", "Prezzo %s", 9)
+    assert filtro.filter(r)
+    assert r.getMessage() == "Prezzo 9 [3 messaggi simili soppressi]"
+
+
+def test_finestre_scadute_rimosse(monkeypatch):
+    orologio = Orologio()
+    monkeypatch.setattr(async_log.time, "monotonic", orologio)
+    filtro = RateLimitFilter(burst=1, period=1.0, keep_dropped=10)
+    for i in range(100):
+        filtro.filter(record("gui", f"Messaggio {i}"))
+    filtro.filter(record("gui", "Ripetuto"))
+    filtro.filter(record("gui", "Ripetuto"))
+    orologio.t = 2.0
+    filtro.filter(record("gui", "Altro"))
+    # Only the window with a dropped record to report survives, besides the new one
+    assert set(filtro._windows) == {("gui", "Ripetuto"), ("gui", "Altro")}
+    orologio.t = 20.0
+    filtro.filter(record("gui", "Altro"))
+    assert set(filtro._windows) == {("gui", "Altro")}
+
+
+def test_stop_scrive_la_coda_e_si_puo_ripetere(tmp_path):
+    percorso = tmp_path / "debug" / "gui_events.log"
+    root = logging.getLogger()
+    livello = root.level
+    listener = async_log.setup_logging(str(percorso))
+    try:
+        logging.info("Application Closed")
+        # Called when the window closes, then again by the exit hook
+        listener.stop()
+        listener.stop()
+    finally:
+        for handler in root.handlers[:]:
+            if isinstance(handler, async_log.DeferredQueueHandler):
+                root.removeHandler(handler)
+        root.setLevel(livello)
+    assert "Application Closed" in percorso.read_text(encoding="utf-8")
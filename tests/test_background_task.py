@@ -0,0 +1,205 @@
+import threading
+
+import background_task
+from background_task import BackgroundTask
+
+
+class Widget:
+    """Stands in for the Tk widget: the poll scheduled with after() runs only on tick()."""
+    def __init__(self):
+        self.pendenti = []
+
+    def after(self, ms, callback):
+        self.pendenti.append(callback)
+        return len(self.pendenti)
+
+    def tick(self):
+        pendenti, self.pendenti = self.pendenti, []
+        for callback in pendenti:
+            callback()
+
+
+class Registro:
+    def __init__(self):
+        self.eventi = []
+
+    def callbacks(self):
+        return dict(
+            on_progress=lambda *p: self.eventi.append(("progress", p)),
+            on_done=lambda r: self.eventi.append(("done", r)),
+            on_error=lambda e: self.eventi.append(("error", e)),
+            on_cancelled=lambda: self.eventi.append(("cancelled", None)),
+        )
+
+
+def esegui(work, **kwargs):
+    """Starts the task, waits for the worker and polls until an outcome is delivered."""
+    widget = Widget()
+    registro = Registro()
+    task = BackgroundTask(widget, work, **registro.callbacks(), **kwargs)
+    task.start()
+    task._thread.join(timeout=5)
+    while widget.pendenti:
+        widget.tick()
+    return task, registro.eventi
+
+
+def test_risultato():
+    def work(report, cancel_event):
+        for i in range(3):
+            report("Valutazione", i + 1, 3)
+        return 42
+
+    task, eventi = esegui(work)
+    # With the outcome in the same poll only the result is delivered
+    assert eventi == [("done", 42)]
+    assert not task.running
+
+
+def test_avanzamento_solo_l_ultimo_del_tick():
+    widget = Widget()
+    registro = Registro()
+    passo = threading.Event()
+    fine = threading.Event()
+
+    def work(report, cancel_event):
+        report("Generazione", 1, 10)
+        report("Generazione", 5, 10)
+        passo.set()
+        fine.wait(5)
+        return "ok"
+
+    task = BackgroundTask(widget, work, **registro.callbacks())
+    task.start()
+    passo.wait(5)
+    widget.tick()
+    assert registro.eventi == [("progress", ("Generazione", 5, 10))]
+    assert task.running
+    fine.set()
+    task._thread.join(timeout=5)
+    widget.tick()
+    assert registro.eventi[-1] == ("done", "ok")
+    assert not widget.pendenti
+
+
+def test_errore():
+    def work(report, cancel_event):
+        raise ValueError("dati mancanti")
+
+    task, eventi = esegui(work)
+    assert len(eventi) == 1
+    tipo, errore = eventi[0]
+    assert tipo == "error" and isinstance(errore, ValueError)
+
+
+def test_annullamento_vince_sul_risultato():
+    annullato = threading.Event()
+
+    def work(report, cancel_event):
+        annullato.wait(5)
+        # The work noticed the cancel but still returned something
+        return "parziale" if cancel_event.is_set() else "completo"
+
+    widget = Widget()
+    registro = Registro()
+    task = BackgroundTask(widget, work, **registro.callbacks())
+    task.start()
+    task.cancel()
+    annullato.set()
+    task._thread.join(timeout=5)
+    while widget.pendenti:
+        widget.tick()
+    assert registro.eventi == [("cancelled", None)]
+
+
+def test_annullamento_dopo_un_errore():
+    def work(report, cancel_event):
+        cancel_event.wait(5)
+        raise RuntimeError("interrotto")
+
+    widget = Widget()
+    registro = Registro()
+    task = BackgroundTask(widget, work, **registro.callbacks())
+    task.start()
+    task.cancel()
+    task._thread.join(timeout=5)
+    widget.tick()
+    assert registro.eventi == [("cancelled", None)]
+
+
+class Orologio:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_publish_solo_l_ultimo_e_limitato(monkeypatch):
+    orologio = Orologio()
+    monkeypatch.setattr(background_task.time, "monotonic", orologio)
+    widget = Widget()
+    parziali = []
+    seconda = threading.Event()
+    fine = threading.Event()
+    pubblicati = threading.Semaphore(0)
+
+    def work(report, cancel_event):
+        for payload in ("primo", "secondo"):
+            task.publish(payload)
+        pubblicati.release()
+        seconda.wait(5)
+        task.publish("terzo")
+        pubblicati.release()
+        fine.wait(5)
+
+    task = BackgroundTask(widget, work, on_partial=parziali.append)
+    task.start()
+    pubblicati.acquire(timeout=5)
+    widget.tick()
+    # Only the latest payload of the tick
+    assert parziali == ["secondo"]
+
+    seconda.set()
+    pubblicati.acquire(timeout=5)
+    orologio.t += 0.1
+    widget.tick()
+    # Too soon: kept for a later poll
+    assert parziali == ["secondo"]
+    orologio.t += BackgroundTask.PARTIAL_INTERVAL
+    fine.set()
+    task._thread.join(timeout=5)
+    widget.tick()
+    # The outcome arrived in this poll: the pending partial is dropped
+    assert parziali == ["secondo"]
+    assert not task.running
+
+
+def test_publish_ritardato_consegnato_al_poll_successivo(monkeypatch):
+    orologio = Orologio()
+    monkeypatch.setattr(background_task.time, "monotonic", orologio)
+    widget = Widget()
+    parziali = []
+    passo = threading.Semaphore(0)
+    avanti = threading.Semaphore(0)
+
+    def work(report, cancel_event):
+        for payload in ("a", "b"):
+            task.publish(payload)
+            passo.release()
+            avanti.acquire(timeout=5)
+
+    task = BackgroundTask(widget, work, on_partial=parziali.append)
+    task.start()
+    passo.acquire(timeout=5)
+    widget.tick()
+    avanti.release()
+    passo.acquire(timeout=5)
+    orologio.t += 0.1
+    widget.tick()
+    orologio.t += BackgroundTask.PARTIAL_INTERVAL
+    # Nothing new on the queue: the held payload is delivered once its interval has passed
+    widget.tick()
+    assert parziali == ["a", "b"]
+    avanti.release()
+    task._thread.join(timeout=5)
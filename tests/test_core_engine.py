@@ -0,0 +1,128 @@
+import contextlib
+import io
+
+import pytest
+
+import core_engine
+from core_engine import (REGOLE_STRUTTURA, _firma_piano_modello, _incrocio, _materializza, _modelli_strategie,
+                         _modelli_validi, _violazioni_modello, esegui_generazione)
+
+FOGLIA_B = (('B',), False, None, None)
+FOGLIA_G = (('G',), False, None, None)
+FOGLIA_R = (('R',), False, None, None)
+NATURA = ((), True, None, None)
+
+
+@pytest.mark.parametrize("num_iv", range(1, 7))
+@pytest.mark.parametrize("con_natura", [False, True])
+def test_strategie_rispettano_le_regole(num_iv, con_natura):
+    ruoli = tuple(core_engine.CANONICAL_IV_ROLES[:num_iv])
+    for modello in _modelli_strategie(ruoli, con_natura):
+        assert _violazioni_modello(modello) == ()
+
+
+def test_figlio_con_iv_non_ereditate():
+    # BG bred from B and R: G comes from nowhere and R is lost
+    assert 'ruoli_iv' in _violazioni_modello((('B', 'G'), False, FOGLIA_B, FOGLIA_R))
+
+
+def test_genitore_con_due_caratteristiche_in_meno():
+    # BGR bred from BG and a 1IV R: R adds two characteristics at once
+    bg = _incrocio(FOGLIA_B, FOGLIA_G)
+    violazioni = _violazioni_modello((('B', 'G', 'R'), False, bg, FOGLIA_R))
+    assert 'grado' in violazioni
+
+
+def test_natura_dallo_slot_maschile():
+    vb = _incrocio(NATURA, FOGLIA_B)
+    assert _violazioni_modello(vb) == ()
+    assert _violazioni_modello((('B',), True, FOGLIA_B, NATURA)) == ('linea_femminile',)
+    assert 'linea_femminile' in _violazioni_modello((('B', 'G'), True, _incrocio(FOGLIA_B, FOGLIA_G), vb))
+
+
+def test_natura_da_entrambi_i_genitori():
+    vb, vg = _incrocio(NATURA, FOGLIA_B), _incrocio(NATURA, FOGLIA_G)
+    assert 'natura' in _violazioni_modello((('B', 'G'), True, vb, vg))
+
+
+def test_profondita_diversa_dal_numero_di_iv():
+    # BG bred from two 2IV Pokemon: one generation too many
+    bg, gb = _incrocio(FOGLIA_B, FOGLIA_G), _incrocio(FOGLIA_G, FOGLIA_B)
+    violazioni = _violazioni_modello((('B', 'G'), False, bg, gb))
+    assert 'profondita' in violazioni
+    assert 'grado' in violazioni
+
+
+def test_genitore_mancante_e_foglia_non_acquistabile():
+    assert _violazioni_modello((('B',), True, None, None)) == ('foglia',)
+    assert _violazioni_modello((('B',), False, FOGLIA_B, None))[0] == 'genitori'
+
+
+def test_modello_malformato_scartato(monkeypatch, capsys):
+    malformato = (('B', 'G', 'R'), False, _incrocio(FOGLIA_B, FOGLIA_G), FOGLIA_R)
+    validi = _modelli_strategie(('B', 'G', 'R'), False)
+    assert _modelli_validi(validi + [malformato]) == validi
+    assert "Scartate 1 strutture non valide" in capsys.readouterr().out
+
+    monkeypatch.setattr(core_engine, "_modelli_strategie", lambda ruoli, con_natura: [malformato])
+    assert esegui_generazione(["PS", "Attacco", "Difesa"], None) == []
+
+
+# One template breaking each rule of REGOLE_STRUTTURA
+MODELLI_ROTTI = {
+    'ruoli_iv': (('B', 'G'), False, FOGLIA_B, FOGLIA_R),
+    'grado': (('B', 'G', 'R'), False, _incrocio(FOGLIA_B, FOGLIA_G), FOGLIA_R),
+    'natura': (('B', 'G'), True, _incrocio(NATURA, FOGLIA_B), _incrocio(NATURA, FOGLIA_G)),
+    'linea_femminile': (('B',), True, FOGLIA_B, NATURA),
+    'genitori': (('B', 'G'), False, FOGLIA_B, None),
+    'profondita': (('B', 'G'), False, _incrocio(FOGLIA_B, FOGLIA_G), _incrocio(FOGLIA_G, FOGLIA_B)),
+    'foglia': (('B', 'G'), False, None, None),
+}
+
+
+def test_un_modello_rotto_per_regola():
+    assert set(MODELLI_ROTTI) == set(REGOLE_STRUTTURA)
+
+
+@pytest.mark.parametrize("regola", sorted(MODELLI_ROTTI))
+def test_violazione_riportata(regola, capsys):
+    rotto = MODELLI_ROTTI[regola]
+    assert _violazioni_modello(rotto).count(regola) == 1
+    validi = _modelli_strategie(('B', 'G', 'R'), False)
+    assert _modelli_validi(validi + [rotto, rotto]) == validi
+    out = capsys.readouterr().out
+    assert f"Scartate 2 strutture non valide su {len(validi) + 2}" in out
+    assert f"{REGOLE_STRUTTURA[regola]}: 2" in out
+
+
+def test_piani_equivalenti_scartati(capsys):
+    ivs = ["PS", "Attacco", "Difesa"]
+    piani = esegui_generazione(ivs, None)
+    firme = {_firma_piano_modello(p.struttura[0], p.legenda_ruoli, p.struttura[1], {}) for p in piani}
+    assert len(firme) == len(piani)
+    # 3 strategies x 2 orientations x 6 permutations, the same trees of real Pokemon merged
+    assert len(piani) == 18
+    assert "(18 piani equivalenti scartati)" in capsys.readouterr().out
+
+
+def test_firma_ordinata():
+    modello = _modelli_strategie(("B", "G", "R"), False)[0]
+    legenda = {"B": "PS", "G": "Attacco", "R": "Difesa"}
+    # The mirror keeps its own signature: the mother line is another Pokemon
+    assert _firma_piano_modello(modello, legenda, False, {}) != _firma_piano_modello(modello, legenda, True, {})
+    # Relabelling the roles does not change the tree of real Pokemon
+    ruoli = ("R", "G", "B")
+    rinominato = _modelli_strategie(ruoli, False)[0]
+    legenda_rinominata = {"R": "PS", "G": "Attacco", "B": "Difesa"}
+    assert _firma_piano_modello(rinominato, legenda_rinominata, False, {}) == _firma_piano_modello(modello, legenda, False, {})
+
+
+def test_budget_conta_i_piani_distinti(capsys):
+    ivs = ["PS", "Attacco", "Difesa", "Velocità", "Attacco Speciale"]
+    tutti = esegui_generazione(ivs, None)
+    assert len(tutti) == 2400
+    piani = esegui_generazione(ivs, None, max_piani=1000)
+    assert 0 < len(piani) <= 1000
+    # The strategies are cut only when their distinct plans exceed the budget
+    assert esegui_generazione(ivs, None, max_piani=2400) == tutti
+    assert "ne vengono usate" in capsys.readouterr().out
@@ -0,0 +1,81 @@
+import contextlib
+import io
+import threading
+
+import pytest
+
+from core_engine import esegui_generazione
+from dp_engine import INFINITO, SubsetBreedingDP, genera_piani_ottimi
+from plan_evaluator import costa_piani, valuta_piani
+
+CASI = [
+    ("Bulbasaur", ["PS", "Attacco"], None),
+    ("Bulbasaur", ["PS", "Attacco", "Velocità"], "Adamant"),
+    ("Charizard", ["PS", "Attacco", "Velocità", "Difesa"], "Jolly"),
+    ("Beldum", ["PS", "Attacco", "Velocità"], None),
+    ("Beldum", ["PS", "Attacco", "Velocità", "Difesa"], "Jolly"),
+]
+
+
+def costi(piani, specie, natura, pm, pokemon_data, gender_data):
+    with contextlib.redirect_stdout(io.StringIO()):
+        valutati = valuta_piani(piani, [], specie, pokemon_data, gender_data)
+        return [p.costo_totale for p in costa_piani(valutati, [], pm, specie, pokemon_data, natura, gender_data)]
+
+
+def test_costo_specie_senza_sesso(pokemon_data, gender_data, listino):
+    # Costing a genderless species used to raise UnboundLocalError
+    pm = listino("Beldum")
+    with contextlib.redirect_stdout(io.StringIO()):
+        piani = esegui_generazione(["PS", "Attacco", "Difesa"], "Adamant")
+    assert all(0 < c < INFINITO for c in costi(piani, "Beldum", "Adamant", pm, pokemon_data, gender_data))
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("specie,ivs,natura", CASI)
+def test_dp_ottimo_e_coerente_col_costo_dei_piani(specie, ivs, natura, seed, pokemon_data, gender_data, listino):
+    pm = listino(specie, seed)
+    dp = SubsetBreedingDP(ivs, natura, [], pm, specie, pokemon_data, gender_data)
+    piano = dp.piano_ottimo()
+    assert piano is not None
+    costo_dp = dp.costo(((1 << len(ivs)) - 1, bool(natura), True, 'F'))
+
+    # The rebuilt tree costs what the DP says, and no generated plan is cheaper
+    assert costi([piano], specie, natura, pm, pokemon_data, gender_data) == [costo_dp]
+    with contextlib.redirect_stdout(io.StringIO()):
+        generati = esegui_generazione(ivs, natura)
+    assert costo_dp <= min(costi(generati, specie, natura, pm, pokemon_data, gender_data))
+
+
+def test_piani_ottimi_senza_posseduti(pokemon_data, gender_data, listino):
+    pm = listino("Bulbasaur")
+    piani = genera_piani_ottimi(["PS", "Attacco", "Difesa"], None, [], pm, "Bulbasaur", pokemon_data, gender_data, id_iniziale=50)
+    assert [p.id_piano for p in piani] == [50]
+
+
+def test_troppe_iv():
+    with pytest.raises(ValueError):
+        SubsetBreedingDP(["PS"] * 7, None, [], None, "Ditto", {}, {})
+
+
+def test_ricerca_annullata(pokemon_data, gender_data, listino):
+    pm = listino("Bulbasaur")
+    annulla = threading.Event()
+    annulla.set()
+    dp = SubsetBreedingDP(["PS", "Attacco", "Difesa"], None, [], pm, "Bulbasaur", pokemon_data, gender_data, cancel_event=annulla)
+    assert dp.piano_ottimo() is None
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert genera_piani_ottimi(["PS", "Attacco", "Difesa"], None, [], pm, "Bulbasaur", pokemon_data, gender_data,
+                                   cancel_event=annulla) == []
+
+    # Cancelled while the search is running: it stops at the next state
+    dp = SubsetBreedingDP(["PS", "Attacco", "Difesa"], None, [], pm, "Bulbasaur", pokemon_data, gender_data,
+                          cancel_event=threading.Event())
+    costo_foglia = dp._costo_foglia
+
+    def annulla_dopo_una_foglia(*args):
+        dp.cancel_event.set()
+        return costo_foglia(*args)
+
+    dp._costo_foglia = annulla_dopo_una_foglia
+    assert dp.piano_ottimo() is None
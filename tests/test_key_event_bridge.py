@@ -0,0 +1,142 @@
+import tkinter as tk
+
+import key_event_bridge
+from key_event_bridge import KeyEventBridge
+
+
+class Orologio:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+class Widget:
+    """Stands in for the Tk widget: after() callbacks run only when tick() is called."""
+    def __init__(self, distrutto=False):
+        self.pendenti = {}
+        self.prossimo = 0
+        self.distrutto = distrutto
+
+    def after(self, ms, callback):
+        self.prossimo += 1
+        self.pendenti[self.prossimo] = callback
+        return self.prossimo
+
+    def after_cancel(self, after_id):
+        if self.distrutto:
+            raise tk.TclError("application has been destroyed")
+        self.pendenti.pop(after_id, None)
+
+    def tick(self):
+        pendenti, self.pendenti = self.pendenti, {}
+        for callback in pendenti.values():
+            callback()
+
+
+def ponte(monkeypatch, **kwargs):
+    orologio = Orologio()
+    monkeypatch.setattr(key_event_bridge.time, "monotonic", orologio)
+    chiamate = []
+    widget = Widget()
+    handlers = {k: (lambda k=k: chiamate.append(k)) for k in ("enter", "esc", "f1")}
+    bridge = KeyEventBridge(widget, handlers, debounce_seconds=0.25, **kwargs)
+    return bridge, widget, orologio, chiamate
+
+
+def test_tasti_ripetuti_nello_stesso_tick_uniti(monkeypatch):
+    bridge, widget, orologio, chiamate = ponte(monkeypatch)
+    bridge.start()
+    for tasto in ("enter", "esc", "enter", "enter", "f1", "esc"):
+        bridge.post(tasto)
+    widget.tick()
+    # One dispatch per key, in order of first arrival
+    assert chiamate == ["enter", "esc", "f1"]
+
+
+def test_debounce(monkeypatch):
+    bridge, widget, orologio, chiamate = ponte(monkeypatch)
+    bridge.start()
+    bridge.post("enter")
+    widget.tick()
+    # 0.1 s later: dropped, even if it arrives in another tick
+    orologio.t = 0.1
+    bridge.post("enter")
+    bridge.post("esc")
+    widget.tick()
+    # The interval counts from the last dispatched press, not from the dropped one
+    orologio.t = 0.3
+    bridge.post("enter")
+    widget.tick()
+    assert chiamate == ["enter", "esc", "enter"]
+
+
+def test_debounce_sul_momento_della_pressione(monkeypatch):
+    # The press time is taken in post(), so a slow tick does not merge distinct presses
+    bridge, widget, orologio, chiamate = ponte(monkeypatch)
+    bridge.start()
+    bridge.post("enter")
+    orologio.t = 0.3
+    bridge.post("esc")
+    widget.tick()
+    orologio.t = 0.6
+    bridge.post("enter")
+    orologio.t = 2.0
+    widget.tick()
+    assert chiamate == ["enter", "esc", "enter"]
+
+
+def test_stop_scarta_gli_eventi_in_coda(monkeypatch):
+    bridge, widget, orologio, chiamate = ponte(monkeypatch)
+    bridge.start()
+    bridge.post("enter")
+    bridge.stop()
+    assert not widget.pendenti
+    bridge.post("esc")
+    widget.tick()
+    assert chiamate == []
+    assert not bridge.running
+
+
+def test_stop_da_un_handler(monkeypatch):
+    bridge, widget, orologio, chiamate = ponte(monkeypatch)
+    bridge.handlers["esc"] = bridge.stop
+    bridge.start()
+    for tasto in ("enter", "esc", "f1"):
+        bridge.post(tasto)
+    widget.tick()
+    # Nothing after the handler that closed the overlay, and no new tick
+    assert chiamate == ["enter"]
+    assert not widget.pendenti
+
+
+def test_stop_con_widget_distrutto(monkeypatch):
+    bridge, widget, orologio, chiamate = ponte(monkeypatch)
+    bridge.start()
+    widget.distrutto = True
+    bridge.stop()
+    assert not bridge.running
+
+
+def test_errore_di_un_handler_non_ferma_il_ponte(monkeypatch, capsys):
+    bridge, widget, orologio, chiamate = ponte(monkeypatch)
+
+    def rotto():
+        raise RuntimeError("overlay chiuso")
+
+    bridge.handlers["enter"] = rotto
+    bridge.start()
+    bridge.post("enter")
+    bridge.post("esc")
+    widget.tick()
+    assert chiamate == ["esc"]
+    assert "overlay chiuso" in capsys.readouterr().out
+    assert len(widget.pendenti) == 1
+
+
+def test_start_idempotente(monkeypatch):
+    bridge, widget, orologio, chiamate = ponte(monkeypatch)
+    bridge.start()
+    bridge.start()
+    assert len(widget.pendenti) == 1
@@ -0,0 +1,47 @@
+import pytest
+
+# ocr_benchmark reads its screenshots with Pillow
+Image = pytest.importorskip("PIL.Image")
+
+import market_overlay  # noqa: E402
+import ocr_benchmark  # noqa: E402
+from ocr_preprocess import PreprocessConfig  # noqa: E402
+
+
+def test_errori_del_backend_contati(tmp_path, monkeypatch):
+    Image.new("RGB", (60, 20), "white").save(tmp_path / "4999_ps.png")
+
+    def guasto(immagine):
+        raise RuntimeError("tesseract non trovato")
+
+    monkeypatch.setitem(market_overlay.OCR_BACKENDS, "guasto", guasto)
+    campioni = ocr_benchmark.load_dataset([str(tmp_path)])
+    risultato = ocr_benchmark.run_backend("guasto", campioni, ocr_benchmark.build_grabbers(campioni, False),
+                                          2, False, PreprocessConfig(enabled=False))
+    assert risultato["captures"] == 2
+    assert risultato["errors"] == 2
+    assert risultato["unreadable"] == 0
+    assert risultato["error_messages"] == {"RuntimeError: tesseract non trovato": 2}
+
+
+@pytest.mark.parametrize("use_cache,hit,miss", [(False, 0, 6), (True, 3, 3)])
+def test_statistiche_cache_su_tutti_i_campioni(tmp_path, monkeypatch, use_cache, hit, miss):
+    # Three different crops (the cache key hashes the size too), read twice
+    for i, larghezza in enumerate((60, 61, 62)):
+        Image.new("RGB", (larghezza, 20), "white").save(tmp_path / f"{i + 1}999_ps.png")
+    letture = []
+
+    def finto(immagine):
+        letture.append(immagine.size)
+        return "4.999"
+
+    monkeypatch.setitem(market_overlay.OCR_BACKENDS, "finto", finto)
+    campioni = ocr_benchmark.load_dataset([str(tmp_path)])
+    risultato = ocr_benchmark.run_backend("finto", campioni, ocr_benchmark.build_grabbers(campioni, False),
+                                          2, use_cache, PreprocessConfig(enabled=False))
+    cache = risultato["cache"]
+    assert risultato["captures"] == 6
+    # The counters cover every sample of every pass, not only the last one
+    assert (cache["hits"], cache["misses"]) == (hit, miss)
+    assert cache["hits"] + cache["misses"] == risultato["captures"]
+    assert len(letture) == miss
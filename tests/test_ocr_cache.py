@@ -0,0 +1,77 @@
+import json
+import time
+
+import pytest
+
+from ocr_cache import OcrCache
+
+
+def test_salvataggio_e_caricamento(tmp_path):
+    percorso = str(tmp_path / "ocr_cache.json")
+    cache = OcrCache(percorso)
+    cache.put("a", 4999)
+    cache.put("b", 1000)
+    cache.put("c", 750)
+    assert cache.get("a") == 4999  # 'a' becomes the most recently used
+    cache.save()
+
+    ricaricata = OcrCache(percorso, max_entries=2)
+    # The LRU order survives the round trip: 'b' is the oldest and does not fit
+    assert list(ricaricata.entries) == ["c", "a"]
+    assert ricaricata.get("a") == 4999
+    assert ricaricata.get("b") is None
+    assert ricaricata.stats()["hits"] == 1 and ricaricata.stats()["misses"] == 1
+
+
+def test_lru_e_invalidazione(tmp_path):
+    cache = OcrCache(str(tmp_path / "ocr_cache.json"), max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    cache.invalidate("a")
+    cache.invalidate("assente")
+    assert list(cache.entries) == ["c"]
+
+
+def test_voci_scadute(tmp_path):
+    percorso = str(tmp_path / "ocr_cache.json")
+    cache = OcrCache(percorso, max_age=60)
+    cache.put("vecchia", 1)
+    cache.put("nuova", 2)
+    cache.entries["vecchia"] = (1, time.time() - 120)
+    assert cache.get("vecchia") is None
+    cache.entries["vecchia"] = (1, time.time() - 120)
+    cache.save()
+    assert list(OcrCache(percorso, max_age=60).entries) == ["nuova"]
+
+
+@pytest.mark.parametrize("contenuto", [[["a", 5]], {"version": OcrCache.FORMAT_VERSION - 1, "entries": [["a", 5, 0]]}])
+def test_file_di_altra_versione_svuotato(tmp_path, contenuto):
+    percorso = tmp_path / "ocr_cache.json"
+    percorso.write_text(json.dumps(contenuto), encoding="utf-8")
+    cache = OcrCache(str(percorso))
+    assert cache.get("a") is None
+    cache.save()
+    assert json.loads(percorso.read_text(encoding="utf-8")) == {"version": OcrCache.FORMAT_VERSION, "entries": []}
+
+
+def test_chiave_immagine_binarizzata():
+    Image = pytest.importorskip("PIL.Image")
+    scura = Image.new("RGB", (20, 10), (10, 10, 10))
+    rumorosa = Image.new("RGB", (20, 10), (30, 20, 25))
+    chiara = scura.copy()
+    chiara.putpixel((3, 3), (250, 250, 250))
+    assert OcrCache.image_key(scura) == OcrCache.image_key(rumorosa)
+    assert OcrCache.image_key(scura) != OcrCache.image_key(chiara)
+
+
+@pytest.mark.parametrize("testo,plausibile", [
+    ("$4,999\n", True), ("1.000", True), ("750", True), ("$12,500,000", True),
+    ("4,9999", False), ("49,99", False), ("$4,999$", False), ("", False),
+])
+def test_solo_letture_plausibili_in_cache(testo, plausibile):
+    market_overlay = pytest.importorskip("market_overlay")
+    overlay = market_overlay.PriceAcquisitionOverlay.__new__(market_overlay.PriceAcquisitionOverlay)
+    assert overlay._is_plausible(testo) is plausibile
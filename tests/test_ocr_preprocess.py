@@ -0,0 +1,89 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+from PIL import ImageDraw, ImageFilter, ImageOps  # noqa: E402
+
+from ocr_preprocess import PreprocessConfig, _local_mean, preprocess_price_image, text_mask, to_grayscale  # noqa: E402
+
+
+def ritaglio(testo_chiaro=False, sfumatura=0):
+    """
+    A 120x40 price crop like PRICE_REGION: '4.999' drawn with the default font, over a
+    background that gets 'sfumatura' levels lighter from left to right. Returns the
+    RGB image and the mask of the drawn pixels.
+    """
+    testo = Image.new("L", (120, 40), 0)
+    ImageDraw.Draw(testo).text((30, 12), "4.999", fill=255)
+    sfondo = np.linspace(40 if testo_chiaro else 200, (40 if testo_chiaro else 200) + sfumatura, 120)
+    grigio = np.tile(sfondo, (40, 1))
+    disegnato = np.asarray(testo) > 0
+    grigio[disegnato] = 230 if testo_chiaro else 20
+    grigio = np.clip(grigio, 0, 255).astype(np.uint8)
+    return Image.fromarray(np.stack([grigio] * 3, axis=-1)), disegnato
+
+
+def test_scala_di_grigi_come_pil():
+    immagine, _ = ritaglio(sfumatura=40)
+    rumore = np.random.default_rng(0).integers(0, 255, (40, 120, 3), dtype=np.uint8)
+    for pixels in (np.asarray(immagine), rumore):
+        riferimento = np.asarray(Image.fromarray(pixels).convert("L"), dtype=np.float32)
+        # PIL rounds to integers
+        assert np.abs(to_grayscale(pixels) - riferimento).max() <= 1
+
+
+def test_media_locale_come_box_blur_di_pil():
+    grigio = np.random.default_rng(1).integers(0, 255, (40, 120)).astype(np.float32)
+    media = _local_mean(grigio, 15)
+    riferimento = np.asarray(Image.fromarray(grigio.astype(np.uint8)).filter(ImageFilter.BoxBlur(7)), dtype=np.float32)
+    # Away from the border (where the padding may differ) the integral image gives the box mean
+    assert np.abs(media[8:-8, 8:-8] - riferimento[8:-8, 8:-8]).max() <= 1
+
+
+@pytest.mark.parametrize("testo_chiaro", [False, True])
+def test_soglia_adattiva_batte_la_soglia_fissa(testo_chiaro):
+    # Uneven lighting: a background gradient that crosses the fixed threshold of 128
+    immagine, disegnato = ritaglio(testo_chiaro, sfumatura=-120 if not testo_chiaro else 120)
+    config = PreprocessConfig()
+    adattiva = text_mask(to_grayscale(np.asarray(immagine)), config)
+    # The old path: the PIL grayscale with a global threshold
+    grigio_pil = np.asarray(immagine.convert("L"))
+    fissa = grigio_pil > 128 if testo_chiaro else grigio_pil < 128
+
+    errori_adattiva = np.count_nonzero(adattiva != disegnato)
+    errori_fissa = np.count_nonzero(fissa != disegnato)
+    assert errori_adattiva < errori_fissa
+    # Every drawn pixel that stands out from its surroundings is found
+    assert np.count_nonzero(adattiva & disegnato) >= 0.9 * np.count_nonzero(disegnato)
+
+
+def test_senza_soglia_adattiva_uguale_alla_soglia_fissa():
+    immagine, _ = ritaglio()
+    config = PreprocessConfig(adaptive_threshold=False)
+    assert np.array_equal(text_mask(to_grayscale(np.asarray(immagine)), config),
+                          np.asarray(immagine.convert("L")) < 128)
+
+
+def test_ritaglio_ingrandimento_e_cornice_come_pil():
+    immagine, disegnato = ritaglio()
+    config = PreprocessConfig(adaptive_threshold=False, trim_margin=2, upscale=3, pad=8)
+    risultato = preprocess_price_image(immagine, config)
+
+    # The same steps with PIL: crop to the text plus margin, nearest upscale, white frame
+    righe = np.flatnonzero(disegnato.any(axis=1))
+    colonne = np.flatnonzero(disegnato.any(axis=0))
+    scatola = (colonne[0] - 2, righe[0] - 2, colonne[-1] + 3, righe[-1] + 3)
+    maschera = Image.fromarray(np.where(disegnato, 0, 255).astype(np.uint8)).crop(scatola)
+    maschera = maschera.resize((maschera.width * 3, maschera.height * 3), Image.NEAREST)
+    riferimento = np.asarray(ImageOps.expand(maschera, border=8, fill=255))
+
+    assert risultato.dtype == np.uint8
+    assert np.array_equal(risultato, riferimento)
+
+
+def test_accetta_array_e_ritaglio_vuoto():
+    vuoto = np.full((40, 120, 3), 200, dtype=np.uint8)
+    risultato = preprocess_price_image(vuoto, PreprocessConfig(upscale=1, pad=1))
+    # Nothing to trim around: the crop stays whole and white
+    assert risultato.shape == (42, 122)
+    assert (risultato == 255).all()
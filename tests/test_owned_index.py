@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from owned_index import ANY, STATS, OwnedPokemonIndex, iv_mask
+from structures import PokemonPosseduto
+
+
+def pokemon_casuali(n, seed=0):
+    rnd = random.Random(seed)
+    return [PokemonPosseduto(f"P{i}", rnd.sample(STATS, rnd.randint(0, 4)), rnd.choice([None, "Adamant", "Jolly"]),
+                             rnd.choice(["Gengar", "Bulbasaur", "Ditto", "Charizard"]),
+                             rnd.choice(["Maschio", "Femmina", "Genderless"]))
+            for i in range(n)]
+
+
+def filtra(pokemon, species="", ivs=(), nature=ANY, gender=ANY):
+    """The same filter as a linear scan."""
+    return [p for p in pokemon
+            if species.lower() in p.specie.lower()
+            and set(ivs) <= set(p.ivs)
+            and (nature is ANY or p.natura == nature)
+            and (gender is ANY or p.sesso == gender)]
+
+
+def test_iv_mask():
+    assert iv_mask([]) == 0
+    assert iv_mask(["PS", "Velocità"]) == 0b100001
+    assert iv_mask(["Sconosciuta"]) == 0
+
+
+@pytest.mark.parametrize("filtri", [
+    {},
+    {"species": "GAR"},
+    {"ivs": ["PS", "Attacco"]},
+    {"nature": None},
+    {"nature": "Jolly", "gender": "Femmina"},
+    {"species": "a", "ivs": ["Difesa"], "nature": "Adamant", "gender": "Maschio"},
+    {"species": "Mewtwo"},
+])
+def test_query_uguale_alla_scansione(filtri):
+    pokemon = pokemon_casuali(200)
+    indice = OwnedPokemonIndex(pokemon)
+    assert indice.query(**filtri) == filtra(pokemon, **filtri)
+
+
+def test_aggiunta_sostituzione_e_rimozione():
+    pokemon = pokemon_casuali(50, seed=1)
+    indice = OwnedPokemonIndex(pokemon)
+    assert len(indice) == 50
+
+    sostituto = PokemonPosseduto("P3", ["PS"], "Jolly", "Beldum", "Genderless")
+    indice.add(sostituto)
+    assert len(indice) == 50
+    assert indice.query(species="beldum") == [sostituto]
+
+    indice.remove_many(["P3", "P4", "assente"])
+    assert len(indice) == 48
+    assert indice.query(species="beldum") == []
+    rimasti = [p for p in pokemon if p.id_utente not in ("P3", "P4")]
+    assert indice.query(nature="Jolly") == filtra(rimasti, nature="Jolly")
+
+    indice.clear()
+    assert len(indice) == 0 and indice.query() == []
@@ -0,0 +1,191 @@
+import contextlib
+import io
+import itertools
+import random
+from collections import Counter
+
+import pytest
+
+import plan_evaluator
+from conftest import STATISTICHE
+from core_engine import (CANONICAL_IV_ROLES, NATURA_ROLE, _materializza, _modelli_strategie, _modelli_validi,
+                         esegui_generazione)
+from plan_evaluator import PlanEvaluator, _opzioni_genitori, conta_acquisti, costa_piani, valuta_piani
+from structures import PianoCompleto, PokemonPosseduto
+
+
+def posseduti(seed, n, specie, ivs, natura):
+    rnd = random.Random(seed)
+    pokemon = []
+    for i in range(n):
+        sp = rnd.choice([specie, specie, "Ditto", "Charizard"])
+        stats = rnd.sample(STATISTICHE if rnd.random() < .3 else ivs, rnd.randint(1, min(3, len(ivs))))
+        pokemon.append(PokemonPosseduto(f"U{i}", stats, natura if rnd.random() < .2 else None, sp,
+                                        "Genderless" if sp == "Ditto" else rnd.choice(["Maschio", "Femmina"])))
+    return pokemon
+
+
+def valutati(ivs, natura, owned, specie, pokemon_data, gender_data):
+    """Fresh evaluated plans: costing and evaluation modify them in place."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        piani = esegui_generazione(ivs, natura)
+        return valuta_piani(piani, owned, specie, pokemon_data, gender_data)
+
+
+SCENARI = [
+    ("Bulbasaur", ["PS", "Attacco", "Velocità"], "Adamant", 4),
+    ("Charizard", ["PS", "Attacco", "Velocità", "Difesa"], "Jolly", 8),
+    ("Charizard", ["PS", "Attacco", "Velocità", "Difesa"], None, 0),
+    ("Beldum", ["PS", "Attacco", "Velocità", "Difesa"], "Jolly", 6),
+]
+
+
+def vettori_domanda(modello, mandatory, gender, genderless):
+    """Demand vectors of every way to buy a template, one per orientation and option of each coupling."""
+    ruoli, con_natura, genitore1, genitore2 = modello
+    if genitore1 is None:
+        return {((("foglia", ruoli[0] if ruoli else "", con_natura, mandatory, gender), 1),)}
+    vettori = set()
+    for madre, padre in ((genitore1, genitore2), (genitore2, genitore1)):
+        for (mandatory_madre, gender_madre), (mandatory_padre, gender_padre) in _opzioni_genitori(mandatory, genderless):
+            for vettore_madre in vettori_domanda(madre, mandatory_madre, gender_madre, genderless):
+                for vettore_padre in vettori_domanda(padre, mandatory_padre, gender_padre, genderless):
+                    totale = Counter(dict(vettore_madre)) + Counter(dict(vettore_padre))
+                    totale[("passo", con_natura, gender)] += 1
+                    vettori.add(tuple(sorted(totale.items())))
+    return vettori
+
+
+@pytest.mark.parametrize("specie,ivs,natura", [("Bulbasaur", ["PS", "Attacco", "Velocità"], "Adamant"),
+                                               ("Charizard", ["PS", "Attacco", "Velocità", "Difesa"], None),
+                                               ("Beldum", ["PS", "Attacco", "Velocità"], "Jolly")])
+def test_programma_domanda_uguale_ai_vettori(specie, ivs, natura, pokemon_data, gender_data, listino):
+    pm = listino(specie)
+    leaf_prices = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        piani = esegui_generazione(ivs, natura)
+    for piano in piani[::7]:
+        ev = PlanEvaluator(piano, [], pm, specie, pokemon_data, natura, gender_data)
+        vettori = vettori_domanda(piano.struttura[0], True, "F", ev._is_genderless_species())
+        prezzo_minimo = min(sum(n * ev._demand_price(voce, leaf_prices) for voce, n in vettore) for vettore in vettori)
+        assert ev.purchase_only_cost(leaf_prices) == prezzo_minimo
+
+
+@pytest.mark.parametrize("seed", range(2))
+@pytest.mark.parametrize("specie,ivs,natura,n", SCENARI)
+def test_top_k_uguale_al_costo_esaustivo(specie, ivs, natura, n, seed, pokemon_data, gender_data, listino):
+    owned = posseduti(seed, n, specie, ivs, natura)
+    pm = listino(specie, seed)
+    k = 7
+
+    tutti = costa_piani(valutati(ivs, natura, owned, specie, pokemon_data, gender_data),
+                        owned, pm, specie, pokemon_data, natura, gender_data)
+    with contextlib.redirect_stdout(io.StringIO()):
+        migliori = costa_piani(valutati(ivs, natura, owned, specie, pokemon_data, gender_data),
+                               owned, pm, specie, pokemon_data, natura, gender_data, top_k=k)
+
+    assert len(migliori) == k
+    assert [(p.costo_totale, p.punteggio) for p in migliori] == [(p.costo_totale, p.punteggio) for p in tutti[:k]]
+    # Every plan returned is costed exactly as in the exhaustive run
+    costi = {p.piano_originale.id_piano: p.costo_totale for p in tutti}
+    assert all(costi[p.piano_originale.id_piano] == p.costo_totale for p in migliori)
+
+
+@pytest.mark.parametrize("specie,ivs,natura,n", SCENARI)
+def test_costo_solo_acquisti_uguale_a_update_cost(specie, ivs, natura, n, pokemon_data, gender_data, listino):
+    pm = listino(specie)
+    leaf_prices = {}
+    for p_val in valutati(ivs, natura, [], specie, pokemon_data, gender_data):
+        ev = PlanEvaluator(p_val.piano_originale, [], pm, specie, pokemon_data, natura, gender_data)
+        stimato = ev.purchase_only_cost(leaf_prices)
+        ev._build_tree_maps()
+        ev._identify_mandatory_nodes()
+        ev.update_cost(p_val)
+        assert stimato == p_val.costo_totale
+
+
+def tutti_i_piani(ivs, natura):
+    """Every template, as it is and mirrored, with every permutation: the plans before deduplication."""
+    ruoli = tuple(CANONICAL_IV_ROLES[:len(ivs)])
+    piani = []
+    for modello in _modelli_validi(_modelli_strategie(ruoli, bool(natura))):
+        for specchio in (False, True):
+            for perm in itertools.permutations(ivs):
+                legenda = dict(zip(ruoli, perm))
+                if natura:
+                    legenda[NATURA_ROLE] = natura
+                piani.append(PianoCompleto(len(piani) + 1, list(ivs), natura, legenda, _materializza(modello, specchio),
+                                           struttura=(modello, specchio)))
+    return piani
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("specie,ivs,natura,n", SCENARI + [("Eevee", ["PS", "Attacco", "Velocità"], None, 3)])
+def test_deduplicazione_non_cambia_il_migliore(specie, ivs, natura, n, seed, pokemon_data, gender_data, listino):
+    owned = posseduti(seed, n, specie, ivs, natura)
+    pm = listino(specie, seed)
+    migliori = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        piani = esegui_generazione(ivs, natura)
+        tutti = tutti_i_piani(ivs, natura)
+        assert len(piani) <= len(tutti)
+        for lista in (piani, tutti):
+            valutati_ = valuta_piani(lista, owned, specie, pokemon_data, gender_data)
+            costati = costa_piani(valutati_, owned, pm, specie, pokemon_data, natura, gender_data)
+            migliori.append((max(p.punteggio for p in costati), min(p.costo_totale for p in costati)))
+    assert migliori[0] == migliori[1]
+
+
+@pytest.mark.parametrize("specie,ivs,natura,n,seed", [scenario + (seed,) for scenario in SCENARI for seed in range(3)]
+                         + [("Charmander", ["PS", "Attacco", "Velocità", "Difesa", "Attacco Speciale"], None, 4, 0)])
+def test_piani_equivalenti_costano_come_valutati_uno_a_uno(specie, ivs, natura, n, seed, pokemon_data, gender_data, listino, monkeypatch):
+    # valuta_piani copies one evaluation to each group of equivalent plans (replicate)
+    owned = posseduti(seed, n, specie, ivs, natura)
+    pm = listino(specie, seed)
+    costi = []
+    for raggruppa in (True, False):
+        if not raggruppa:
+            monkeypatch.setattr(plan_evaluator, "_equivalence_key", lambda piano, maschere: id(piano))
+        costati = costa_piani(valutati(ivs, natura, owned, specie, pokemon_data, gender_data),
+                              owned, pm, specie, pokemon_data, natura, gender_data)
+        costi.append({p.piano_originale.id_piano: (p.punteggio, p.costo_totale) for p in costati})
+    assert costi[0] == costi[1]
+
+
+def test_conta_acquisti_solo_foglie(pokemon_data, gender_data, listino):
+    ivs = ["PS", "Attacco", "Velocità"]
+    p_val = costa_piani(valutati(ivs, "Adamant", [], "Bulbasaur", pokemon_data, gender_data),
+                        [], listino("Bulbasaur"), "Bulbasaur", pokemon_data, "Adamant", gender_data)[0]
+    foglie = [nodo for livello in p_val.piano_originale.livelli for acc in livello.accoppiamenti
+              for nodo in (acc.genitore1, acc.genitore2) if len(nodo.ruoli_iv) + bool(nodo.ruolo_natura) == 1]
+    # Every leaf is bought, the breeding steps are not purchases
+    assert conta_acquisti(p_val) == len(foglie) < len(p_val.mappa_acquisti)
+
+
+@pytest.mark.parametrize("specie,ivs,natura,n", SCENARI)
+def test_valuta_piani_ordina_solo_i_migliori(specie, ivs, natura, n, pokemon_data, gender_data):
+    owned = posseduti(2, n, specie, ivs, natura)
+    with contextlib.redirect_stdout(io.StringIO()):
+        piani = esegui_generazione(ivs, natura)
+        valutati_ = valuta_piani(piani, owned, specie, pokemon_data, gender_data, top_k=7)
+    assert sorted(p.piano_originale.id_piano for p in valutati_) == [p.id_piano for p in piani]
+    # The best 7 first, as a full stable sort would rank them; the others in generation order
+    ordinati = sorted(valutati_, key=lambda p: (-p.punteggio, p.piano_originale.id_piano))
+    assert valutati_[:7] == ordinati[:7]
+    resto = [p.piano_originale.id_piano for p in valutati_[7:]]
+    assert resto == sorted(resto)
+
+
+@pytest.mark.parametrize("specie,ivs,natura,n", SCENARI)
+def test_top_k_callback_pubblica_i_migliori(specie, ivs, natura, n, pokemon_data, gender_data):
+    owned = posseduti(3, n, specie, ivs, natura)
+    tutti = valutati(ivs, natura, owned, specie, pokemon_data, gender_data)
+    pubblicati = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        valuta_piani(esegui_generazione(ivs, natura), owned, specie, pokemon_data, gender_data,
+                     top_k_callback=pubblicati.append, top_k=7)
+    # The last list is published when the final leader is found: it leads with the best plan
+    ultimi = pubblicati[-1]
+    assert len(ultimi) <= 7
+    assert (ultimi[0].piano_originale.id_piano, ultimi[0].punteggio) == (tutti[0].piano_originale.id_piano, tutti[0].punteggio)
+    assert [p.punteggio for p in ultimi] == sorted((p.punteggio for p in ultimi), reverse=True)
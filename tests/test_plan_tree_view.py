@@ -0,0 +1,192 @@
+from core_engine import CANONICAL_IV_ROLES, NATURA_ROLE, _materializza, _modelli_strategie
+from plan_tree_view import (MARGIN_X, NODE_WIDTH, ROOT_Y, H_SPACING, V_SPACING, PlanTreeView, compute_tree_layout,
+                            visible_nodes)
+from structures import PianoCompleto, PianoValutato
+
+IVS = ["PS", "Attacco", "Difesa", "Velocità", "Attacco Speciale"]
+
+
+def piano(indice=0, specchio=False, ivs=IVS):
+    ruoli = tuple(CANONICAL_IV_ROLES[:len(ivs)])
+    modello = _modelli_strategie(ruoli, True)[indice]
+    legenda = dict(zip(ruoli, ivs))
+    legenda[NATURA_ROLE] = "Natura"
+    return PianoCompleto(1, list(ivs), "Adamant", legenda, _materializza(modello, specchio))
+
+
+def nodi_interni(p):
+    return [acc.figlio for livello in p.livelli for acc in livello.accoppiamenti]
+
+
+def layout_ricorsivo(p, pruned):
+    """The recursive drawing the view replaced: node centers in drawing order."""
+    genitori = {id(acc.figlio): (acc.genitore1, acc.genitore2) for livello in p.livelli for acc in livello.accoppiamenti}
+
+    def larghezza(nodo):
+        if id(nodo) in pruned or id(nodo) not in genitori:
+            return NODE_WIDTH
+        g1, g2 = genitori[id(nodo)]
+        return larghezza(g1) + larghezza(g2) + H_SPACING
+
+    centri = []
+
+    def disegna(nodo, x, y):
+        centri.append((x, y))
+        if id(nodo) not in pruned and id(nodo) in genitori:
+            g1, g2 = genitori[id(nodo)]
+            w1, w2 = larghezza(g1), larghezza(g2)
+            inizio = x - (w1 + w2 + H_SPACING) / 2
+            disegna(g1, inizio + w1 / 2, y + V_SPACING)
+            disegna(g2, inizio + w1 + H_SPACING + w2 / 2, y + V_SPACING)
+
+    radice = p.livelli[-1].accoppiamenti[0].figlio
+    disegna(radice, larghezza(radice) / 2 + MARGIN_X, ROOT_Y)
+    return centri
+
+
+def test_layout_uguale_al_disegno_ricorsivo():
+    for specchio in (False, True):
+        p = piano(specchio=specchio)
+        # Unpruned, then with an owned node in the middle of the tree
+        for pruned in (frozenset(), frozenset({id(nodi_interni(p)[3])})):
+            layout = compute_tree_layout(p, pruned)
+            assert layout.centers == layout_ricorsivo(p, pruned)
+            shape, nodi = visible_nodes(p, pruned)
+            assert len(nodi) == len(layout.centers)
+
+
+def test_genitori_e_aree():
+    p = piano()
+    layout = compute_tree_layout(p, frozenset())
+    for indice, genitori in enumerate(layout.parents):
+        if genitori is None:
+            continue
+        x, y = layout.centers[indice]
+        x0, y0, x1, y1 = layout.bounds[indice]
+        for g in genitori:
+            gx, gy = layout.centers[g]
+            assert gy == y + V_SPACING
+            # The lines towards the parents lie inside the area of the child
+            assert x0 <= gx <= x1 and y1 == gy - 25
+    assert layout.height == max(b[3] for b in layout.bounds)
+
+
+def test_nodo_posseduto_e_una_foglia():
+    p = piano()
+    radice = nodi_interni(p)[-1]
+    genitore = p.livelli[-1].accoppiamenti[0].genitore1
+    shape, nodi = visible_nodes(p, frozenset({id(genitore)}))
+    assert nodi[0] is radice and nodi[1] is genitore
+    assert shape[0] == ()
+
+
+def test_stessa_forma_stesso_layout():
+    # Same template with other stats (and another target size) in the roles: same shape
+    a = piano()
+    b = piano(ivs=["Velocità", "Difesa", "PS", "Attacco Speciale", "Attacco"])
+    assert visible_nodes(a, frozenset())[0] == visible_nodes(b, frozenset())[0]
+
+
+class Canvas:
+    """Records the items created and configured, with a fixed viewport at the origin."""
+    def __init__(self, larghezza=400, altezza=300):
+        self.larghezza = larghezza
+        self.altezza = altezza
+        self.x = 0
+        self.y = 0
+        self.creati = []
+        self.aggiornati = []
+        self.cancellazioni = 0
+
+    def configure(self, **kwargs):
+        pass
+
+    config = configure
+
+    def delete(self, tag):
+        self.cancellazioni += 1
+        self.creati.clear()
+
+    def winfo_width(self):
+        return self.larghezza
+
+    def winfo_height(self):
+        return self.altezza
+
+    def canvasx(self, x):
+        return self.x + x
+
+    def canvasy(self, y):
+        return self.y + y
+
+    def after_idle(self, callback):
+        self.idle = callback
+        return "idle"
+
+    def _crea(self, tipo, *coordinate, tags=(), **kwargs):
+        self.creati.append((tipo, tags))
+
+    def create_line(self, *args, **kwargs):
+        self._crea("line", *args, **kwargs)
+
+    def create_rectangle(self, *args, **kwargs):
+        self._crea("rectangle", *args, **kwargs)
+
+    def create_text(self, *args, **kwargs):
+        self._crea("text", *args, **kwargs)
+
+    def tag_lower(self, tag):
+        pass
+
+    def itemconfig(self, tag, **kwargs):
+        self.aggiornati.append(tag)
+
+
+def descrivi(nodo, piano_valutato):
+    return ("/".join(nodo.ruoli_iv), "#ADD8E6", "#00008B", False)
+
+
+def test_vista_crea_solo_i_nodi_visibili_e_riusa_gli_elementi():
+    canvas = Canvas()
+    vista = PlanTreeView(canvas, descrivi)
+    pv = PianoValutato(piano())
+    vista.show(pv)
+    totale = len(vista.layout.centers)
+    disegnati = len(vista._drawn)
+    assert 0 < disegnati < totale
+    assert sum(1 for tipo, _ in canvas.creati if tipo == "rectangle") == disegnati
+
+    # Another plan of the same shape: items updated through their tags, nothing deleted
+    cancellazioni = canvas.cancellazioni
+    canvas.aggiornati.clear()
+    vista.show(PianoValutato(piano(ivs=["Velocità", "Difesa", "PS", "Attacco Speciale", "Attacco"])))
+    assert canvas.cancellazioni == cancellazioni
+    assert len(canvas.aggiornati) == 2 * disegnati
+
+    # Scrolling to the bottom right adds the nodes that entered the view
+    canvas.x = vista.layout.width
+    canvas.y = vista.layout.height
+    vista._on_yscroll(0.5, 1.0)
+    canvas.idle()
+    assert len(vista._drawn) > disegnati
+
+
+def posseduto_al_livello(p, livello):
+    """An evaluation of the plan where the user owns the first Pokemon bred at that level."""
+    return PianoValutato(p, mappa_assegnazioni={id(p.livelli[livello].accoppiamenti[0].figlio): "U1"})
+
+
+def test_cache_dei_layout():
+    vista = PlanTreeView(Canvas(), descrivi)
+    vista.CACHE_SIZE = 2
+    # Owning a node at another level gives another shape
+    for livello in range(3):
+        vista.show(posseduto_al_livello(piano(), livello))
+    assert len(vista._layouts) == 2
+    layout = vista.layout
+    altro = piano(indice=1, ivs=["Velocità", "Difesa", "PS", "Attacco Speciale", "Attacco"])
+    vista.show(posseduto_al_livello(altro, 2))
+    assert vista.layout is layout
+    # The oldest shape was evicted and is laid out again
+    vista.show(posseduto_al_livello(piano(), 0))
+    assert vista.layout is not layout and len(vista._layouts) == 2
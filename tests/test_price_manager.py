@@ -0,0 +1,124 @@
+import copy
+import json
+import threading
+import types
+
+import pytest
+
+from gui import GTL_EGG_GROUPS, GTL_STATS, BreedingToolApp
+from price_manager import PriceManager
+
+
+@pytest.fixture
+def listino_vuoto(tmp_path, monkeypatch):
+    monkeypatch.setattr(PriceManager, "FILE_PATH", str(tmp_path / "market_prices.json"))
+    return PriceManager()
+
+
+def test_salvataggi_ravvicinati_in_una_scrittura(listino_vuoto, monkeypatch):
+    scritture = []
+    salva = PriceManager.save_prices
+    fatto = threading.Event()
+
+    def conta(pm):
+        scritture.append(threading.current_thread())
+        salva(pm)
+        fatto.set()
+
+    monkeypatch.setattr(PriceManager, "save_prices", conta)
+    for prezzo in (1000, 2000, 3000):
+        listino_vuoto.set_price("PS", "Mostro", "M", prezzo)
+        listino_vuoto.request_save(0.05)
+    assert fatto.wait(5)
+    listino_vuoto.flush()
+    # One write, off the calling thread, with the last value
+    assert len(scritture) == 1 and scritture[0] is not threading.current_thread()
+    with open(PriceManager.FILE_PATH, encoding="utf-8") as f:
+        assert json.load(f)["PS"]["Monster"]["M"] == 3000
+
+
+def test_flush_scrive_subito(listino_vuoto):
+    listino_vuoto.set_price("Natura", "Ditto", "X", 4500)
+    listino_vuoto.request_save(60)
+    listino_vuoto.flush()
+    assert listino_vuoto._save_timer is None
+    assert PriceManager().get_price("Natura", "Ditto", "X") == 4500
+
+
+def test_copia_senza_salvataggi_in_sospeso(listino_vuoto):
+    listino_vuoto.set_price("PS", "Ditto", "X", 100)
+    listino_vuoto.request_save(60)
+    copia = copy.deepcopy(listino_vuoto)
+    copia.set_price("PS", "Ditto", "X", 200)
+    assert copia._save_timer is None
+    assert listino_vuoto.get_price("PS", "Ditto", "X") == 100
+    listino_vuoto.flush()
+
+
+class Entry:
+    """Stands in for a ttk.Entry, counting the rewrites of the cell."""
+    def __init__(self, testo=""):
+        self.testo = testo
+        self.riscritture = 0
+
+    def get(self):
+        return self.testo
+
+    def delete(self, first, last):
+        self.testo = ""
+        self.riscritture += 1
+
+    def insert(self, index, testo):
+        self.testo = testo
+
+
+def griglia(pm):
+    """The state _setup_gtl_tab builds, on fake entries."""
+    app = types.SimpleNamespace(price_manager=pm, gtl_inputs={}, gtl_cell_values={})
+    for stat in GTL_STATS:
+        app.gtl_inputs[stat] = {}
+        for _, key in GTL_EGG_GROUPS:
+            val = pm.get_price(stat, key, "X" if key == "Ditto" else "M")
+            app.gtl_inputs[stat][key] = Entry("" if val == 999999999 else str(val))
+            app.gtl_cell_values[(stat, key)] = val
+    return app
+
+
+def test_aggiorna_solo_le_celle_cambiate(listino_vuoto):
+    app = griglia(listino_vuoto)
+    listino_vuoto.set_price("Velocità", "Mostro", "M", 4200)
+    listino_vuoto.set_price("Base", "Ditto", "X", 1500)
+    BreedingToolApp._refresh_gtl_view(app)
+    riscritte = {(stat, key) for stat, celle in app.gtl_inputs.items() for key, e in celle.items() if e.riscritture}
+    assert riscritte == {("Velocità", "Mostro"), ("Base", "Ditto")}
+    assert app.gtl_inputs["Velocità"]["Mostro"].testo == "4200"
+    # Nothing changed since: no cell is touched
+    BreedingToolApp._refresh_gtl_view(app)
+    assert sum(e.riscritture for celle in app.gtl_inputs.values() for e in celle.values()) == 2
+
+
+def test_salva_solo_le_celle_modificate(listino_vuoto, monkeypatch):
+    app = griglia(listino_vuoto)
+    richieste = []
+    monkeypatch.setattr(listino_vuoto, "request_save", lambda delay=None: richieste.append(delay))
+    cella = app.gtl_inputs["PS"]["Drago"]
+
+    # Leaving a cell without editing it
+    BreedingToolApp._save_gtl_price(app, "PS", "Drago", "M", cella)
+    assert richieste == []
+
+    cella.testo = " 3500 "
+    BreedingToolApp._save_gtl_price(app, "PS", "Drago", "M", cella)
+    assert listino_vuoto.get_price("PS", "Drago", "M") == 3500
+    assert richieste == [None]
+    BreedingToolApp._save_gtl_price(app, "PS", "Drago", "M", cella)
+    assert richieste == [None]
+
+    # Invalid input is ignored, an emptied cell goes back to the default price
+    cella.testo = "abc"
+    BreedingToolApp._save_gtl_price(app, "PS", "Drago", "M", cella)
+    assert listino_vuoto.get_price("PS", "Drago", "M") == 3500
+    cella.testo = ""
+    BreedingToolApp._save_gtl_price(app, "PS", "Drago", "M", cella)
+    assert listino_vuoto.get_price("PS", "Drago", "M") == PriceManager.DEFAULT_PRICE
+    assert len(richieste) == 2
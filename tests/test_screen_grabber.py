@@ -0,0 +1,77 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from screen_grabber import FileGrabber, ScreenGrabber, create_grabber  # noqa: E402
+
+REGIONE = (10, 20, 40, 35)
+
+
+def salva(tmp_path, nome, pixels):
+    percorso = tmp_path / nome
+    Image.fromarray(pixels).save(percorso)
+    return str(percorso)
+
+
+def schermata(valore, larghezza=64, altezza=48):
+    """A full 'screenshot' whose pixels encode their coordinates (and the frame in 'valore')."""
+    y, x = np.mgrid[0:altezza, 0:larghezza]
+    return np.stack([x, y, np.full_like(x, valore)], axis=-1).astype(np.uint8)
+
+
+def test_file_ritaglia_la_regione(tmp_path):
+    pixels = schermata(7)
+    grabber = create_grabber(REGIONE, "file", files=[salva(tmp_path, "s.png", pixels)])
+    frame = grabber.grab()
+    assert frame.shape == (15, 30, 3)
+    assert np.array_equal(frame, pixels[20:35, 10:40])
+
+
+def test_file_della_misura_della_regione_usato_intero(tmp_path):
+    ritaglio = schermata(3, larghezza=30, altezza=15)
+    grabber = FileGrabber(REGIONE, [salva(tmp_path, "r.png", ritaglio)])
+    assert np.array_equal(grabber.grab(), ritaglio)
+
+
+def test_file_che_non_contiene_la_regione(tmp_path):
+    with pytest.raises(ValueError):
+        FileGrabber(REGIONE, [salva(tmp_path, "piccolo.png", schermata(0, larghezza=20, altezza=20))])
+
+
+def test_senza_frame():
+    with pytest.raises(RuntimeError):
+        FileGrabber(REGIONE).grab()
+
+
+def test_frame_in_ciclo_e_seek(tmp_path):
+    grabber = FileGrabber(REGIONE, [salva(tmp_path, f"{i}.png", schermata(i)) for i in range(3)])
+    assert [int(grabber.grab()[0, 0, 2]) for _ in range(4)] == [0, 1, 2, 0]
+    grabber.seek(5)
+    assert int(grabber.grab()[0, 0, 2]) == 2
+
+
+def test_buffer_riusato(tmp_path):
+    grabber = FileGrabber(REGIONE, [salva(tmp_path, f"{i}.png", schermata(i)) for i in range(2)])
+    buffer = grabber.buffer
+    primo = grabber.grab()
+    secondo = grabber.grab()
+    # Every grab fills the same preallocated array, overwriting the previous frame
+    assert primo is buffer and secondo is buffer
+    assert int(primo[0, 0, 2]) == 1
+    assert grabber.frames == 2
+
+
+def test_context_manager(tmp_path):
+    with FileGrabber(REGIONE, [salva(tmp_path, "s.png", schermata(1))]) as grabber:
+        assert grabber.grab().dtype == np.uint8
+
+
+def test_backend_sconosciuto():
+    with pytest.raises(ValueError):
+        create_grabber(REGIONE, "inesistente")
+
+
+def test_backend_astratto():
+    with pytest.raises(TypeError):
+        ScreenGrabber(REGIONE)
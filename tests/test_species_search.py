@@ -0,0 +1,50 @@
+import pytest
+
+from species_search import SpeciesSearchIndex, edit_distance, normalize
+
+NOMI = ["Bulbasaur", "Ivysaur", "Venusaur", "Charmander", "Charizard", "Gengar",
+        "Nidoran♀", "Nidoran♂", "Mr. Mime", "Flabébé", "Beldum", "Metang"]
+
+
+@pytest.fixture(scope="module")
+def indice():
+    return SpeciesSearchIndex(NOMI, aliases={"Gengar": ["Ectoplasma"]})
+
+
+def test_normalize():
+    assert normalize("Mr. Mime") == "mrmime"
+    assert normalize("Flabébé") == "flabebe"
+
+
+def test_edit_distance_con_limite():
+    assert edit_distance("gengar", "gengra", 2) == 2
+    assert edit_distance("gengar", "bulbasaur", 2) == 3
+
+
+def test_prefisso_prima_di_sottostringa(indice):
+    assert indice.search("char") == ["Charizard", "Charmander"]
+    # Substrings by position of the match
+    assert indice.search("saur") == ["Ivysaur", "Venusaur", "Bulbasaur"]
+
+
+def test_errori_di_battitura(indice):
+    assert indice.search("charizrd")[0] == "Charizard"
+    assert indice.search("gnegar")[0] == "Gengar"
+    # Short queries do not match typos
+    assert indice.search("xy") == []
+
+
+def test_simboli_accenti_e_alias(indice):
+    assert indice.search("nidoran f")[0] == "Nidoran♀"
+    assert indice.search("nidoran maschio") == ["Nidoran♂"]
+    assert indice.search("mr mime") == ["Mr. Mime"]
+    assert indice.search("flabebe") == ["Flabébé"]
+    assert indice.search("ectopla") == ["Gengar"]
+    # Built-in alternate spellings
+    assert indice.search("mister mime") == ["Mr. Mime"]
+
+
+def test_query_vuota_e_limite(indice):
+    assert indice.search("") == sorted(set(NOMI), key=str.lower)
+    assert len(indice.search("", limit=3)) == 3
+    assert len(indice.search("saur", limit=1)) == 1
@@ -0,0 +1,192 @@
+import itertools
+
+import pytest
+
+import virtual_list
+from virtual_list import VirtualTreeview
+
+
+class Treeview:
+    """In-memory ttk.Treeview: the attached items in order, the values of every item."""
+    contatore = itertools.count()
+
+    def __init__(self, parent, **kwargs):
+        self.figli = []
+        self.valori = {}
+        self.selezione = ()
+        self.creati = 0
+
+    def insert(self, parent, index, values=()):
+        item = f"I{next(self.contatore)}"
+        self.valori[item] = values
+        self.figli.append(item)
+        self.creati += 1
+        return item
+
+    def detach(self, item):
+        self.figli.remove(item)
+
+    def move(self, item, parent, index):
+        if item in self.figli:
+            self.figli.remove(item)
+        self.figli.insert(index, item)
+
+    def item(self, item, values):
+        self.valori[item] = values
+
+    def index(self, item):
+        return self.figli.index(item)
+
+    def selection(self):
+        return self.selezione
+
+    def selection_set(self, items):
+        self.selezione = tuple(items)
+
+    def selection_remove(self, items):
+        self.selezione = tuple(i for i in self.selezione if i not in items)
+
+    def mostrate(self):
+        return [self.valori[item] for item in self.figli]
+
+    def heading(self, *args, **kwargs):
+        pass
+
+    column = grid = bind = heading
+
+
+class Scrollbar:
+    def __init__(self, parent, **kwargs):
+        self.posizione = None
+
+    def set(self, first, last):
+        self.posizione = (first, last)
+
+    def grid(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def tabella(monkeypatch):
+    """Builds a VirtualTreeview on the in-memory widgets above, without a display."""
+    monkeypatch.setattr(virtual_list.ttk, "Treeview", Treeview)
+    monkeypatch.setattr(virtual_list.ttk, "Scrollbar", Scrollbar)
+    monkeypatch.setattr(virtual_list.ttk.Frame, "__init__", lambda self, parent: None)
+    for metodo in ("rowconfigure", "columnconfigure"):
+        monkeypatch.setattr(VirtualTreeview, metodo, lambda self, *a, **k: None, raising=False)
+
+    def crea(righe, height=10, **kwargs):
+        vt = VirtualTreeview(None, ("a", "b"), ("A", "B"), (50, 50), height=height, **kwargs)
+        vt.set_rows(righe)
+        return vt
+    return crea
+
+
+def righe(n):
+    return [(i, f"riga {i}") for i in range(n)]
+
+
+class Evento:
+    def __init__(self, height=0, delta=0):
+        self.height = height
+        self.delta = delta
+
+
+def test_solo_le_righe_visibili_sono_elementi(tabella):
+    vt = tabella(righe(5000))
+    assert vt.tree.creati == 10
+    assert vt.tree.mostrate() == righe(10)
+    vt.scroll(2500)
+    assert vt.tree.mostrate() == righe(5000)[2500:2510]
+    assert vt.tree.creati == 10
+    assert vt.scrollbar.posizione == (0.5, 0.502)
+
+
+def test_scorrimento_limitato_ai_bordi(tabella):
+    vt = tabella(righe(25))
+    vt.scroll(100)
+    assert vt.first == 15
+    assert vt.tree.mostrate() == righe(25)[15:]
+    vt.scroll(-100)
+    assert vt.first == 0
+    vt._on_wheel(Evento(delta=-120))
+    assert vt.first == 3
+    vt._on_scrollbar("moveto", "1.0")
+    assert vt.first == 15
+    vt._on_scrollbar("scroll", "-1", "pages")
+    assert vt.first == 5
+
+
+def test_meno_righe_che_spazio(tabella):
+    vt = tabella(righe(25))
+    vt.scroll(15)
+    vt.set_rows(righe(4))
+    # Pool items beyond the data are detached, not deleted
+    assert vt.first == 0
+    assert vt.tree.mostrate() == righe(4)
+    assert len(vt.tree.valori) == 10
+    assert vt.scrollbar.posizione == (0, 1)
+    vt.set_rows(righe(12))
+    assert vt.tree.mostrate() == righe(10)
+    assert vt.tree.creati == 10
+
+
+def test_ridimensionamento(tabella):
+    vt = tabella(righe(100))
+    vt._on_resize(Evento(height=VirtualTreeview.HEADER_HEIGHT + 15 * VirtualTreeview.ROW_HEIGHT))
+    assert vt.visible == 15
+    assert vt.tree.mostrate() == righe(15)
+
+
+def test_selezione_porta_la_riga_in_vista(tabella):
+    scelte = []
+    vt = tabella(righe(100), on_select=scelte.append)
+    vt.select(42)
+    assert scelte == [42]
+    assert vt.first == 33
+    assert vt.tree.valori[vt.tree.selection()[0]] == righe(100)[42]
+    vt._move_selection(1)
+    assert scelte == [42, 43] and vt.first == 34
+    vt._move_selection(-vt.visible)
+    assert scelte[-1] == 33 and vt.first == 33
+
+
+def test_clic_notificato_una_volta(tabella):
+    scelte = []
+    vt = tabella(righe(100), on_select=scelte.append)
+    vt.scroll(20)
+    vt.tree.selection_set([vt.tree.figli[3]])
+    vt._on_tree_select(None)
+    assert scelte == [23]
+    # The selection restored by a refresh comes back as an event: not a new choice
+    vt.scroll(1)
+    vt._on_tree_select(None)
+    assert scelte == [23]
+    assert vt.selected_indices() == [23]
+
+
+def test_selezione_multipla_tra_gli_scorrimenti(tabella):
+    vt = tabella(righe(500), selectmode="extended")
+    vt.tree.selection_set(vt.tree.figli[2:4])
+    vt._on_tree_select(None)
+    vt.scroll(300)
+    # Rows selected on another page stay selected while this page changes
+    vt.tree.selection_set([vt.tree.figli[0]])
+    vt._on_tree_select(None)
+    assert vt.selected_indices() == [2, 3, 300]
+    vt.scroll(-300)
+    assert [vt.tree.valori[i][0] for i in vt.tree.selection()] == [2, 3]
+    # Deselecting on this page keeps the off-screen row
+    vt.tree.selection_set([vt.tree.figli[3]])
+    vt._on_tree_select(None)
+    assert vt.selected_indices() == [3, 300]
+
+
+def test_selezione_multipla_con_nuove_righe(tabella):
+    vt = tabella(righe(500), selectmode="extended")
+    vt.selected_set = {3, 300, 450}
+    # A bulk removal keeps the selected rows that still exist, with one refresh
+    vt.set_rows(righe(400), keep_selection=True)
+    assert vt.selected_indices() == [3, 300]
+    vt.set_rows(righe(400))
+    assert vt.selected_indices() == []
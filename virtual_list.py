@@ -0,0 +1,173 @@
+from tkinter import ttk
+from typing import Callable, List, Optional, Sequence, Set
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    Table (ttk.Treeview with headings) that can show thousands of rows smoothly.
+
+    Only the rows that fit in the widget exist as Treeview items: a fixed pool of
+    items is refilled with the visible slice of 'rows' whenever the view scrolls or
+    is resized. Rows are plain tuples of display values; callbacks receive the
+    index of the row in the current 'rows' list.
+
+    With selectmode="extended" several rows can be selected (also across scrolls):
+    the selection is kept as a set of row indexes, read with selected_indices().
+    """
+    ROW_HEIGHT = 20
+    HEADER_HEIGHT = 25
+
+    def __init__(self, parent, columns: Sequence[str], headings: Sequence[str], widths: Sequence[int],
+                 height: int = 15, on_select: Optional[Callable[[int], None]] = None, selectmode: str = "browse"):
+        super().__init__(parent)
+        self.on_select = on_select
+        self.rows: List[tuple] = []
+        self.first = 0
+        self.visible = height
+        self.selected: Optional[int] = None
+        self.selectmode = selectmode
+        # Selected row indexes in "extended" mode
+        self.selected_set: Set[int] = set()
+        self._items: List[str] = []
+        # The first '_attached' items of the pool are shown, the others are detached
+        self._attached = 0
+
+        self.tree = ttk.Treeview(self, columns=list(columns), show="headings", height=height, selectmode=selectmode)
+        for col, heading, width in zip(columns, headings, widths):
+            self.tree.heading(col, text=heading)
+            self.tree.column(col, width=width, anchor="center")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self.visible))
+
+    def set_rows(self, rows: List[tuple], keep_selection: bool = False):
+        """Replaces the data. The selection is cleared unless keep_selection is True."""
+        self.rows = rows
+        if not keep_selection or (self.selected is not None and self.selected >= len(rows)):
+            self.selected = None
+        if keep_selection:
+            self.selected_set = {i for i in self.selected_set if i < len(rows)}
+        else:
+            self.selected_set = set()
+        self.first = min(self.first, self._max_first())
+        self._refresh()
+
+    def select(self, index: int):
+        """Selects a row, scrolls it into view and notifies on_select."""
+        if not self.rows:
+            return
+        index = max(0, min(index, len(self.rows) - 1))
+        self.selected = index
+        self.selected_set = {index}
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + self.visible:
+            self.first = index - self.visible + 1
+        self._refresh()
+        if self.on_select:
+            self.on_select(index)
+
+    def selected_indices(self) -> List[int]:
+        if self.selectmode == "extended":
+            return sorted(self.selected_set)
+        return [self.selected] if self.selected is not None else []
+
+    def scroll(self, delta: int):
+        self.first = max(0, min(self.first + delta, self._max_first()))
+        self._refresh()
+        return "break"
+
+    def _max_first(self) -> int:
+        return max(len(self.rows) - self.visible, 0)
+
+    def _refresh(self):
+        """Refills the item pool with the visible slice of the rows."""
+        while len(self._items) < self.visible:
+            item = self.tree.insert("", "end", values=())
+            self.tree.detach(item)
+            self._items.append(item)
+
+        window = self.rows[self.first:self.first + self.visible]
+        selected_items = []
+        for slot, values in enumerate(window):
+            item = self._items[slot]
+            self.tree.item(item, values=values)
+            if slot >= self._attached:
+                self.tree.move(item, "", slot)
+            if self._is_selected(self.first + slot):
+                selected_items.append(item)
+        # Pool items beyond the data are hidden, not deleted
+        for slot in range(len(window), self._attached):
+            self.tree.detach(self._items[slot])
+        self._attached = len(window)
+
+        if selected_items:
+            self.tree.selection_set(selected_items)
+        else:
+            self.tree.selection_remove(self.tree.selection())
+
+        total = len(self.rows)
+        if total <= self.visible:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first / total, (self.first + self.visible) / total)
+
+    def _is_selected(self, index: int) -> bool:
+        if self.selectmode == "extended":
+            return index in self.selected_set
+        return index == self.selected
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.first = max(0, min(int(float(value) * len(self.rows)), self._max_first()))
+            self._refresh()
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll(int(value) * step)
+
+    def _on_wheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_resize(self, event):
+        visible = max(1, (event.height - self.HEADER_HEIGHT) // self.ROW_HEIGHT)
+        if visible != self.visible:
+            self.visible = visible
+            self.first = min(self.first, self._max_first())
+            self._refresh()
+
+    def _move_selection(self, delta: int):
+        if self.rows:
+            start = self.selected if self.selected is not None else self.first - (1 if delta > 0 else 0)
+            self.select(start + delta)
+        return "break"
+
+    def _on_tree_select(self, event):
+        selection = self.tree.selection()
+        if self.selectmode == "extended":
+            # Only the visible rows can change here: the off-screen selection is kept
+            self.selected_set -= set(range(self.first, self.first + self._attached))
+            self.selected_set.update(self.first + self.tree.index(item) for item in selection if item in self._items)
+            return
+
+        if not selection or selection[0] not in self._items:
+            return
+        index = self.first + self.tree.index(selection[0])
+        # Selections made by _refresh come back here too: only real changes are notified
+        if index == self.selected or index >= len(self.rows):
+            return
+        self.selected = index
+        if self.on_select:
+            self.on_select(index)